@@ -0,0 +1,193 @@
+"""
+Replays a workload against the handlers and reports the DynamoDB capacity it consumed.
+
+Usage:
+    python benchmarks/capacity_report.py --invocations 200 --window 60
+    python benchmarks/capacity_report.py --workload requests.jsonl --endpoint-url http://localhost:8000
+
+Every handler invocation prints an embedded metric record with the read and write
+capacity units its DynamoDB calls returned (ReturnConsumedCapacity). The report
+groups those records by endpoint, the function and the names of its query
+parameters, and totals them per table and index against the provisioned
+throughput, as if the replayed invocations arrived within --window seconds.
+
+A workload file has one JSON invocation per line, e.g.
+{"function": "currency_exchange", "query": {"base": "USD"}}. Without one, a default
+mix of the read endpoints and one cron ingest is replayed. moto only returns rough
+capacity figures; DynamoDB Local (--endpoint-url) returns the service's.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import statistics
+import tempfile
+from unittest import mock
+
+from table_scaling_benchmark import (
+    TABLE_NAME, build_daily_feed, dynamodb_stand_in, percentile, write_synthetic_history
+)
+
+import main
+from currency_exchange import currency_exchange_fetcher
+from currency_exchange_common.business_days import business_days_before, get_calendar
+from currency_exchange_common.clients import set_dynamodb_resource
+from currency_exchange_common.schedule import resolve_rate_date
+from currency_exchange_update_cron import backfill_currency_exchange_history
+from currency_exchange_update_cron import update_currency_exchange_price_daily
+from currency_exchange_with_difference import currency_exchange_fetcher as difference_fetcher
+
+
+def build_default_workload(latest_date, invocations):
+    # Relative weights of the read endpoints; the cron ingests once per replay
+    year_ago = str(latest_date - datetime.timedelta(days=365))
+    mix = [
+        (60, 'currency_exchange', {}),
+        (15, 'currency_exchange', {'base': 'USD', 'symbols': 'JPY,GBP'}),
+        (5, 'currency_exchange', {'currency': 'USD', 'start': year_ago, 'end': str(latest_date)}),
+        (15, 'currency_exchange_with_difference', {}),
+        (5, 'currency_exchange_with_difference', {'horizons': '1d,1w,1m,ytd'}),
+    ]
+    total_weight = sum(weight for weight, _, _ in mix)
+    workload = [{'function': 'currency_exchange_update_cron'}]
+    for weight, function, query in mix:
+        workload += [{'function': function, 'query': query}] * round(invocations * weight / total_weight)
+    return workload
+
+
+def read_workload(file_path):
+    with open(file_path) as workload_file:
+        return [json.loads(line) for line in workload_file if line.strip()]
+
+
+def build_handlers(latest_date, warm_cache):
+    calendar = get_calendar(latest_date)
+    ingest_dates = [latest_date]
+
+    def fetch(module):
+        def invoke(query):
+            if not warm_cache:
+                module.rate_cache.clear()
+            return module.fetch_currency_exchange_data({'queryStringParameters': query or None}, None)
+        return invoke
+
+    def ingest(query):
+        ingest_dates.append(calendar.next_business_day(ingest_dates[-1]))
+        with mock.patch.object(update_currency_exchange_price_daily, 'open_feed',
+                               return_value=build_daily_feed(str(ingest_dates[-1]))):
+            return update_currency_exchange_price_daily.currency_exchange_price_daily({}, None)
+
+    return {
+        'currency_exchange': fetch(currency_exchange_fetcher),
+        'currency_exchange_with_difference': fetch(difference_fetcher),
+        'currency_exchange_update_cron': ingest,
+    }
+
+
+def replay(handlers, workload):
+    """
+    Invokes the handlers and collects the metric record of every invocation.
+
+    Returns:
+        list: (endpoint, record) pairs in workload order.
+    """
+    records = []
+    for invocation in workload:
+        query = invocation.get('query') or {}
+        endpoint = invocation['function'] + (f"?{','.join(sorted(query))}" if query else '')
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            handlers[invocation['function']](query)
+        for line in output.getvalue().splitlines():
+            if line.startswith('{') and '"_aws"' in line:
+                records.append((endpoint, json.loads(line)))
+    return records
+
+
+def get_provisioned_throughput(client):
+    # Table or 'table/index' -> (read, write) provisioned units
+    table = client.describe_table(TableName=TABLE_NAME)['Table']
+    throughput = table.get('ProvisionedThroughput', {})
+    provisioned = {TABLE_NAME: (throughput.get('ReadCapacityUnits'), throughput.get('WriteCapacityUnits'))}
+    for index in table.get('GlobalSecondaryIndexes', []):
+        throughput = index.get('ProvisionedThroughput', {})
+        provisioned[f"{TABLE_NAME}/{index['IndexName']}"] = (
+            throughput.get('ReadCapacityUnits'), throughput.get('WriteCapacityUnits')
+        )
+    return provisioned
+
+
+def print_report(records, provisioned, window):
+    endpoints = {}
+    for endpoint, record in records:
+        endpoints.setdefault(endpoint, []).append(record)
+
+    print(f"{'endpoint':<52}{'calls':>6}{'RCU/call':>10}{'p99':>8}{'WCU/call':>10}{'p99':>8}"
+          f"{'RCU':>9}{'WCU':>9}")
+    for endpoint, endpoint_records in sorted(endpoints.items()):
+        rcu = [record.get('consumed_rcu', 0.0) for record in endpoint_records]
+        wcu = [record.get('consumed_wcu', 0.0) for record in endpoint_records]
+        print(f"{endpoint:<52}{len(endpoint_records):6d}{statistics.mean(rcu):10.2f}{percentile(rcu, 0.99):8.1f}"
+              f"{statistics.mean(wcu):10.2f}{percentile(wcu, 0.99):8.1f}{sum(rcu):9.1f}{sum(wcu):9.1f}")
+
+    totals = {}
+    for _, record in records:
+        for key, units in record.get('consumed_capacity', {}).items():
+            totals[key] = totals.get(key, 0.0) + units
+
+    print(f"\nCapacity over a {window:.0f} s window")
+    print(f"{'table/index':<40}{'RCU/s':>9}{'provisioned':>13}{'WCU/s':>9}{'provisioned':>13}")
+    for name in sorted(set(provisioned) | {key.rsplit(':', 1)[0] for key in totals}):
+        read, write = provisioned.get(name, (None, None))
+        read_rate = totals.get(f'{name}:rcu', 0.0) / window
+        write_rate = totals.get(f'{name}:wcu', 0.0) / window
+        print(f"{name:<40}{read_rate:9.2f}{read if read is not None else '-':>13}"
+              f"{write_rate:9.2f}{write if write is not None else '-':>13}"
+              f"{'  THROTTLES' if (read and read_rate > read) or (write and write_rate > write) else ''}")
+
+
+def main_report():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workload', help='JSON lines file of invocations to replay, instead of the default mix')
+    parser.add_argument('--invocations', type=int, default=200, help='Read invocations of the default mix')
+    parser.add_argument('--window', type=float, default=60.0, help='Seconds the replayed invocations arrive within')
+    parser.add_argument('--days', type=int, default=255, help='Business days of history to seed')
+    parser.add_argument('--warm-cache', action='store_true', help='Keep the fetchers rate cache between invocations')
+    parser.add_argument('--endpoint-url', help='DynamoDB Local endpoint, instead of moto')
+    args = parser.parse_args()
+    # The handlers log every response body at INFO
+    logging.getLogger('currency_exchange').setLevel(logging.WARNING)
+
+    latest_date = resolve_rate_date(datetime.datetime.now(datetime.timezone.utc))
+    with dynamodb_stand_in(args.endpoint_url) as resource:
+        client = resource.meta.client
+        with contextlib.suppress(client.exceptions.ResourceNotFoundException):
+            client.delete_table(TableName=TABLE_NAME)
+            client.get_waiter('table_not_exists').wait(TableName=TABLE_NAME)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            main.create_or_update_dynamodb_table(client, TABLE_NAME)
+        set_dynamodb_resource(resource)
+
+        dates = [latest_date] + business_days_before(latest_date, args.days - 1)
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            feed_path = os.path.join(temporary_directory, 'eurofxref-hist.xml')
+            write_synthetic_history(feed_path, [str(date_val) for date_val in dates])
+            # The stand-in does not throttle, so the seed is not held to the provisioned capacity
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                backfill_currency_exchange_history.backfill_history(
+                    feed_path, max_workers=4, chunk_size=25, write_capacity=0
+                )
+
+        workload = read_workload(args.workload) if args.workload else build_default_workload(
+            latest_date, args.invocations
+        )
+        records = replay(build_handlers(latest_date, args.warm_cache), workload)
+        print_report(records, get_provisioned_throughput(client), args.window)
+        set_dynamodb_resource(None)
+
+
+if __name__ == '__main__':
+    main_report()
@@ -0,0 +1,132 @@
+"""
+Profiles the cold-start import of every Lambda handler and fails over an import-time budget.
+
+Usage:
+    python benchmarks/cold_start_benchmark.py --repeat 5
+
+Each handler module is imported in a fresh interpreter, laid out as in its deployment
+zip (the function directory and the shared packages on the import path). The report
+lists the median import time, the peak RSS and the dependencies that cost the most,
+taken from `python -X importtime`. The exit status is 1 when a handler exceeds its
+budget, so the benchmark can guard against import-time regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Function directory -> handler module
+HANDLERS = {
+    'currency_exchange': 'currency_exchange_fetcher',
+    'currency_exchange_with_difference': 'currency_exchange_fetcher',
+    'currency_exchange_update_cron': 'update_currency_exchange_price_daily',
+}
+
+# Median import time allowed per handler, in milliseconds. boto3 alone takes 170-260 ms depending
+# on the machine, so this only catches gross regressions
+IMPORT_BUDGET_MS = {
+    'currency_exchange': 350,
+    'currency_exchange_with_difference': 350,
+    'currency_exchange_update_cron': 350,
+}
+# Packages the Lambda runtime provides and every handler needs
+RUNTIME_PACKAGES = ('boto3', 'botocore')
+# Median import time allowed beyond the runtime packages; importing numpy, requests or pytz
+# eagerly again goes over it
+OWN_IMPORT_BUDGET_MS = 50
+
+IMPORT_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+import_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({{'import_ms': import_ms, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+
+def parse_import_times(stderr, own_packages):
+    """
+    Sums the cumulative `-X importtime` microseconds of every dependency of the handler.
+
+    A dependency is charged where the handler or the shared package imports it, so
+    everything it imports in turn is counted towards it.
+    """
+    packages = {}
+    # The children of an import are printed before it, so the lines are read parents first
+    stack = []
+    for line in reversed(stderr.splitlines()):
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        indent = len(name) - len(name.lstrip())
+        package = name.strip().split('.')[0]
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        parent = stack[-1][1] if stack else None
+        if parent in own_packages and package not in own_packages:
+            packages[package] = packages.get(package, 0) + int(cumulative)
+        stack.append((indent, package))
+    return packages
+
+
+def profile_handler(function_directory, module):
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join([os.path.join(ROOT_DIRECTORY, function_directory), ROOT_DIRECTORY])
+    environment.pop('PYTHONDONTWRITEBYTECODE', None)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT.format(module=module)],
+        cwd=ROOT_DIRECTORY, env=environment, capture_output=True, text=True, check=True
+    )
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    measurement['packages'] = parse_import_times(result.stderr, {module, 'currency_exchange_common'})
+    return measurement
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per handler')
+    parser.add_argument('--top', type=int, default=6, help='Dependencies listed per handler')
+    parser.add_argument('--budget-ms', type=float, help='Import budget applied to every handler')
+    parser.add_argument('--own-budget-ms', type=float, default=OWN_IMPORT_BUDGET_MS,
+                        help='Import budget beyond the runtime packages')
+    args = parser.parse_args()
+
+    over_budget = []
+    for function_directory, module in HANDLERS.items():
+        # The first import also writes the bytecode caches, like the first cold start of a fresh zip
+        profile_handler(function_directory, module)
+        runs = [profile_handler(function_directory, module) for _ in range(args.repeat)]
+        import_ms = statistics.median(run['import_ms'] for run in runs)
+        own_import_ms = statistics.median(
+            run['import_ms'] - sum(run['packages'].get(package, 0) for package in RUNTIME_PACKAGES) / 1000
+            for run in runs
+        )
+        max_rss_mb = max(run['max_rss_kb'] for run in runs) / 1024
+        budget_ms = args.budget_ms or IMPORT_BUDGET_MS[function_directory]
+
+        over = import_ms > budget_ms or own_import_ms > args.own_budget_ms
+        print(f"{function_directory}.{module}: {import_ms:.1f} ms (budget {budget_ms:.0f} ms), "
+              f"{own_import_ms:.1f} ms beyond {'/'.join(RUNTIME_PACKAGES)} (budget {args.own_budget_ms:.0f} ms), "
+              f"peak RSS {max_rss_mb:.1f} MB{', OVER BUDGET' if over else ''}")
+        packages = {}
+        for run in runs:
+            for package, microseconds in run['packages'].items():
+                packages.setdefault(package, []).append(microseconds)
+        slowest = sorted(packages.items(), key=lambda package: -statistics.median(package[1]))[:args.top]
+        for package, microseconds in slowest:
+            print(f"    {package:<40} {statistics.median(microseconds) / 1000:8.1f} ms")
+        if over:
+            over_budget.append(function_directory)
+
+    if over_budget:
+        print(f"Import budget exceeded by: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Compares the streaming ECB feed parser against parsing the whole document with xmltodict.
+
+Usage:
+    python benchmarks/ecb_parsing_benchmark.py --days 6000
+
+The synthetic feed has the layout of eurofxref-hist.xml. The streaming parser receives
+the feed in chunks as they are generated, the way it receives a download, while the
+xmltodict path needs the complete document in memory first.
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from currency_exchange_common.ecb import iter_ecb_rates  # noqa: E402
+
+CURRENCIES = [
+    'USD', 'JPY', 'BGN', 'CZK', 'DKK', 'GBP', 'HUF', 'PLN', 'RON', 'SEK', 'CHF', 'ISK', 'NOK', 'TRY', 'AUD',
+    'BRL', 'CAD', 'CNY', 'HKD', 'IDR', 'ILS', 'INR', 'KRW', 'MXN', 'MYR', 'NZD', 'PHP', 'SGD', 'THB', 'ZAR'
+]
+
+
+def iter_synthetic_feed(days):
+    yield (b'<?xml version="1.0" encoding="UTF-8"?>\n'
+           b'<gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" '
+           b'xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref">'
+           b'<gesmes:subject>Reference rates</gesmes:subject><Cube>')
+    date = datetime.date(2023, 7, 6)
+    for day in range(days):
+        rates = ''.join(
+            f'<Cube currency="{currency}" rate="{1 + (day + index) % 97 / 100:.4f}"/>'
+            for index, currency in enumerate(CURRENCIES)
+        )
+        yield f'<Cube time="{date - datetime.timedelta(days=day)}">{rates}</Cube>'.encode()
+    yield b'</Cube></gesmes:Envelope>'
+
+
+def parse_with_xmltodict(days):
+    import xmltodict
+
+    xml_dict = xmltodict.parse(b''.join(iter_synthetic_feed(days)))
+    day_cubes = xml_dict['gesmes:Envelope']['Cube']['Cube']
+    if isinstance(day_cubes, dict):
+        day_cubes = [day_cubes]
+    return sum(len(day_cube['Cube']) for day_cube in day_cubes)
+
+
+def parse_streaming(days):
+    return sum(1 for _ in iter_ecb_rates(iter_synthetic_feed(days)))
+
+
+def measure(parse, days):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = parse(days)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, nargs='+', default=[1, 90, 6000], help='Feed sizes in days')
+    args = parser.parse_args()
+
+    print(f"{'days':>6} {'parser':<10} {'rates':>8} {'seconds':>9} {'peak MiB':>9}")
+    for days in args.days:
+        for name, parse in (('xmltodict', parse_with_xmltodict), ('streaming', parse_streaming)):
+            count, elapsed, peak = measure(parse, days)
+            print(f"{days:>6} {name:<10} {count:>8} {elapsed:>9.3f} {peak / 2 ** 20:>9.2f}")
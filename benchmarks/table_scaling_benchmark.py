@@ -0,0 +1,295 @@
+"""
+Measures how the read and ingest handlers scale with the size of the CurrencyExchange table.
+
+Usage:
+    python benchmarks/table_scaling_benchmark.py --sizes 1d 1y 20y --iterations 50
+    python benchmarks/table_scaling_benchmark.py --endpoint-url http://localhost:8000
+
+The table is created with the deploy script's definition and seeded through the
+backfill with synthetic ECB history ending on the date the fetchers serve now. Each
+handler is then invoked in-process, with its rate cache cleared so every call reads
+the table, and the report lists its latency percentiles and the read and write
+capacity units it consumed per call.
+
+The capacity is estimated from the size of every item read and written, with the
+DynamoDB rounding rules, so it does not depend on the stand-in. It is the signal to
+watch: a handler whose capacity grows with the table reads more than it serves. By
+default the table lives in moto, which evaluates queries by walking its in-memory
+table, so its latencies also grow with the table; DynamoDB Local (--endpoint-url)
+gives latencies closer to the service.
+"""
+import argparse
+import base64
+import contextlib
+import datetime
+import io
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import boto3  # noqa: E402
+
+import main  # noqa: E402
+from currency_exchange import currency_exchange_fetcher  # noqa: E402
+from currency_exchange_common.business_days import business_days_before, get_calendar  # noqa: E402
+from currency_exchange_common.clients import set_dynamodb_resource  # noqa: E402
+from currency_exchange_common.ecb import FeedResponse  # noqa: E402
+from currency_exchange_common.schedule import resolve_rate_date  # noqa: E402
+from currency_exchange_update_cron import backfill_currency_exchange_history  # noqa: E402
+from currency_exchange_update_cron import update_currency_exchange_price_daily  # noqa: E402
+from currency_exchange_with_difference import currency_exchange_fetcher as difference_fetcher  # noqa: E402
+from ecb_parsing_benchmark import CURRENCIES  # noqa: E402
+
+TABLE_NAME = 'CurrencyExchange'
+# Business days of history per table size
+TABLE_SIZES = {'1d': 1, '1y': 255, '20y': 20 * 255}
+# Attributes that put an item into a GSI, each of which costs a write of its own
+INDEXED_ATTRIBUTES = ('date', 'currency')
+INDEX_COUNT = 2
+
+
+def attribute_value_size(value):
+    # DynamoDB item size rules, applied to the wire format of an attribute value
+    (value_type, content), = value.items()
+    if value_type == 'S':
+        return len(content.encode('utf-8'))
+    if value_type == 'N':
+        digits = content.lstrip('-').replace('.', '').strip('0') or '0'
+        return math.ceil(len(digits) / 2) + 1
+    if value_type == 'B':
+        return len(base64.b64decode(content))
+    if value_type in ('BOOL', 'NULL'):
+        return 1
+    if value_type == 'M':
+        return 3 + item_size(content) + len(content)
+    if value_type == 'L':
+        return 3 + sum(attribute_value_size(element) + 1 for element in content)
+    if value_type in ('SS', 'NS', 'BS'):
+        return sum(attribute_value_size({value_type[0]: element}) for element in content)
+    raise ValueError(f"Unknown attribute type: {value_type}")
+
+
+def item_size(item):
+    return sum(len(name.encode('utf-8')) + attribute_value_size(value) for name, value in item.items())
+
+
+def read_units(size):
+    # Eventually consistent reads cost half a unit per started 4 KB
+    return math.ceil(size / 4096) * 0.5 if size else 0.5
+
+
+def write_units(item):
+    units = max(math.ceil(item_size(item) / 1024), 1)
+    if all(name in item for name in INDEXED_ATTRIBUTES):
+        units *= 1 + INDEX_COUNT
+    return units
+
+
+class CapacityMeter:
+    """
+    Estimates the read and write capacity units of every DynamoDB call of a client.
+
+    Reads are sized from the attributes returned. DynamoDB charges a read with a
+    ProjectionExpression for the whole item, so the estimate of those is a lower bound.
+    """
+
+    def __init__(self, client):
+        self._lock = threading.Lock()
+        self.read_units = 0.0
+        self.write_units = 0.0
+        self.calls = 0
+        client.meta.events.register('before-call.dynamodb', self._before_call)
+        client.meta.events.register_first('after-call.dynamodb', self._after_call)
+
+    def reset(self):
+        self.read_units = self.write_units = 0.0
+        self.calls = 0
+
+    def _before_call(self, params, context, **kwargs):
+        context['capacity_request'] = json.loads(params['body'] or b'{}')
+
+    def _after_call(self, http_response, model, context, **kwargs):
+        request = context.get('capacity_request', {})
+        response = json.loads(http_response.content or b'{}')
+        operation = model.name
+        # A failed conditional put still consumes the write, other failed calls are not charged
+        if http_response.status_code != 200 and operation != 'PutItem':
+            return
+        read, write = 0.0, 0.0
+        if operation == 'GetItem':
+            read = read_units(item_size(response.get('Item', {})))
+        elif operation in ('Query', 'Scan'):
+            read = read_units(sum(item_size(item) for item in response.get('Items', [])))
+        elif operation == 'BatchGetItem':
+            read = sum(read_units(item_size(item)) for items in response.get('Responses', {}).values()
+                       for item in items)
+        elif operation == 'PutItem':
+            write = write_units(request['Item'])
+        elif operation == 'BatchWriteItem':
+            unprocessed = sum(len(requests) for requests in response.get('UnprocessedItems', {}).values())
+            requests = [request for requests in request['RequestItems'].values() for request in requests]
+            write = sum(write_units(write_request['PutRequest']['Item'])
+                        for write_request in requests[:len(requests) - unprocessed])
+        # The backfill writes from several threads through the same client
+        with self._lock:
+            self.calls += 1
+            self.read_units += read
+            self.write_units += write
+
+
+def write_synthetic_history(file_path, dates):
+    # A newest-first eurofxref-hist feed with a rate for every currency on every date
+    with open(file_path, 'w') as feed_file:
+        feed_file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" '
+                        'xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref"><Cube>')
+        for day, date_val in enumerate(dates):
+            feed_file.write(f'<Cube time="{date_val}">')
+            for index, currency in enumerate(CURRENCIES):
+                feed_file.write(f'<Cube currency="{currency}" rate="{1 + (day + index) % 97 / 100:.4f}"/>')
+            feed_file.write('</Cube>')
+        feed_file.write('</Cube></gesmes:Envelope>')
+
+
+def build_daily_feed(date_val):
+    rates = ''.join(f'<Cube currency="{currency}" rate="{1 + index / 100:.4f}"/>'
+                    for index, currency in enumerate(CURRENCIES))
+    body = ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" '
+            'xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref">'
+            f'<Cube><Cube time="{date_val}">{rates}</Cube></Cube></gesmes:Envelope>').encode()
+    return FeedResponse(200, {}, io.BytesIO(body))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def run_scenario(meter, invoke, iterations):
+    latencies = []
+    meter.reset()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for iteration in range(iterations):
+            started = time.perf_counter()
+            response = invoke(iteration)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response['statusCode'] not in (200, 304):
+                raise RuntimeError(f"Handler failed: {response}")
+    return {
+        'p50': percentile(latencies, 0.5),
+        'p90': percentile(latencies, 0.9),
+        'p99': percentile(latencies, 0.99),
+        'mean': statistics.mean(latencies),
+        'rcu': meter.read_units / iterations,
+        'wcu': meter.write_units / iterations,
+        'calls': meter.calls / iterations,
+    }
+
+
+def build_scenarios(latest_date):
+    latest = str(latest_date)
+    year_ago = str(latest_date - datetime.timedelta(days=365))
+    calendar = get_calendar(latest_date)
+    ingest_dates = [latest_date]
+
+    def fetch(module, parameters):
+        def invoke(iteration):
+            module.rate_cache.clear()
+            return module.fetch_currency_exchange_data({'queryStringParameters': parameters}, None)
+        return invoke
+
+    def ingest(iteration):
+        # Every run ingests the next business day, as the cron does every day
+        ingest_dates.append(calendar.next_business_day(ingest_dates[-1]))
+        with mock.patch.object(update_currency_exchange_price_daily, 'open_feed',
+                               return_value=build_daily_feed(str(ingest_dates[-1]))):
+            return update_currency_exchange_price_daily.currency_exchange_price_daily({}, None)
+
+    return [
+        ('currency_exchange', 'latest', fetch(currency_exchange_fetcher, {})),
+        ('currency_exchange', 'cross rates', fetch(currency_exchange_fetcher, {'base': 'USD', 'symbols': 'JPY,GBP'})),
+        ('currency_exchange', 'series 1y', fetch(currency_exchange_fetcher, {
+            'currency': 'USD', 'start': year_ago, 'end': latest, 'aggregates': 'all'
+        })),
+        ('currency_exchange_with_difference', 'latest', fetch(difference_fetcher, {})),
+        ('currency_exchange_with_difference', 'horizons', fetch(difference_fetcher, {'horizons': '1d,1w,1m,ytd'})),
+        ('currency_exchange_update_cron', 'daily ingest', ingest),
+    ]
+
+
+@contextlib.contextmanager
+def dynamodb_stand_in(endpoint_url):
+    if endpoint_url:
+        yield boto3.resource('dynamodb', endpoint_url=endpoint_url)
+        return
+    from moto import mock_aws
+
+    with mock_aws():
+        yield boto3.resource('dynamodb')
+
+
+def benchmark_size(size, days, iterations, endpoint_url):
+    latest_date = resolve_rate_date(datetime.datetime.now(datetime.timezone.utc))
+    with dynamodb_stand_in(endpoint_url) as resource:
+        client = resource.meta.client
+        with contextlib.suppress(client.exceptions.ResourceNotFoundException):
+            client.delete_table(TableName=TABLE_NAME)
+            client.get_waiter('table_not_exists').wait(TableName=TABLE_NAME)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            main.create_or_update_dynamodb_table(client, TABLE_NAME)
+        set_dynamodb_resource(resource)
+        meter = CapacityMeter(client)
+
+        dates = [latest_date] + business_days_before(latest_date, days - 1)
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            feed_path = os.path.join(temporary_directory, 'eurofxref-hist.xml')
+            write_synthetic_history(feed_path, [str(date_val) for date_val in dates])
+            # The stand-in does not throttle, so the seed is not held to the provisioned capacity
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                backfill_currency_exchange_history.backfill_history(
+                    feed_path, max_workers=4, chunk_size=25, write_capacity=0
+                )
+        item_count = len(dates) * (len(CURRENCIES) + 1)
+        print(f"\n{size}: {len(dates)} days, {item_count} items, seeded in {time.perf_counter() - started:.1f} s, "
+              f"{meter.write_units:.0f} WCU")
+
+        print(f"{'handler':<36}{'scenario':<14}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}"
+              f"{'RCU/call':>10}{'WCU/call':>10}{'calls':>7}")
+        for handler, scenario, invoke in build_scenarios(latest_date):
+            result = run_scenario(meter, invoke, iterations)
+            print(f"{handler:<36}{scenario:<14}{result['p50']:9.1f}{result['p90']:9.1f}{result['p99']:9.1f}"
+                  f"{result['rcu']:10.1f}{result['wcu']:10.1f}{result['calls']:7.1f}")
+        set_dynamodb_resource(None)
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', default=list(TABLE_SIZES), choices=list(TABLE_SIZES),
+                        help='Table sizes to seed')
+    parser.add_argument('--iterations', type=int, default=50, help='Invocations per handler and scenario')
+    parser.add_argument('--endpoint-url', help='DynamoDB Local endpoint, instead of moto')
+    args = parser.parse_args()
+    # The handlers log every response body at INFO
+    logging.getLogger('currency_exchange').setLevel(logging.WARNING)
+
+    for size in args.sizes:
+        benchmark_size(size, TABLE_SIZES[size], args.iterations, args.endpoint_url)
+
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -1,78 +1,239 @@
 import json
 import datetime
-import boto3
-import pytz
+import os
+from boto3.dynamodb.conditions import Key
 
+from currency_exchange_common.cache import RateCache
+from currency_exchange_common.clients import get_dynamodb_resource, get_table
+from currency_exchange_common.cross_rates import BASE_CURRENCY, convert_items
+from currency_exchange_common.dynamodb import batch_get_items, build_projection, iterate_items
+from currency_exchange_common.events import get_query_parameters, parse_fields_parameter, parse_list_parameter
+from currency_exchange_common.instrumentation import current_invocation, instrumented
+from currency_exchange_common.keys import build_item_key
+from currency_exchange_common.responses import build_json_response
+from currency_exchange_common.schedule import next_publication_time, resolve_rate_date
+from currency_exchange_common.series import (
+    AGGREGATES, compute_series_aggregates, fetch_currency_series, parse_date_parameter
+)
+from currency_exchange_common.snapshots import fetch_snapshot, snapshot_to_items
 
-def fetch_items_by_date(table, column_name, column_value):
+# Rates of a published date never change, so warm invocations serve them from memory
+rate_cache = RateCache(max_size=int(os.environ.get('RATE_CACHE_MAX_SIZE', '32')))
+
+# The attributes of a returned rate, which the 'fields' parameter selects from
+ITEM_FIELDS = ('id', 'currency', 'date', 'rate')
+# The attributes cross rates are computed from
+CONVERSION_FIELDS = ('currency', 'date', 'rate')
+
+
+def fetch_items_by_date(table, column_name, column_value, index_name='DateIndex', limit=None, **kwargs):
     """
     Fetches items from the DynamoDB table based on a specific date column value.
 
+    The lookup is a key-condition Query on the date-keyed GSI, so only the items
+    for the requested date are read regardless of how much history the table holds.
+    Every result page is followed, and items are streamed rather than collected.
+
     Args:
         table (DynamoDB.Table): The DynamoDB table object.
-        column_name (str): The name of the column to filter on.
+        column_name (str): The name of the column to filter on (hash key of the index).
         column_value (str): The value to filter the column on.
+        index_name (str): The name of the GSI keyed on the column.
+        limit (int, optional): The maximum number of items to return.
+        **kwargs: Extra request parameters, e.g. a ProjectionExpression.
 
     Returns:
-        list: A list of items matching the filter criteria.
+        generator: The items matching the filter criteria.
     """
-    response = table.scan(
-        FilterExpression='#column = :value',
-        ExpressionAttributeNames={
-            '#column': column_name
-        },
-        ExpressionAttributeValues={
-            ':value': column_value
-        }
+    return iterate_items(
+        table.query,
+        limit=limit,
+        IndexName=index_name,
+        KeyConditionExpression=Key(column_name).eq(column_value),
+        **kwargs
     )
-    items = response['Items']
+
+
+def fetch_day_items(table, date_val, currencies=None, attribute_names=None):
+    """
+    Reads the per-currency items of a date, only the requested currencies and attributes.
+
+    Requested currencies are read as key lookups on their date#currency ids, which cost
+    read units per currency, instead of querying the whole day from the date index.
+    Items written before the ids were date#currency keys are not found that way, so
+    when a currency is missing the day is queried from the date index and filtered.
+    The attributes are pushed down as a ProjectionExpression either way.
+
+    Args:
+        table (DynamoDB.Table): The DynamoDB table object.
+        date_val (str): The date value.
+        currencies (list, optional): The currencies to read; all of the date by default.
+        attribute_names (iterable, optional): The attributes to read; all by default.
+
+    Returns:
+        list: The items with float rates, in the order of the currencies when given.
+    """
+    projection = build_projection(attribute_names) if attribute_names else {}
+    if currencies:
+        # EUR is the reference currency and has no item
+        keys = [{'id': build_item_key(date_val, currency)} for currency in currencies if currency != BASE_CURRENCY]
+        found = {
+            item['currency']: item
+            for item in batch_get_items(get_dynamodb_resource(), 'CurrencyExchange', keys, **projection)
+        }
+        if len(found) < len(keys):
+            found = {
+                item['currency']: item
+                for item in fetch_items_by_date(table, column_name='date', column_value=date_val, **projection)
+            }
+        # A currency still missing is left to the cross-rate conversion, which rejects it
+        items = [found[currency] for currency in currencies if currency in found]
+    else:
+        items = list(fetch_items_by_date(table, column_name='date', column_value=date_val, **projection))
+    for item in items:
+        if 'rate' in item:
+            item['rate'] = float(str(item['rate']))
     return items
 
 
+def fetch_currency_series_data(event, parameters):
+    """
+    Fetches the rate series of one currency between the 'start' and 'end' dates.
+
+    Args:
+        event (dict): The event data.
+        parameters (dict): The query string parameters: 'currency', 'start', 'end' and
+            optionally 'aggregates' (comma separated, or 'all') and 'limit'.
+
+    Returns:
+        dict: The response object containing the status code and response body.
+    """
+    instrumentation = current_invocation()
+    currency = parameters['currency'].upper()
+    try:
+        start = parse_date_parameter(parameters.get('start'), 'start')
+        end = parse_date_parameter(parameters.get('end'), 'end')
+        if start > end:
+            raise ValueError("The start date must not be after the end date")
+        aggregate_names = parse_list_parameter(parameters.get('aggregates'))
+        aggregate_names = list(AGGREGATES) if aggregate_names == ['ALL'] else [name.lower() for name in aggregate_names]
+        unknown = [name for name in aggregate_names if name not in AGGREGATES]
+        if unknown:
+            raise ValueError(f"Unknown aggregate: {', '.join(unknown)}")
+        limit = int(parameters['limit']) if parameters.get('limit') else None
+        if limit is not None and limit < 1:
+            raise ValueError("The limit must be a positive integer")
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'message': str(e)})}
+    instrumentation.set_property('mode', 'series')
+    instrumentation.info("Series: %s %s %s", currency, start, end)
+
+    table = get_table('CurrencyExchange')
+    with instrumentation.phase('db_read'):
+        series = fetch_currency_series(table, currency, start, end, limit=limit)
+    instrumentation.count('item_count', len(series))
+
+    body = {
+        'currency': currency,
+        'start': start,
+        'end': end,
+        'data': series,
+        'message': 'Data Fetched Successfully',
+    }
+    if aggregate_names:
+        with instrumentation.phase('transform'):
+            body['aggregates'] = compute_series_aggregates([entry['rate'] for entry in series], aggregate_names)
+
+    current_utc_time = datetime.datetime.now(datetime.timezone.utc)
+    with instrumentation.phase('serialize'):
+        return build_json_response(event, body, end, next_publication_time(current_utc_time), current_utc_time)
+
+
+@instrumented('currency_exchange')
 def fetch_currency_exchange_data(event, context):
     """
     Lambda function that fetches currency exchange data for a specific date.
 
+    The optional 'base' and 'symbols' query string parameters return the cross rates
+    of the given currencies expressed in the base currency instead of EUR, and the
+    optional 'fields' parameter the attributes of each rate. With the 'currency',
+    'start' and 'end' parameters the series of that currency is returned.
+
+    A day with a snapshot is read whole with one GetItem, billed on the whole item
+    whatever its projection, and cached. Other days are read item by item, with the
+    symbols and fields pushed down into the request.
+
     Args:
         event (dict): The event data.
         context (LambdaContext): The context object.
 
+    Responses are gzip encoded when the client accepts it, carry an ETag and
+    may be cached until the next publication; a matching If-None-Match gets a 304.
+
     Returns:
         dict: The response object containing the status code and response body.
     """
-    print("Fetching currency exchange data...")
-    current_utc_time = datetime.datetime.now(pytz.utc)
-    current_hour = current_utc_time.hour
-    print("Current UTC Time:", current_utc_time)
-    print("Current Hour:", current_hour)
-    if current_utc_time.weekday() == 0:
-        if current_hour < 15:
-            date = current_utc_time - datetime.timedelta(days=3)
-        else:
-            date = datetime.datetime.now(pytz.utc)
-    elif current_hour >= 15:
-        date = datetime.datetime.now(pytz.utc)
-    else:
-        date = current_utc_time - datetime.timedelta(days=1)
-    date_val = str(date.date())
-    print("Selected Date:", date_val)
+    instrumentation = current_invocation()
+    parameters = get_query_parameters(event)
+    if parameters.get('currency'):
+        return fetch_currency_series_data(event, parameters)
+    base = parameters.get('base', BASE_CURRENCY).upper()
+    symbols = parse_list_parameter(parameters.get('symbols'))
+    convert = base != BASE_CURRENCY or bool(symbols)
+    try:
+        fields = parse_fields_parameter(parameters.get('fields'), ITEM_FIELDS)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'message': str(e)})}
+    with instrumentation.phase('resolve_date'):
+        current_utc_time = datetime.datetime.now(datetime.timezone.utc)
+        date_val = str(resolve_rate_date(current_utc_time))
+    instrumentation.set_property('date', date_val)
 
-    dynamodb = boto3.resource('dynamodb')
-    table_name = 'CurrencyExchange'
-    table = dynamodb.Table(table_name)
-    print("Table Name:", table_name)
+    items = rate_cache.get(date_val, current_utc_time)
+    complete = items is not None
+    instrumentation.set_property('cache_hit', complete)
+    if items is None:
+        table = get_table('CurrencyExchange')
 
-    items = fetch_items_by_date(table, column_name='date', column_value=date_val)
-    print("Fetched Items:")
-    for item in items:
-        item['rate'] = float(str(item['rate']))
-        print(item)
+        with instrumentation.phase('db_read'):
+            snapshot = fetch_snapshot(table, date_val)
+            if snapshot:
+                items = snapshot_to_items(snapshot)
+                complete = True
+            else:
+                # Dates ingested before snapshots existed are read item by item, the base and
+                # symbols by key when only some currencies are asked for
+                currencies = list(dict.fromkeys([base] + symbols)) if symbols else None
+                attribute_names = sorted(set(fields) | set(CONVERSION_FIELDS)) if convert else fields
+                items = fetch_day_items(table, date_val, currencies, attribute_names)
+        instrumentation.debug("Fetched Items: %s", items)
+
+        # Only snapshot days are complete; a per-item read may race the cron, so it is neither
+        # cached here nor by clients
+        if complete:
+            rate_cache.set(date_val, items, next_publication_time(current_utc_time))
+    instrumentation.count('item_count', len(items))
+    instrumentation.debug("Rate Cache: %s", rate_cache.stats())
 
     body = {
         'data': items,
         'message': 'Data Fetched Successfully',
     }
 
-    print("Response Body:", body)
+    # Cross rates are derived from the cached EUR rates, so any pair is served from the same read
+    if items and convert:
+        try:
+            with instrumentation.phase('transform'):
+                body['data'] = convert_items(items, base=base, symbols=symbols)
+        except ValueError as e:
+            return {'statusCode': 400, 'body': json.dumps({'message': str(e)})}
+        body['base'] = base
+    if fields:
+        body['data'] = [{field: item[field] for field in fields if field in item} for item in body['data']]
+
+    instrumentation.debug("Response Body: %s", body)
 
-    return {'statusCode': 200, 'body': json.dumps(body)}
+    with instrumentation.phase('serialize'):
+        return build_json_response(
+            event, body, date_val, next_publication_time(current_utc_time), current_utc_time, cacheable=complete
+        )
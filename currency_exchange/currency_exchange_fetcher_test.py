@@ -1,10 +1,13 @@
 import json
 import datetime
 import boto3
-import pytz
 import unittest
+from decimal import Decimal
 from unittest.mock import MagicMock
 
+from currency_exchange import currency_exchange_fetcher
+from currency_exchange_common.clients import set_dynamodb_resource
+
 
 def fetch_items_by_date(table, column_name, column_value):
     response = table.scan(
@@ -22,7 +25,7 @@ def fetch_items_by_date(table, column_name, column_value):
 
 def fetch_currency_exchange_data(event, context):
     print("Fetching currency exchange data...")
-    current_utc_time = datetime.datetime.now(pytz.utc)
+    current_utc_time = datetime.datetime.now(datetime.timezone.utc)
     current_hour = current_utc_time.hour
     print("Current UTC Time:", current_utc_time)
     print("Current Hour:", current_hour)
@@ -30,9 +33,9 @@ def fetch_currency_exchange_data(event, context):
         if current_hour < 15:
             date = current_utc_time - datetime.timedelta(days=3)
         else:
-            date = datetime.datetime.now(pytz.utc)
+            date = datetime.datetime.now(datetime.timezone.utc)
     elif current_hour >= 15:
-        date = datetime.datetime.now(pytz.utc)
+        date = datetime.datetime.now(datetime.timezone.utc)
     else:
         date = current_utc_time - datetime.timedelta(days=1)
     date_val = str(date.date())
@@ -86,5 +89,150 @@ class TestCurrencyExchangeData(unittest.TestCase):
         self.assertEqual(result, expected_response)
 
 
+class TestCurrencySeries(unittest.TestCase):
+    def tearDown(self):
+        set_dynamodb_resource(None)
+
+    def test_fetch_currency_series(self):
+        table_mock = MagicMock()
+        table_mock.query.return_value = {
+            'Items': [
+                {'date': '2023-07-03', 'rate': Decimal('1.0')},
+                {'date': '2023-07-04', 'rate': Decimal('2.0')},
+            ]
+        }
+        dynamodb_mock = MagicMock()
+        dynamodb_mock.Table.return_value = table_mock
+        set_dynamodb_resource(dynamodb_mock)
+
+        event = {'queryStringParameters': {
+            'currency': 'usd', 'start': '2023-07-01', 'end': '2023-07-31', 'aggregates': 'min,max'
+        }}
+        result = currency_exchange_fetcher.fetch_currency_exchange_data(event, {})
+
+        self.assertEqual(result['statusCode'], 200)
+        body = json.loads(result['body'])
+        self.assertEqual(body['currency'], 'USD')
+        self.assertEqual(body['data'], [{'date': '2023-07-03', 'rate': 1.0}, {'date': '2023-07-04', 'rate': 2.0}])
+        self.assertEqual(body['aggregates'], {'min': 1.0, 'max': 2.0})
+        table_mock.scan.assert_not_called()
+        table_mock.get_item.assert_not_called()
+
+    def test_fetch_currency_series_invalid_range(self):
+        event = {'queryStringParameters': {'currency': 'USD', 'start': '2023-07-31', 'end': '2023-07-01'}}
+
+        result = currency_exchange_fetcher.fetch_currency_exchange_data(event, {})
+
+        self.assertEqual(result['statusCode'], 400)
+
+    def test_fetch_currency_series_non_positive_limit(self):
+        for limit in ('0', '-3'):
+            event = {'queryStringParameters': {
+                'currency': 'USD', 'start': '2023-07-01', 'end': '2023-07-31', 'limit': limit
+            }}
+
+            result = currency_exchange_fetcher.fetch_currency_exchange_data(event, {})
+
+            self.assertEqual(result['statusCode'], 400)
+            self.assertEqual(json.loads(result['body'])['message'], 'The limit must be a positive integer')
+
+
+class TestSymbolAndFieldPushdown(unittest.TestCase):
+    def setUp(self):
+        currency_exchange_fetcher.rate_cache.clear()
+        self.table_mock = MagicMock()
+        self.dynamodb_mock = MagicMock()
+        self.dynamodb_mock.Table.return_value = self.table_mock
+        set_dynamodb_resource(self.dynamodb_mock)
+
+    def tearDown(self):
+        currency_exchange_fetcher.rate_cache.clear()
+        set_dynamodb_resource(None)
+
+    def test_symbols_of_a_day_without_snapshot_are_read_by_key(self):
+        self.table_mock.get_item.return_value = {}
+        self.dynamodb_mock.batch_get_item.return_value = {'Responses': {'CurrencyExchange': [
+            {'currency': 'JPY', 'date': '2023-07-06', 'rate': Decimal('156.57')},
+            {'currency': 'USD', 'date': '2023-07-06', 'rate': Decimal('1.0899')},
+        ]}}
+
+        event = {'queryStringParameters': {'symbols': 'usd,jpy', 'fields': 'currency,rate'}}
+        result = currency_exchange_fetcher.fetch_currency_exchange_data(event, {})
+
+        self.assertEqual(result['statusCode'], 200)
+        self.assertEqual(json.loads(result['body'])['data'], [
+            {'currency': 'USD', 'rate': 1.0899}, {'currency': 'JPY', 'rate': 156.57}
+        ])
+        request = self.dynamodb_mock.batch_get_item.call_args.kwargs['RequestItems']['CurrencyExchange']
+        self.assertEqual([key['id'].split('#')[1] for key in request['Keys']], ['USD', 'JPY'])
+        self.assertEqual(sorted(request['ExpressionAttributeNames'].values()), ['currency', 'date', 'rate'])
+        self.table_mock.query.assert_not_called()
+
+    def test_symbols_of_a_day_with_legacy_ids_fall_back_to_the_date_index(self):
+        self.table_mock.get_item.return_value = {}
+        self.dynamodb_mock.batch_get_item.return_value = {'Responses': {'CurrencyExchange': []}}
+        self.table_mock.query.return_value = {'Items': [
+            {'currency': 'USD', 'date': '2023-07-06', 'rate': Decimal('1.0899')},
+            {'currency': 'JPY', 'date': '2023-07-06', 'rate': Decimal('156.57')},
+        ]}
+
+        result = currency_exchange_fetcher.fetch_currency_exchange_data(
+            {'queryStringParameters': {'symbols': 'USD'}}, {}
+        )
+
+        self.assertEqual(result['statusCode'], 200)
+        self.assertEqual(json.loads(result['body'])['data'], [{'currency': 'USD', 'date': '2023-07-06', 'rate': 1.0899}])
+        self.assertIn('ProjectionExpression', self.table_mock.query.call_args.kwargs)
+
+    def test_unknown_symbol_of_a_day_without_snapshot(self):
+        self.table_mock.get_item.return_value = {}
+        self.dynamodb_mock.batch_get_item.return_value = {'Responses': {'CurrencyExchange': []}}
+        self.table_mock.query.return_value = {'Items': [
+            {'currency': 'USD', 'date': '2023-07-06', 'rate': Decimal('1.0899')},
+        ]}
+
+        result = currency_exchange_fetcher.fetch_currency_exchange_data(
+            {'queryStringParameters': {'symbols': 'USD,XXX'}}, {}
+        )
+
+        self.assertEqual(result['statusCode'], 400)
+        self.assertEqual(json.loads(result['body'])['message'], 'Unknown currency: XXX')
+
+    def test_fields_of_a_day_without_snapshot_are_projected(self):
+        self.table_mock.get_item.return_value = {}
+        self.table_mock.query.return_value = {'Items': [{'rate': Decimal('1.0899')}]}
+
+        event = {'queryStringParameters': {'fields': 'rate'}}
+        result = currency_exchange_fetcher.fetch_currency_exchange_data(event, {})
+
+        self.assertEqual(json.loads(result['body'])['data'], [{'rate': 1.0899}])
+        query = self.table_mock.query.call_args.kwargs
+        self.assertEqual(query['ProjectionExpression'], '#p0')
+        self.assertEqual(query['ExpressionAttributeNames'], {'#p0': 'rate'})
+
+    def test_fields_of_a_snapshot_day(self):
+        self.table_mock.get_item.return_value = {'Item': {
+            'snapshot_date': '2023-07-06',
+            'currencies': ['USD', 'JPY'],
+            'rates': {'USD': Decimal('1.0899'), 'JPY': Decimal('156.57')},
+        }}
+
+        event = {'queryStringParameters': {'fields': 'currency,rate'}}
+        result = currency_exchange_fetcher.fetch_currency_exchange_data(event, {})
+
+        self.assertEqual(json.loads(result['body'])['data'], [
+            {'currency': 'USD', 'rate': 1.0899}, {'currency': 'JPY', 'rate': 156.57}
+        ])
+        self.assertEqual(len(currency_exchange_fetcher.rate_cache), 1)
+
+    def test_unknown_field(self):
+        event = {'queryStringParameters': {'fields': 'rate,volume'}}
+
+        result = currency_exchange_fetcher.fetch_currency_exchange_data(event, {})
+
+        self.assertEqual(result['statusCode'], 400)
+        self.assertEqual(json.loads(result['body'])['message'], 'Unknown field: volume')
+
+
 if __name__ == '__main__':
     unittest.main()
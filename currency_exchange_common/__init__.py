@@ -0,0 +1,5 @@
+"""
+Helpers shared by the currency exchange Lambda functions.
+
+main.py bundles this package into every function zip next to the handler module.
+"""
@@ -0,0 +1,163 @@
+import datetime
+
+# The ECB reference rates start on the first TARGET business day of 1999
+FIRST_YEAR = 1999
+
+
+def easter_sunday(year):
+    """
+    Computes the date of Easter Sunday with the anonymous Gregorian algorithm.
+
+    Args:
+        year (int): The year.
+
+    Returns:
+        datetime.date: Easter Sunday of that year.
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    offset = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * offset) // 451
+    month, day = divmod(h + offset - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def target_holidays(year):
+    """
+    Returns the weekday TARGET closing days of a year, on which no reference rates are published.
+
+    Args:
+        year (int): The year.
+
+    Returns:
+        set: New Year's Day, Good Friday, Easter Monday, Labour Day, Christmas Day and
+            26 December.
+    """
+    easter = easter_sunday(year)
+    return {
+        datetime.date(year, 1, 1),
+        easter - datetime.timedelta(days=2),
+        easter + datetime.timedelta(days=1),
+        datetime.date(year, 5, 1),
+        datetime.date(year, 12, 25),
+        datetime.date(year, 12, 26),
+    }
+
+
+class BusinessDayCalendar:
+    """
+    Precomputed TARGET business-day calendar with constant-time lookups.
+
+    Every calendar day of the covered years is mapped to the position of the latest
+    business day on or before it, so the lookups are a dict access and a list index.
+    """
+
+    def __init__(self, first_year, last_year):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.business_days = []
+        self._latest_position = {}
+
+        day = datetime.date(first_year, 1, 1)
+        end = datetime.date(last_year, 12, 31)
+        holidays = set()
+        for year in range(first_year, last_year + 1):
+            holidays |= target_holidays(year)
+        while day <= end:
+            if day.weekday() < 5 and day not in holidays:
+                self.business_days.append(day)
+            self._latest_position[day] = len(self.business_days) - 1
+            day += datetime.timedelta(days=1)
+
+    def covers(self, date):
+        return self.first_year <= date.year <= self.last_year
+
+    def is_business_day(self, date):
+        """
+        Returns whether reference rates are published on a date.
+        """
+        position = self._latest_position[date]
+        return position >= 0 and self.business_days[position] == date
+
+    def latest_business_day(self, date):
+        """
+        Returns the latest business day on or before a date.
+        """
+        return self.business_days[self._latest_position[date]]
+
+    def previous_business_day(self, date):
+        """
+        Returns the latest business day strictly before a date.
+        """
+        return self.business_days[self._latest_position[date - datetime.timedelta(days=1)]]
+
+    def next_business_day(self, date):
+        """
+        Returns the earliest business day strictly after a date.
+        """
+        position = self._latest_position[date]
+        return self.business_days[position + 1]
+
+    def business_days_before(self, date, count):
+        """
+        Returns up to `count` business days strictly before a date, latest first.
+        """
+        position = self._latest_position[date - datetime.timedelta(days=1)]
+        start = max(position - count + 1, 0)
+        return self.business_days[start:position + 1][::-1]
+
+
+_calendar = None
+
+
+def get_calendar(date=None):
+    """
+    Returns the shared calendar, built on first use and extended when a date falls outside it.
+
+    Args:
+        date (datetime.date, optional): A date that must be covered, with a year of margin.
+
+    Returns:
+        BusinessDayCalendar: The calendar.
+    """
+    global _calendar
+    date = date or datetime.date.today()
+    earliest = date - datetime.timedelta(days=366)
+    latest = date + datetime.timedelta(days=366)
+    if _calendar is None or not (_calendar.covers(earliest) and _calendar.covers(latest)):
+        first_year = min(FIRST_YEAR, earliest.year)
+        last_year = max(latest.year, _calendar.last_year if _calendar else latest.year)
+        _calendar = BusinessDayCalendar(first_year, last_year)
+    return _calendar
+
+
+def previous_business_day(date):
+    """
+    Returns the latest TARGET business day strictly before a date.
+
+    Args:
+        date (datetime.date): The date.
+
+    Returns:
+        datetime.date: The previous business day.
+    """
+    return get_calendar(date).previous_business_day(date)
+
+
+def business_days_before(date, count):
+    """
+    Returns up to `count` TARGET business days strictly before a date, latest first.
+
+    Args:
+        date (datetime.date): The date.
+        count (int): The number of business days.
+
+    Returns:
+        list: The business days.
+    """
+    return get_calendar(date).business_days_before(date, count)
@@ -0,0 +1,45 @@
+import datetime
+import unittest
+
+from currency_exchange_common.business_days import (
+    BusinessDayCalendar, business_days_before, easter_sunday, get_calendar, previous_business_day
+)
+
+
+class TestBusinessDays(unittest.TestCase):
+    def test_easter_sunday(self):
+        self.assertEqual(easter_sunday(2023), datetime.date(2023, 4, 9))
+        self.assertEqual(easter_sunday(2024), datetime.date(2024, 3, 31))
+        self.assertEqual(easter_sunday(2000), datetime.date(2000, 4, 23))
+
+    def test_target_holidays_and_weekends_are_closed(self):
+        calendar = BusinessDayCalendar(2023, 2023)
+
+        self.assertFalse(calendar.is_business_day(datetime.date(2023, 4, 7)))
+        self.assertFalse(calendar.is_business_day(datetime.date(2023, 4, 10)))
+        self.assertFalse(calendar.is_business_day(datetime.date(2023, 5, 1)))
+        self.assertFalse(calendar.is_business_day(datetime.date(2023, 12, 26)))
+        self.assertFalse(calendar.is_business_day(datetime.date(2023, 7, 8)))
+        self.assertTrue(calendar.is_business_day(datetime.date(2023, 7, 6)))
+
+    def test_previous_business_day(self):
+        self.assertEqual(previous_business_day(datetime.date(2023, 7, 10)), datetime.date(2023, 7, 7))
+        self.assertEqual(previous_business_day(datetime.date(2023, 4, 11)), datetime.date(2023, 4, 6))
+        self.assertEqual(previous_business_day(datetime.date(2024, 1, 2)), datetime.date(2023, 12, 29))
+
+    def test_business_days_before(self):
+        self.assertEqual(
+            business_days_before(datetime.date(2023, 4, 12), 3),
+            [datetime.date(2023, 4, 11), datetime.date(2023, 4, 6), datetime.date(2023, 4, 5)]
+        )
+
+    def test_calendar_is_not_rebuilt_on_the_last_day_of_the_year(self):
+        date = datetime.date(2030, 12, 31)
+        calendar = get_calendar(date)
+
+        self.assertIs(get_calendar(date), calendar)
+        self.assertTrue(calendar.covers(date + datetime.timedelta(days=366)))
+
+
+if __name__ == '__main__':
+    unittest.main()
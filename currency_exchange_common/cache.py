@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+
+class RateCache:
+    """
+    In-process, size-bounded LRU cache for the rates of a resolved date.
+
+    The cache lives at module level in the handler, so it survives across warm
+    invocations of the same Lambda container. Each entry expires at the next
+    publication cutover, after which the handler resolves a different date anyway.
+    """
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, current_utc_time):
+        """
+        Returns the cached value for the key, or None if it is missing or expired.
+
+        Args:
+            key (str): The cache key, e.g. the resolved date.
+            current_utc_time (datetime.datetime): The current time in UTC.
+
+        Returns:
+            The cached value, or None.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= current_utc_time:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, expires_at):
+        """
+        Stores a value, evicting the least recently used entry when the cache is full.
+
+        Args:
+            key (str): The cache key.
+            value: The value to store.
+            expires_at (datetime.datetime): The time after which the entry is stale.
+        """
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The number of hits, misses and stored entries.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
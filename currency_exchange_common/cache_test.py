@@ -0,0 +1,59 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from currency_exchange_common.cache import RateCache
+from currency_exchange_common.schedule import next_publication_time, resolve_rate_date
+
+
+class TestRateCache(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        cache = RateCache()
+        now = datetime(2023, 7, 6, 16, 0, tzinfo=timezone.utc)
+
+        self.assertIsNone(cache.get('2023-07-06', now))
+        cache.set('2023-07-06', ['USD'], now + timedelta(hours=1))
+
+        self.assertEqual(cache.get('2023-07-06', now), ['USD'])
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_expired_entry_is_dropped(self):
+        cache = RateCache()
+        now = datetime(2023, 7, 6, 16, 0, tzinfo=timezone.utc)
+        cache.set('2023-07-06', ['USD'], now)
+
+        self.assertIsNone(cache.get('2023-07-06', now))
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = RateCache(max_size=2)
+        now = datetime(2023, 7, 6, 16, 0, tzinfo=timezone.utc)
+        expires_at = now + timedelta(days=1)
+        cache.set('a', 1, expires_at)
+        cache.set('b', 2, expires_at)
+        cache.get('a', now)
+        cache.set('c', 3, expires_at)
+
+        self.assertIsNone(cache.get('b', now))
+        self.assertEqual(cache.get('a', now), 1)
+        self.assertEqual(cache.get('c', now), 3)
+
+
+class TestSchedule(unittest.TestCase):
+    def test_resolve_rate_date(self):
+        self.assertEqual(str(resolve_rate_date(datetime(2023, 7, 10, 10, 0, tzinfo=timezone.utc))), '2023-07-07')
+        self.assertEqual(str(resolve_rate_date(datetime(2023, 7, 11, 10, 0, tzinfo=timezone.utc))), '2023-07-10')
+        self.assertEqual(str(resolve_rate_date(datetime(2023, 7, 11, 16, 0, tzinfo=timezone.utc))), '2023-07-11')
+        self.assertEqual(str(resolve_rate_date(datetime(2023, 7, 8, 16, 0, tzinfo=timezone.utc))), '2023-07-07')
+        self.assertEqual(str(resolve_rate_date(datetime(2023, 4, 10, 16, 0, tzinfo=timezone.utc))), '2023-04-06')
+
+    def test_next_publication_time_skips_weekends_and_holidays(self):
+        friday_evening = datetime(2023, 7, 7, 16, 0, tzinfo=timezone.utc)
+        self.assertEqual(next_publication_time(friday_evening), datetime(2023, 7, 10, 15, 0, tzinfo=timezone.utc))
+        tuesday_morning = datetime(2023, 7, 11, 10, 0, tzinfo=timezone.utc)
+        self.assertEqual(next_publication_time(tuesday_morning), datetime(2023, 7, 11, 15, 0, tzinfo=timezone.utc))
+        good_friday_morning = datetime(2023, 4, 7, 10, 0, tzinfo=timezone.utc)
+        self.assertEqual(next_publication_time(good_friday_morning), datetime(2023, 4, 11, 15, 0, tzinfo=timezone.utc))
+
+
+if __name__ == '__main__':
+    unittest.main()
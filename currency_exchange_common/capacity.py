@@ -0,0 +1,75 @@
+from currency_exchange_common.instrumentation import current_invocation
+
+READ_OPERATIONS = frozenset({'GetItem', 'BatchGetItem', 'Query', 'Scan', 'TransactGetItems'})
+WRITE_OPERATIONS = frozenset({'PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'})
+
+
+def request_consumed_capacity(params, model, **kwargs):
+    """
+    Asks DynamoDB to return the capacity consumed by a read or write request.
+
+    INDEXES splits the units between the table and each index it touched.
+    """
+    if model.name in READ_OPERATIONS or model.name in WRITE_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'INDEXES')
+
+
+def iter_capacity_units(consumed_capacity):
+    """
+    Splits the ConsumedCapacity of a response between the table and its indexes.
+
+    Args:
+        consumed_capacity (dict or list): The ConsumedCapacity of a response, a list for
+            batch and transaction operations.
+
+    Yields:
+        tuple: (name, capacity units), the name being the table or 'table/index'.
+    """
+    if isinstance(consumed_capacity, dict):
+        consumed_capacity = [consumed_capacity]
+    for capacity in consumed_capacity or []:
+        table_name = capacity['TableName']
+        if 'Table' not in capacity:
+            # Only the total was returned
+            yield table_name, capacity.get('CapacityUnits', 0.0)
+            continue
+        yield table_name, capacity['Table'].get('CapacityUnits', 0.0)
+        for index_type in ('GlobalSecondaryIndexes', 'LocalSecondaryIndexes'):
+            for index_name, index_capacity in capacity.get(index_type, {}).items():
+                yield f'{table_name}/{index_name}', index_capacity.get('CapacityUnits', 0.0)
+
+
+def record_consumed_capacity(parsed, model, **kwargs):
+    """
+    Adds the capacity consumed by a DynamoDB call to the running invocation.
+
+    The totals are the 'consumed_rcu' and 'consumed_wcu' metrics, and the split by
+    table and index is the 'consumed_capacity' property of the invocation record.
+    """
+    if model.name in READ_OPERATIONS:
+        kind = 'rcu'
+    elif model.name in WRITE_OPERATIONS:
+        kind = 'wcu'
+    else:
+        return
+    invocation = current_invocation()
+    invocation.count('dynamodb_calls')
+    for name, units in iter_capacity_units(parsed.get('ConsumedCapacity')):
+        invocation.count(f'consumed_{kind}', units)
+        invocation.tally('consumed_capacity', f'{name}:{kind}', units)
+
+
+def register_capacity_accounting(client):
+    """
+    Makes every read and write of a DynamoDB client report its consumed capacity.
+
+    The hooks are registered once per client, so calling this again is harmless.
+
+    Args:
+        client (botocore.client.BaseClient): The DynamoDB client, e.g. resource.meta.client.
+    """
+    events = client.meta.events
+    events.register('before-parameter-build.dynamodb', request_consumed_capacity,
+                    unique_id='currency-exchange-request-capacity')
+    events.register('after-call.dynamodb', record_consumed_capacity,
+                    unique_id='currency-exchange-record-capacity')
@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+
+import boto3
+from moto import mock_aws
+
+from currency_exchange_common.capacity import iter_capacity_units, register_capacity_accounting
+from currency_exchange_common.instrumentation import instrumented
+
+
+class TestIterCapacityUnits(unittest.TestCase):
+    def test_splits_units_between_table_and_indexes(self):
+        units = list(iter_capacity_units({
+            'TableName': 'CurrencyExchange',
+            'CapacityUnits': 3.0,
+            'Table': {'CapacityUnits': 1.0},
+            'GlobalSecondaryIndexes': {'DateIndex': {'CapacityUnits': 1.0}, 'CurrencyDateIndex': {'CapacityUnits': 1.0}},
+        }))
+
+        self.assertEqual(units, [
+            ('CurrencyExchange', 1.0),
+            ('CurrencyExchange/DateIndex', 1.0),
+            ('CurrencyExchange/CurrencyDateIndex', 1.0),
+        ])
+
+    def test_batch_responses_and_totals(self):
+        units = list(iter_capacity_units([
+            {'TableName': 'CurrencyExchange', 'CapacityUnits': 2.5},
+        ]))
+
+        self.assertEqual(units, [('CurrencyExchange', 2.5)])
+        self.assertEqual(list(iter_capacity_units(None)), [])
+
+
+@mock_aws
+class TestCapacityAccounting(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+        # A private session, so a test that replaces boto3.resource cannot leak into this one
+        self.resource = boto3.session.Session().resource('dynamodb', region_name='us-east-1')
+        self.table = self.resource.create_table(
+            TableName='CurrencyExchange',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+        )
+        register_capacity_accounting(self.resource.meta.client)
+        register_capacity_accounting(self.resource.meta.client)
+
+    def test_invocation_record_totals_consumed_capacity(self):
+        @instrumented('currency_exchange')
+        def handler(event, context):
+            self.table.put_item(Item={'id': '2023-07-06#USD'})
+            with self.table.batch_writer() as batch:
+                batch.put_item(Item={'id': '2023-07-06#JPY'})
+            self.table.get_item(Key={'id': '2023-07-06#USD'})
+            return {'statusCode': 200}
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            handler({}, None)
+
+        record = json.loads(output.getvalue())
+        self.assertEqual(record['dynamodb_calls'], 3)
+        self.assertEqual(record['consumed_wcu'], 2.0)
+        self.assertEqual(record['consumed_rcu'], 0.5)
+        self.assertEqual(record['consumed_capacity'], {'CurrencyExchange:wcu': 2.0, 'CurrencyExchange:rcu': 0.5})
+        metric_names = {metric['Name'] for metric in record['_aws']['CloudWatchMetrics'][0]['Metrics']}
+        self.assertTrue({'consumed_rcu', 'consumed_wcu'} <= metric_names)
+
+    def test_explicit_return_consumed_capacity_is_kept(self):
+        response = self.table.get_item(Key={'id': 'missing'}, ReturnConsumedCapacity='NONE')
+
+        self.assertNotIn('ConsumedCapacity', response)
+
+
+if __name__ == '__main__':
+    unittest.main()
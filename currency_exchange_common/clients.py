@@ -0,0 +1,79 @@
+import os
+
+import boto3
+from botocore.config import Config
+
+from currency_exchange_common.capacity import register_capacity_accounting
+
+_dynamodb_resource = None
+_tables = {}
+
+
+def build_client_config():
+    """
+    Builds the botocore configuration used for the DynamoDB connection pool.
+
+    The values can be overridden with environment variables on the Lambda function.
+
+    Returns:
+        botocore.config.Config: The client configuration.
+    """
+    return Config(
+        max_pool_connections=int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', '10')),
+        tcp_keepalive=os.environ.get('DYNAMODB_TCP_KEEPALIVE', 'true').lower() == 'true',
+        connect_timeout=float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', '2')),
+        read_timeout=float(os.environ.get('DYNAMODB_READ_TIMEOUT', '5')),
+        retries={
+            'mode': os.environ.get('DYNAMODB_RETRY_MODE', 'standard'),
+            'max_attempts': int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', '3'))
+        }
+    )
+
+
+def get_dynamodb_resource():
+    """
+    Returns the DynamoDB resource, creating it on first use.
+
+    The resource lives at module level, so warm Lambda invocations reuse the session
+    and its pooled keep-alive connections instead of paying setup and a TLS handshake.
+    Every read and write of its client reports the capacity it consumed.
+
+    Returns:
+        boto3.resources.base.ServiceResource: The DynamoDB resource.
+    """
+    global _dynamodb_resource
+    if _dynamodb_resource is None:
+        _dynamodb_resource = boto3.resource('dynamodb', config=build_client_config())
+        register_capacity_accounting(_dynamodb_resource.meta.client)
+    return _dynamodb_resource
+
+
+def get_table(table_name):
+    """
+    Returns the DynamoDB Table object for the given name, creating it on first use.
+
+    Args:
+        table_name (str): The name of the table.
+
+    Returns:
+        boto3.resources.factory.dynamodb.Table: The table object.
+    """
+    table = _tables.get(table_name)
+    if table is None:
+        table = get_dynamodb_resource().Table(table_name)
+        _tables[table_name] = table
+    return table
+
+
+def set_dynamodb_resource(resource):
+    """
+    Replaces the DynamoDB resource, e.g. with a mock or a local stand-in in tests.
+
+    Args:
+        resource: The resource to use, or None to create a fresh one on next use.
+    """
+    global _dynamodb_resource
+    _dynamodb_resource = resource
+    _tables.clear()
+    if resource is not None:
+        register_capacity_accounting(resource.meta.client)
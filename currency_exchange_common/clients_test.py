@@ -0,0 +1,34 @@
+import unittest
+from unittest import mock
+
+from currency_exchange_common import clients
+
+
+class TestClients(unittest.TestCase):
+    def tearDown(self):
+        clients.set_dynamodb_resource(None)
+
+    @mock.patch("currency_exchange_common.clients.boto3.resource")
+    def test_resource_and_table_are_created_once(self, mock_resource):
+        clients.set_dynamodb_resource(None)
+
+        first_table = clients.get_table('CurrencyExchange')
+        second_table = clients.get_table('CurrencyExchange')
+
+        self.assertIs(first_table, second_table)
+        self.assertEqual(mock_resource.call_count, 1)
+        self.assertEqual(mock_resource.return_value.Table.call_count, 1)
+        self.assertEqual(mock_resource.call_args.kwargs['config'].retries['mode'], 'standard')
+
+    def test_injected_resource_is_used(self):
+        resource_mock = mock.MagicMock()
+        clients.set_dynamodb_resource(resource_mock)
+
+        table = clients.get_table('CurrencyExchange')
+
+        self.assertIs(table, resource_mock.Table.return_value)
+        resource_mock.Table.assert_called_once_with('CurrencyExchange')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# numpy is imported inside the functions, so a cold start that serves plain EUR rates never loads it
+
+BASE_CURRENCY = 'EUR'
+
+
+def build_rate_matrix(currencies, eur_rates):
+    """
+    Builds the full cross-rate matrix of a day from its EUR reference rates.
+
+    Args:
+        currencies (list): The quoted currencies, without EUR.
+        eur_rates (array-like): The units of each currency per euro.
+
+    Returns:
+        tuple: The currencies with EUR first, and the NxN matrix whose [i, j] entry is
+            the price of one unit of currency i in currency j.
+    """
+    import numpy as np
+
+    vector = np.concatenate(([1.0], np.asarray(eur_rates, dtype=np.float64)))
+    return [BASE_CURRENCY] + list(currencies), vector[np.newaxis, :] / vector[:, np.newaxis]
+
+
+def convert_items(items, base=BASE_CURRENCY, symbols=None):
+    """
+    Re-expresses a day's EUR-based items in another base currency.
+
+    The whole matrix is computed in one vectorized step and the requested row and
+    columns are then selected, so no pair is computed in a Python loop. A
+    'yesterday_difference' field, when present, is converted the same way from the
+    previous day's rates.
+
+    Args:
+        items (list): The items of one date, with float 'rate' fields.
+        base (str): The currency the rates are expressed in.
+        symbols (list, optional): The currencies to return; all but the base by default.
+
+    Returns:
+        list: One item per symbol with 'currency', 'date', 'rate' and, if present in
+            the input, 'yesterday_difference'.
+
+    Raises:
+        ValueError: If the base or a symbol is not quoted on that date.
+    """
+    import numpy as np
+
+    currencies = [item['currency'] for item in items]
+    rates = np.array([item['rate'] for item in items], dtype=np.float64)
+    all_currencies, matrix = build_rate_matrix(currencies, rates)
+    index = {currency: position for position, currency in enumerate(all_currencies)}
+
+    unknown = [currency for currency in [base] + list(symbols or []) if currency not in index]
+    if unknown:
+        raise ValueError(f"Unknown currency: {', '.join(unknown)}")
+
+    targets = list(symbols) if symbols else [currency for currency in all_currencies if currency != base]
+    columns = np.array([index[currency] for currency in targets], dtype=np.intp)
+    converted = matrix[index[base], columns]
+
+    date_val = items[0]['date'] if items else None
+    result = [
+        {'currency': currency, 'date': date_val, 'rate': rate}
+        for currency, rate in zip(targets, converted.tolist())
+    ]
+    if items and 'yesterday_difference' in items[0]:
+        differences = np.array([item['yesterday_difference'] for item in items], dtype=np.float64)
+        _, previous_matrix = build_rate_matrix(currencies, rates - differences)
+        converted_differences = converted - previous_matrix[index[base], columns]
+        for item, difference in zip(result, converted_differences.tolist()):
+            item['yesterday_difference'] = difference
+    return result
+
+
+def rebase_rows(currencies, rows, base=BASE_CURRENCY, symbols=None):
+    """
+    Re-expresses several rows of EUR rates, e.g. one per date, in another base currency.
+
+    Args:
+        currencies (list): The quoted currencies, without EUR.
+        rows (numpy.ndarray): A (dates x currencies) matrix of units per euro.
+        base (str): The currency the rates are expressed in.
+        symbols (list, optional): The currencies to return; all but the base by default.
+
+    Returns:
+        tuple: The returned currencies and the (dates x symbols) matrix in the base currency.
+
+    Raises:
+        ValueError: If the base or a symbol is not quoted.
+    """
+    import numpy as np
+
+    all_currencies = [BASE_CURRENCY] + list(currencies)
+    index = {currency: position for position, currency in enumerate(all_currencies)}
+    unknown = [currency for currency in [base] + list(symbols or []) if currency not in index]
+    if unknown:
+        raise ValueError(f"Unknown currency: {', '.join(unknown)}")
+
+    full = np.hstack([np.ones((rows.shape[0], 1)), rows])
+    targets = list(symbols) if symbols else [currency for currency in all_currencies if currency != base]
+    columns = np.array([index[currency] for currency in targets], dtype=np.intp)
+    return targets, full[:, columns] / full[:, [index[base]]]
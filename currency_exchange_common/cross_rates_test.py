@@ -0,0 +1,49 @@
+import unittest
+
+from currency_exchange_common.cross_rates import build_rate_matrix, convert_items
+from currency_exchange_common.events import parse_list_parameter
+
+ITEMS = [
+    {'id': '2023-07-06#USD', 'currency': 'USD', 'date': '2023-07-06', 'rate': 1.1},
+    {'id': '2023-07-06#JPY', 'currency': 'JPY', 'date': '2023-07-06', 'rate': 154.0},
+]
+
+
+class TestCrossRates(unittest.TestCase):
+    def test_build_rate_matrix(self):
+        currencies, matrix = build_rate_matrix(['USD', 'JPY'], [1.1, 154.0])
+
+        self.assertEqual(currencies, ['EUR', 'USD', 'JPY'])
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertAlmostEqual(matrix[1, 2], 140.0)
+        self.assertAlmostEqual(matrix[2, 0], 1 / 154.0)
+        self.assertAlmostEqual(matrix[1, 1], 1.0)
+
+    def test_convert_items_to_another_base(self):
+        result = convert_items(ITEMS, base='USD')
+
+        self.assertEqual([item['currency'] for item in result], ['EUR', 'JPY'])
+        self.assertAlmostEqual(result[0]['rate'], 1 / 1.1)
+        self.assertAlmostEqual(result[1]['rate'], 140.0)
+        self.assertEqual(result[1]['date'], '2023-07-06')
+
+    def test_convert_items_with_symbols_and_differences(self):
+        items = [dict(item, yesterday_difference=difference) for item, difference in zip(ITEMS, [0.1, 14.0])]
+
+        result = convert_items(items, base='USD', symbols=['JPY'])
+
+        self.assertEqual(len(result), 1)
+        self.assertAlmostEqual(result[0]['rate'], 140.0)
+        self.assertAlmostEqual(result[0]['yesterday_difference'], 0.0)
+
+    def test_unknown_currency(self):
+        with self.assertRaises(ValueError):
+            convert_items(ITEMS, base='XXX')
+
+    def test_parse_list_parameter(self):
+        self.assertEqual(parse_list_parameter('usd, jpy,'), ['USD', 'JPY'])
+        self.assertEqual(parse_list_parameter(None), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
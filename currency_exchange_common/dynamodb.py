@@ -0,0 +1,306 @@
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+# The most put or delete requests a BatchWriteItem accepts
+BATCH_WRITE_SIZE = 25
+THROTTLING_ERROR_CODES = frozenset({
+    'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'
+})
+
+
+def build_projection(attribute_names):
+    """
+    Builds the ProjectionExpression parameters that read only the given attributes.
+
+    Every name goes through a placeholder, since attributes such as 'date' are
+    DynamoDB reserved words.
+
+    Args:
+        attribute_names (iterable): The top-level attributes to read.
+
+    Returns:
+        dict: The ProjectionExpression and ExpressionAttributeNames request parameters.
+    """
+    names = {f'#p{position}': name for position, name in enumerate(attribute_names)}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+
+def iterate_pages(operation, **kwargs):
+    """
+    Yields every page of a paginated DynamoDB Query or Scan.
+
+    DynamoDB stops a page at 1 MB and returns a LastEvaluatedKey; the next page is
+    requested with it as ExclusiveStartKey until no key is returned.
+
+    Args:
+        operation (callable): The bound table method, e.g. table.query or table.scan.
+        **kwargs: The request parameters passed to the operation.
+
+    Yields:
+        dict: The raw response of each page.
+    """
+    while True:
+        response = operation(**kwargs)
+        yield response
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+
+def iterate_items(operation, limit=None, **kwargs):
+    """
+    Streams the items of a paginated DynamoDB Query or Scan, one page in memory at a time.
+
+    Args:
+        operation (callable): The bound table method, e.g. table.query or table.scan.
+        limit (int, optional): Stop after this many items; no further pages are requested.
+        **kwargs: The request parameters passed to the operation.
+
+    Yields:
+        dict: The items of every page, in order.
+    """
+    if limit is not None and limit <= 0:
+        return
+    if limit is not None:
+        kwargs.setdefault('Limit', limit)
+    remaining = limit
+    for page in iterate_pages(operation, **kwargs):
+        for item in page.get('Items', []):
+            yield item
+            if remaining is not None:
+                remaining -= 1
+                if remaining == 0:
+                    return
+
+
+def batch_get_items(resource, table_name, keys, **kwargs):
+    """
+    Streams the items of a BatchGetItem request, retrying any UnprocessedKeys.
+
+    Keys are sent in chunks of 100, the BatchGetItem maximum. Items are yielded in
+    the order DynamoDB returns them, which is not the order of the keys.
+
+    Args:
+        resource (boto3.resources.base.ServiceResource): The DynamoDB resource.
+        table_name (str): The name of the table.
+        keys (list): The primary keys to read.
+        **kwargs: Extra per-table parameters, e.g. ProjectionExpression.
+
+    Yields:
+        dict: The items that exist.
+    """
+    keys = list(keys)
+    for start in range(0, len(keys), 100):
+        request_items = {table_name: dict(kwargs, Keys=keys[start:start + 100])}
+        while request_items:
+            response = resource.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(table_name, []):
+                yield item
+            request_items = response.get('UnprocessedKeys') or None
+
+
+def get_provisioned_write_capacity(client, table_name):
+    """
+    Returns the write capacity units provisioned for a table.
+
+    Args:
+        client (botocore.client.BaseClient): The DynamoDB client.
+        table_name (str): The name of the table.
+
+    Returns:
+        float: The units, or None for an on-demand table.
+    """
+    table = client.describe_table(TableName=table_name)['Table']
+    units = table.get('ProvisionedThroughput', {}).get('WriteCapacityUnits')
+    return float(units) if units else None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that spaces requests out to a number of units per second.
+
+    A caller reserves its units up front and sleeps off any deficit, so concurrent
+    callers queue behind each other. Units charged afterwards, once the real cost is
+    known, are paid back by the next callers.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens):
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            self._sleep(wait)
+
+    def charge(self, tokens):
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.burst = rate
+
+
+class BatchWriter:
+    """
+    Writes items with BatchWriteItem at a rate the table sustains.
+
+    Items are sent in batches of 25. UnprocessedItems and throttled batches are
+    retried with exponential backoff and jitter. A token bucket holds the write rate
+    to write_capacity units per second. The rate is halved whenever DynamoDB throttles
+    and grows back by 5% after every fully processed batch. Without a write_capacity,
+    writes are not limited until the first throttle, which sets the rate to the one
+    observed so far, but no lower than initial_rate. The rate is measured in the units
+    the table consumed, not counting its indexes, which are provisioned like the table.
+
+    With remaining_time, a wait that would outlast it raises TimeoutError instead, so
+    a handler fails before its own timeout rather than being cut off mid-write.
+
+    One writer can be shared by several threads, which then share its rate.
+    """
+
+    def __init__(self, resource, table_name, write_capacity=None, max_attempts=10, base_delay=0.05,
+                 max_delay=10.0, sleep=time.sleep, initial_rate=None, remaining_time=None):
+        self.resource = resource
+        self.table_name = table_name
+        self.write_capacity = write_capacity
+        self.initial_rate = initial_rate
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.remaining_time = remaining_time
+        self._raw_sleep = sleep
+        self.limiter = TokenBucket(write_capacity, sleep=self._sleep) if write_capacity else None
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+        self.stats = {'items': 0, 'batches': 0, 'requests': 0, 'retried_items': 0, 'throttles': 0,
+                      'consumed_wcu': 0.0}
+
+    def _sleep(self, seconds):
+        if self.remaining_time is not None:
+            remaining = self.remaining_time()
+            if seconds >= remaining:
+                raise TimeoutError(
+                    f"Writes to {self.table_name} would wait {seconds:.1f} s with {remaining:.1f} s left"
+                )
+        self._raw_sleep(seconds)
+
+    def _backoff(self, attempt):
+        self._sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def _record(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                self.stats[name] += value
+
+    def _throttled(self):
+        self._record(throttles=1)
+        with self._lock:
+            if self.limiter is None:
+                elapsed = time.perf_counter() - self._started_at
+                observed = self.stats['consumed_wcu'] / elapsed
+                self.limiter = TokenBucket(max(self.initial_rate or 1.0, observed), sleep=self._sleep)
+            else:
+                self.limiter.set_rate(max(1.0, self.limiter.rate / 2))
+
+    def _processed(self):
+        limiter = self.limiter
+        if limiter is not None:
+            rate = limiter.rate * 1.05
+            limiter.set_rate(min(rate, self.write_capacity) if self.write_capacity else rate)
+
+    def _consumed_units(self, response):
+        units = 0.0
+        for capacity in response.get('ConsumedCapacity') or []:
+            if capacity.get('TableName') == self.table_name:
+                units += capacity.get('Table', capacity).get('CapacityUnits', 0.0)
+        return units
+
+    def _write_batch(self, requests):
+        for attempt in range(self.max_attempts):
+            if self.limiter is not None:
+                # Every write costs at least one unit, the rest is charged once it is known
+                self.limiter.acquire(len(requests))
+            self._record(requests=1)
+            try:
+                response = self.resource.batch_write_item(
+                    RequestItems={self.table_name: requests}, ReturnConsumedCapacity='INDEXES'
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] not in THROTTLING_ERROR_CODES:
+                    raise
+                self._throttled()
+                self._backoff(attempt)
+                continue
+
+            consumed = self._consumed_units(response)
+            self._record(consumed_wcu=consumed)
+            if self.limiter is not None and consumed > len(requests):
+                self.limiter.charge(consumed - len(requests))
+            unprocessed = (response.get('UnprocessedItems') or {}).get(self.table_name) or []
+            self._record(items=len(requests) - len(unprocessed))
+            if not unprocessed:
+                self._processed()
+                return
+            self._record(retried_items=len(unprocessed))
+            self._throttled()
+            self._backoff(attempt)
+            requests = unprocessed
+        raise ConnectionError(
+            f"{len(requests)} writes to {self.table_name} were still throttled after {self.max_attempts} attempts"
+        )
+
+    def write(self, items):
+        """
+        Writes the items, returning once every one of them is stored.
+
+        Args:
+            items (iterable): The items to put, at most one per key within a batch.
+
+        Raises:
+            ConnectionError: If a batch is still throttled after max_attempts.
+            TimeoutError: If a wait would outlast the remaining_time.
+        """
+        items = list(items)
+        for start in range(0, len(items), BATCH_WRITE_SIZE):
+            self._record(batches=1)
+            self._write_batch([{'PutRequest': {'Item': item}} for item in items[start:start + BATCH_WRITE_SIZE]])
+
+    def report(self):
+        """
+        Returns the throughput achieved so far.
+
+        Returns:
+            dict: The counts of items, batches, requests, retried items and throttles, the
+                consumed WCU, the elapsed seconds, the items and WCU per second and the
+                current rate limit (None if unlimited).
+        """
+        with self._lock:
+            report = dict(self.stats)
+        seconds = time.perf_counter() - self._started_at
+        report['seconds'] = round(seconds, 3)
+        report['items_per_second'] = round(report['items'] / seconds, 1) if seconds else 0.0
+        report['wcu_per_second'] = round(report['consumed_wcu'] / seconds, 1) if seconds else 0.0
+        report['rate_limit'] = round(self.limiter.rate, 1) if self.limiter is not None else None
+        return report
@@ -0,0 +1,196 @@
+import unittest
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+
+from currency_exchange_common.dynamodb import BatchWriter, TokenBucket, batch_get_items, iterate_items, iterate_pages
+
+
+class TestIteratePages(unittest.TestCase):
+    def test_follows_last_evaluated_key(self):
+        operation = MagicMock(side_effect=[
+            {'Items': [{'id': '1'}], 'LastEvaluatedKey': {'id': '1'}},
+            {'Items': [{'id': '2'}]},
+        ])
+
+        pages = list(iterate_pages(operation, IndexName='DateIndex'))
+
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(operation.call_count, 2)
+        self.assertNotIn('ExclusiveStartKey', operation.call_args_list[0].kwargs)
+        self.assertEqual(operation.call_args_list[1].kwargs['ExclusiveStartKey'], {'id': '1'})
+
+
+class TestIterateItems(unittest.TestCase):
+    def test_streams_items_across_pages(self):
+        operation = MagicMock(side_effect=[
+            {'Items': [{'id': '1'}, {'id': '2'}], 'LastEvaluatedKey': {'id': '2'}},
+            {'Items': [{'id': '3'}]},
+        ])
+
+        items = list(iterate_items(operation))
+
+        self.assertEqual([item['id'] for item in items], ['1', '2', '3'])
+
+    def test_stops_at_limit_without_requesting_more_pages(self):
+        operation = MagicMock(side_effect=[
+            {'Items': [{'id': '1'}, {'id': '2'}], 'LastEvaluatedKey': {'id': '2'}},
+            {'Items': [{'id': '3'}]},
+        ])
+
+        items = list(iterate_items(operation, limit=2))
+
+        self.assertEqual([item['id'] for item in items], ['1', '2'])
+        self.assertEqual(operation.call_count, 1)
+        self.assertEqual(operation.call_args.kwargs['Limit'], 2)
+
+
+class TestBatchGetItems(unittest.TestCase):
+    def test_retries_unprocessed_keys(self):
+        resource = MagicMock()
+        resource.batch_get_item.side_effect = [
+            {
+                'Responses': {'CurrencyExchange': [{'id': 'a'}]},
+                'UnprocessedKeys': {'CurrencyExchange': {'Keys': [{'id': 'b'}]}},
+            },
+            {'Responses': {'CurrencyExchange': [{'id': 'b'}]}, 'UnprocessedKeys': {}},
+        ]
+
+        items = list(batch_get_items(resource, 'CurrencyExchange', [{'id': 'a'}, {'id': 'b'}]))
+
+        self.assertEqual([item['id'] for item in items], ['a', 'b'])
+        self.assertEqual(
+            resource.batch_get_item.call_args_list[1].kwargs['RequestItems'],
+            {'CurrencyExchange': {'Keys': [{'id': 'b'}]}}
+        )
+
+
+class FakeClock:
+    """
+    A clock that only moves when the code under test sleeps.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_spaces_requests_to_the_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(5, clock=clock, sleep=clock.sleep)
+
+        for _ in range(4):
+            bucket.acquire(5)
+
+        self.assertEqual(clock.sleeps, [1.0, 1.0, 1.0])
+
+    def test_charged_units_delay_the_next_request(self):
+        clock = FakeClock()
+        bucket = TokenBucket(5, clock=clock, sleep=clock.sleep)
+
+        bucket.acquire(5)
+        bucket.charge(10)
+        bucket.acquire(5)
+
+        self.assertEqual(clock.sleeps, [3.0])
+
+
+class TestBatchWriter(unittest.TestCase):
+    def setUp(self):
+        self.resource = MagicMock()
+        self.sleeps = []
+
+    def written_ids(self):
+        return [
+            [request['PutRequest']['Item']['id'] for request in call.kwargs['RequestItems']['CurrencyExchange']]
+            for call in self.resource.batch_write_item.call_args_list
+        ]
+
+    def test_writes_in_batches_of_25(self):
+        self.resource.batch_write_item.return_value = {}
+        writer = BatchWriter(self.resource, 'CurrencyExchange', sleep=self.sleeps.append)
+
+        writer.write({'id': str(index)} for index in range(60))
+
+        self.assertEqual([len(batch) for batch in self.written_ids()], [25, 25, 10])
+        report = writer.report()
+        self.assertEqual((report['items'], report['batches'], report['throttles']), (60, 3, 0))
+        self.assertIsNone(report['rate_limit'])
+
+    def test_retries_unprocessed_items_and_slows_down(self):
+        self.resource.batch_write_item.side_effect = [
+            {
+                'UnprocessedItems': {'CurrencyExchange': [{'PutRequest': {'Item': {'id': 'b'}}}]},
+                'ConsumedCapacity': [{'TableName': 'CurrencyExchange', 'CapacityUnits': 3.0,
+                                      'Table': {'CapacityUnits': 1.0}}],
+            },
+            {'UnprocessedItems': {}},
+        ]
+        writer = BatchWriter(self.resource, 'CurrencyExchange', write_capacity=8, sleep=self.sleeps.append)
+
+        writer.write([{'id': 'a'}, {'id': 'b'}])
+
+        self.assertEqual(self.written_ids(), [['a', 'b'], ['b']])
+        self.assertEqual(len(self.sleeps), 1)
+        report = writer.report()
+        self.assertEqual((report['items'], report['retried_items'], report['throttles']), (2, 1, 1))
+        self.assertEqual(report['consumed_wcu'], 1.0)
+        self.assertEqual(report['rate_limit'], 4.2)
+
+    def test_backs_off_throttled_batches_and_gives_up(self):
+        throttled = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'BatchWriteItem')
+        self.resource.batch_write_item.side_effect = throttled
+        writer = BatchWriter(self.resource, 'CurrencyExchange', max_attempts=4, base_delay=1.0,
+                             sleep=self.sleeps.append)
+
+        with self.assertRaises(ConnectionError):
+            writer.write([{'id': 'a'}])
+
+        self.assertEqual(self.resource.batch_write_item.call_count, 4)
+        self.assertTrue(all(delay <= 2 ** attempt for attempt, delay in enumerate(self.sleeps)))
+        self.assertEqual(writer.report()['throttles'], 4)
+
+    def test_first_throttle_slows_down_to_the_initial_rate(self):
+        throttled = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'BatchWriteItem')
+        self.resource.batch_write_item.side_effect = [throttled, {}]
+        writer = BatchWriter(self.resource, 'CurrencyExchange', initial_rate=25, sleep=self.sleeps.append)
+
+        writer.write({'id': str(index)} for index in range(25))
+
+        self.assertEqual(self.resource.batch_write_item.call_count, 2)
+        # The retry fits in the bucket of the initial rate, so only the backoff is slept
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertEqual(writer.report()['rate_limit'], 26.2)
+
+    def test_waits_past_the_remaining_time_fail(self):
+        writer = BatchWriter(self.resource, 'CurrencyExchange', write_capacity=5, sleep=self.sleeps.append,
+                             remaining_time=lambda: 2.0)
+
+        # 25 writes at 5 units per second would wait 4 s for the tokens of the first batch
+        with self.assertRaises(TimeoutError):
+            writer.write([{'id': str(index)} for index in range(25)])
+
+        self.resource.batch_write_item.assert_not_called()
+        self.assertEqual(self.sleeps, [])
+
+    def test_other_errors_are_raised(self):
+        self.resource.batch_write_item.side_effect = ClientError(
+            {'Error': {'Code': 'ValidationException'}}, 'BatchWriteItem'
+        )
+        writer = BatchWriter(self.resource, 'CurrencyExchange', sleep=self.sleeps.append)
+
+        with self.assertRaises(ClientError):
+            writer.write([{'id': 'a'}])
+        self.assertEqual(self.resource.batch_write_item.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import decimal
+import gzip
+import http.client
+import itertools
+import logging
+import random
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from xml.etree import ElementTree
+
+logger = logging.getLogger('currency_exchange')
+
+ECB_NAMESPACE = '{http://www.ecb.int/vocabulary/2002-08-01/eurofxref}'
+CUBE_TAG = ECB_NAMESPACE + 'Cube'
+FEED_CHUNK_SIZE = 64 * 1024
+# Seconds allowed to connect and for every read of the body. With the default attempts and
+# backoff of open_feed a failing feed gives up within 3 * 2 + 0.5 + 1 = 7.5 s, inside the
+# 10 s timeout of the cron function.
+FEED_TIMEOUT = 2
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def iter_ecb_rates(chunks):
+    """
+    Incrementally parses an ECB eurofxref feed into (date, currency, rate) tuples.
+
+    The bytes are fed to a pull parser as they arrive and every parsed Cube element is
+    dropped from the tree once it has been read, so the peak memory does not depend on
+    the size of the feed. This handles the daily, 90-day and full-history feeds alike.
+
+    Args:
+        chunks (iterable): The raw bytes of the feed, in chunks.
+
+    Yields:
+        tuple: (date, currency, decimal.Decimal rate) in feed order.
+    """
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    state = {'date': None, 'day_parent': None}
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from _drain_events(parser, state)
+    parser.close()
+    yield from _drain_events(parser, state)
+
+
+def _drain_events(parser, state):
+    for event, element in parser.read_events():
+        if element.tag != CUBE_TAG:
+            continue
+        if event == 'start':
+            if 'time' in element.attrib:
+                state['date'] = element.attrib['time']
+            elif 'currency' in element.attrib:
+                yield state['date'], element.attrib['currency'], decimal.Decimal(element.attrib['rate'])
+            else:
+                state['day_parent'] = element
+        elif 'time' in element.attrib:
+            # Detach the finished day so the tree never holds more than one day
+            element.clear()
+            if state['day_parent'] is not None:
+                state['day_parent'].remove(element)
+
+
+def iter_ecb_days(rates):
+    """
+    Groups consecutive (date, currency, rate) tuples into one entry per date.
+
+    Args:
+        rates (iterable): The tuples yielded by iter_ecb_rates.
+
+    Yields:
+        tuple: (date, [(currency, decimal.Decimal rate), ...]) in feed order.
+    """
+    for date_val, day_rates in itertools.groupby(rates, key=lambda rate: rate[0]):
+        yield date_val, [(currency, rate) for _, currency, rate in day_rates]
+
+
+def iter_file_chunks(file_path, chunk_size=FEED_CHUNK_SIZE):
+    """
+    Reads a local feed file in chunks.
+
+    Args:
+        file_path (str): The path of the XML file.
+        chunk_size (int): The number of bytes per chunk.
+
+    Yields:
+        bytes: The chunks of the file.
+    """
+    with open(file_path, 'rb') as xml_file:
+        while True:
+            chunk = xml_file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class FeedResponse:
+    """
+    The status, headers and streamed body of a feed request.
+
+    The body is decompressed on the fly when the server sent it gzip encoded.
+    """
+
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self._body = body
+        if body is not None and (headers.get('Content-Encoding') or '').lower() == 'gzip':
+            self._body = gzip.GzipFile(fileobj=body)
+
+    def iter_content(self, chunk_size=FEED_CHUNK_SIZE):
+        """
+        Reads the body in chunks of at most chunk_size bytes.
+        """
+        while True:
+            chunk = self._body.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise ConnectionError(f"Feed request failed with status {self.status_code}")
+
+    def close(self):
+        if self._body is not None:
+            self._body.close()
+
+
+def open_feed(url, validators=None, max_attempts=3, backoff_base=0.5, backoff_cap=1.0, timeout=FEED_TIMEOUT):
+    """
+    Opens a streaming GET of an ECB feed, conditional on the validators of a previous fetch.
+
+    Connection errors, timeouts and 429/5xx responses are retried with full-jitter
+    exponential backoff, at most max_attempts times in total. The request uses the
+    standard library, which keeps the HTTP client out of the handler's cold start.
+
+    Args:
+        url (str): The URL of the feed.
+        validators (dict, optional): The 'etag' and 'last_modified' of the previous fetch.
+        max_attempts (int): The maximum number of requests.
+        backoff_base (float): The backoff of the first retry, in seconds.
+        backoff_cap (float): The maximum backoff, in seconds.
+        timeout (float): The connect and read timeout, in seconds.
+
+    Returns:
+        FeedResponse: The last response, e.g. 200 or 304 Not Modified, or None if
+            every attempt failed without a response.
+    """
+    headers = {'Accept-Encoding': 'gzip'}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+    response = None
+    for attempt in range(max_attempts):
+        try:
+            raw_response = urlopen(Request(url, headers=headers), timeout=timeout)
+            response = FeedResponse(raw_response.status, raw_response.headers, raw_response)
+        except HTTPError as e:
+            # urllib raises for every status outside 2xx, 304 Not Modified included
+            response = FeedResponse(e.code, e.headers, e)
+        except (http.client.HTTPException, OSError) as e:
+            logger.warning("Feed Request Failed: %s", e)
+            response = None
+        if response is not None:
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+            logger.warning("Feed Request Status: %s", response.status_code)
+            # Release the connection of the discarded response
+            response.close()
+        if attempt + 1 < max_attempts:
+            time.sleep(random.uniform(0, min(backoff_cap, backoff_base * 2 ** attempt)))
+    return response
+
+
+def get_feed_validators(response):
+    """
+    Extracts the cache validators of a feed response.
+
+    Args:
+        response (FeedResponse): The response of the feed.
+
+    Returns:
+        dict: The 'etag' and 'last_modified' headers sent by the server.
+    """
+    validators = {}
+    if response.headers.get('ETag'):
+        validators['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        validators['last_modified'] = response.headers['Last-Modified']
+    return validators
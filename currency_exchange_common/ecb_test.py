@@ -0,0 +1,124 @@
+import gzip
+import threading
+import unittest
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from currency_exchange_common.ecb import get_feed_validators, iter_ecb_days, iter_ecb_rates, open_feed
+
+FEED_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref">
+    <gesmes:subject>Reference rates</gesmes:subject>
+    <Cube>
+        <Cube time="2023-07-06">
+            <Cube currency="USD" rate="1.0899"/>
+            <Cube currency="JPY" rate="156.57"/>
+        </Cube>
+        <Cube time="2023-07-05">
+            <Cube currency="USD" rate="1.0866"/>
+        </Cube>
+    </Cube>
+</gesmes:Envelope>"""
+
+
+class TestIterEcbRates(unittest.TestCase):
+    def test_parses_rates_across_chunk_boundaries(self):
+        chunks = [FEED_XML[start:start + 7] for start in range(0, len(FEED_XML), 7)]
+
+        rates = list(iter_ecb_rates(chunks))
+
+        self.assertEqual(rates, [
+            ('2023-07-06', 'USD', Decimal('1.0899')),
+            ('2023-07-06', 'JPY', Decimal('156.57')),
+            ('2023-07-05', 'USD', Decimal('1.0866')),
+        ])
+
+    def test_groups_rates_by_day(self):
+        days = list(iter_ecb_days(iter_ecb_rates([FEED_XML])))
+
+        self.assertEqual(days, [
+            ('2023-07-06', [('USD', Decimal('1.0899')), ('JPY', Decimal('156.57'))]),
+            ('2023-07-05', [('USD', Decimal('1.0866'))]),
+        ])
+
+
+class StubFeedHandler(BaseHTTPRequestHandler):
+    """
+    Serves FEED_XML with an ETag, after failing the first `failures` requests with a 503.
+    """
+    failures = 0
+    compress = False
+    requests_seen = []
+
+    def do_GET(self):
+        StubFeedHandler.requests_seen.append(dict(self.headers))
+        if StubFeedHandler.failures:
+            StubFeedHandler.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+        elif self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+        else:
+            body = FEED_XML
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            if StubFeedHandler.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                body = gzip.compress(FEED_XML)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestOpenFeed(unittest.TestCase):
+    def setUp(self):
+        StubFeedHandler.failures = 0
+        StubFeedHandler.compress = False
+        StubFeedHandler.requests_seen = []
+        self.server = HTTPServer(('127.0.0.1', 0), StubFeedHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/eurofxref-daily.xml"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retries_transient_failures(self):
+        StubFeedHandler.failures = 2
+
+        response = open_feed(self.url, backoff_base=0)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(StubFeedHandler.requests_seen), 3)
+        self.assertEqual(len(list(iter_ecb_rates(response.iter_content(chunk_size=16)))), 3)
+        self.assertEqual(get_feed_validators(response), {'etag': '"v1"'})
+
+    def test_decompresses_gzip_feeds(self):
+        StubFeedHandler.compress = True
+
+        response = open_feed(self.url)
+
+        self.assertEqual(b''.join(response.iter_content(chunk_size=16)), FEED_XML)
+
+    def test_gives_up_after_max_attempts(self):
+        StubFeedHandler.failures = 5
+
+        response = open_feed(self.url, max_attempts=2, backoff_base=0)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(StubFeedHandler.requests_seen), 2)
+
+    def test_sends_validators_and_gets_not_modified(self):
+        response = open_feed(self.url, validators={'etag': '"v1"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(StubFeedHandler.requests_seen[0]['If-None-Match'], '"v1"')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+def get_query_parameters(event):
+    """
+    Returns the query string parameters of a Lambda function URL event.
+
+    Args:
+        event (dict): The event data.
+
+    Returns:
+        dict: The query string parameters, empty if there are none.
+    """
+    return (event or {}).get('queryStringParameters') or {}
+
+
+def parse_list_parameter(value):
+    """
+    Parses a comma separated query string parameter into a list of upper case values.
+
+    Args:
+        value (str): The raw parameter value, e.g. "usd,JPY".
+
+    Returns:
+        list: The values, e.g. ['USD', 'JPY'], or an empty list if the parameter is missing.
+    """
+    if not value:
+        return []
+    return [part.strip().upper() for part in value.split(',') if part.strip()]
+
+
+def parse_fields_parameter(value, allowed):
+    """
+    Parses the comma separated 'fields' query string parameter.
+
+    Args:
+        value (str): The raw parameter value, e.g. "currency,rate".
+        allowed (tuple): The fields the endpoint returns.
+
+    Returns:
+        list: The requested fields in lower case, or an empty list for all of them.
+
+    Raises:
+        ValueError: If a field is not one of the allowed fields.
+    """
+    fields = [field.lower() for field in parse_list_parameter(value)]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field: {', '.join(unknown)}")
+    return fields
@@ -0,0 +1,138 @@
+import calendar
+import datetime
+
+from currency_exchange_common.business_days import get_calendar
+from currency_exchange_common.cross_rates import BASE_CURRENCY, rebase_rows
+from currency_exchange_common.dynamodb import batch_get_items
+from currency_exchange_common.keys import build_snapshot_key
+from currency_exchange_common.packed_rates import CURRENCY_DICTIONARIES
+
+HORIZONS = ('1d', '1w', '1m', 'ytd')
+
+
+def resolve_horizon_date(date, horizon):
+    """
+    Resolves the business day a change over a horizon is measured from.
+
+    Args:
+        date (datetime.date): The date of the current rates.
+        horizon (str): '1d' (previous business day), '1w' (one week earlier), '1m' (one
+            month earlier) or 'ytd' (last business day of the previous year).
+
+    Returns:
+        datetime.date: The business day of the past rates.
+    """
+    business_days = get_calendar(date)
+    if horizon == '1d':
+        return business_days.previous_business_day(date)
+    if horizon == '1w':
+        return business_days.latest_business_day(date - datetime.timedelta(days=7))
+    if horizon == '1m':
+        year, month = (date.year, date.month - 1) if date.month > 1 else (date.year - 1, 12)
+        day = min(date.day, calendar.monthrange(year, month)[1])
+        return business_days.latest_business_day(datetime.date(year, month, day))
+    if horizon == 'ytd':
+        return business_days.latest_business_day(datetime.date(date.year - 1, 12, 31))
+    raise ValueError(f"Unknown horizon: {horizon}")
+
+
+def fetch_horizon_rates(resource, table_name, currencies, date, horizons):
+    """
+    Reads the snapshots of every horizon date in one BatchGetItem.
+
+    Args:
+        resource (boto3.resources.base.ServiceResource): The DynamoDB resource.
+        table_name (str): The name of the table.
+        currencies (list): The currencies, in the column order of the result.
+        date (datetime.date): The date of the current rates.
+        horizons (list): The horizons, in the row order of the result.
+
+    Returns:
+        numpy.ndarray: A (horizons x currencies) matrix of EUR rates, NaN where missing.
+    """
+    import numpy as np
+
+    horizon_dates = [str(resolve_horizon_date(date, horizon)) for horizon in horizons]
+    keys = [{'id': build_snapshot_key(date_val)} for date_val in dict.fromkeys(horizon_dates)]
+    snapshots = {
+        snapshot['snapshot_date']: snapshot
+        for snapshot in batch_get_items(
+            resource, table_name, keys, ProjectionExpression='snapshot_date, rates, currency_dictionary'
+        )
+    }
+
+    rows = np.full((len(horizons), len(currencies)), np.nan)
+    for row, date_val in enumerate(horizon_dates):
+        snapshot = snapshots.get(date_val)
+        if not snapshot:
+            continue
+        rates = snapshot['rates']
+        if 'currency_dictionary' in snapshot:
+            # The packed vector is gathered into the row straight from the item's bytes
+            vector = np.frombuffer(getattr(rates, 'value', rates), dtype='<f8')
+            positions = {
+                currency: position
+                for position, currency in enumerate(CURRENCY_DICTIONARIES[int(snapshot['currency_dictionary'])])
+            }
+            columns = np.array([positions.get(currency, -1) for currency in currencies], dtype=np.intp)
+            rows[row] = np.where(columns >= 0, vector[columns], np.nan)
+        else:
+            rows[row] = [float(rates[currency]) if currency in rates else np.nan for currency in currencies]
+    return rows
+
+
+def select_horizon_columns(horizon_rates, columns, currencies):
+    """
+    Reorders the columns of a horizon matrix read for other currencies.
+
+    Args:
+        horizon_rates (numpy.ndarray): The (horizons x columns) matrix of past EUR rates.
+        columns (list): The currencies of the matrix columns.
+        currencies (list): The currencies, in the column order of the result.
+
+    Returns:
+        numpy.ndarray: The (horizons x currencies) matrix, or None if a currency has no column.
+    """
+    import numpy as np
+
+    positions = {currency: position for position, currency in enumerate(columns)}
+    if any(currency not in positions for currency in currencies):
+        return None
+    return horizon_rates[:, np.array([positions[currency] for currency in currencies], dtype=np.intp)]
+
+
+def compute_horizon_changes(currencies, current_rates, horizon_rates, horizons, base=BASE_CURRENCY, symbols=None):
+    """
+    Computes the absolute and percentage changes over every horizon as array operations.
+
+    The current rates and the horizon rates are stacked into one (dates x currencies)
+    matrix, rebased in one step and differenced against the first row.
+
+    Args:
+        currencies (list): The quoted currencies, without EUR.
+        current_rates (array-like): The current EUR rates, in currency order.
+        horizon_rates (numpy.ndarray): The (horizons x currencies) matrix of past EUR rates.
+        horizons (list): The horizons, in row order.
+        base (str): The currency the rates are expressed in.
+        symbols (list, optional): The currencies to return; all but the base by default.
+
+    Returns:
+        list: One {horizon: {'absolute': float, 'percent': float}} dict per returned currency,
+            with None where the past rate is missing.
+    """
+    import numpy as np
+
+    stacked = np.vstack([np.asarray(current_rates, dtype=np.float64), horizon_rates])
+    targets, rebased = rebase_rows(currencies, stacked, base, symbols)
+    absolute = rebased[0] - rebased[1:]
+    percent = absolute / rebased[1:] * 100
+
+    absolute = np.where(np.isnan(absolute), None, absolute).T.tolist()
+    percent = np.where(np.isnan(percent), None, percent).T.tolist()
+    return [
+        {
+            horizon: {'absolute': absolute[column][row], 'percent': percent[column][row]}
+            for row, horizon in enumerate(horizons)
+        }
+        for column in range(len(targets))
+    ]
@@ -0,0 +1,79 @@
+import datetime
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import numpy as np
+from boto3.dynamodb.types import Binary
+
+from currency_exchange_common.horizons import (
+    compute_horizon_changes, fetch_horizon_rates, resolve_horizon_date, select_horizon_columns
+)
+from currency_exchange_common.packed_rates import pack_rates
+
+
+class TestHorizons(unittest.TestCase):
+    def test_resolve_horizon_date(self):
+        date = datetime.date(2023, 4, 12)
+
+        self.assertEqual(resolve_horizon_date(date, '1d'), datetime.date(2023, 4, 11))
+        self.assertEqual(resolve_horizon_date(date, '1w'), datetime.date(2023, 4, 5))
+        self.assertEqual(resolve_horizon_date(date, '1m'), datetime.date(2023, 3, 10))
+        self.assertEqual(resolve_horizon_date(date, 'ytd'), datetime.date(2022, 12, 30))
+        self.assertEqual(resolve_horizon_date(datetime.date(2023, 3, 31), '1m'), datetime.date(2023, 2, 28))
+
+    def test_fetch_horizon_rates_in_one_batch(self):
+        resource = MagicMock()
+        resource.batch_get_item.return_value = {'Responses': {'CurrencyExchange': [
+            {'snapshot_date': '2023-04-11', 'rates': {'USD': Decimal('1.1'), 'JPY': Decimal('150')}},
+        ]}}
+
+        rows = fetch_horizon_rates(resource, 'CurrencyExchange', ['USD', 'JPY'], datetime.date(2023, 4, 12), ['1d', 'ytd'])
+
+        self.assertEqual(resource.batch_get_item.call_count, 1)
+        keys = resource.batch_get_item.call_args.kwargs['RequestItems']['CurrencyExchange']['Keys']
+        self.assertEqual(keys, [{'id': 'snapshot#2023-04-11'}, {'id': 'snapshot#2022-12-30'}])
+        self.assertEqual(rows[0].tolist(), [1.1, 150.0])
+        self.assertTrue(np.isnan(rows[1]).all())
+
+    def test_fetch_horizon_rates_from_packed_snapshots(self):
+        resource = MagicMock()
+        resource.batch_get_item.return_value = {'Responses': {'CurrencyExchange': [
+            {'snapshot_date': '2023-04-11', 'currency_dictionary': Decimal(1),
+             'rates': Binary(pack_rates(1, {'USD': Decimal('1.1'), 'JPY': Decimal('150')}))},
+        ]}}
+
+        rows = fetch_horizon_rates(resource, 'CurrencyExchange', ['JPY', 'USD', 'XAU'], datetime.date(2023, 4, 12), ['1d'])
+
+        self.assertEqual(rows[0, :2].tolist(), [150.0, 1.1])
+        self.assertTrue(np.isnan(rows[0, 2]))
+
+    def test_select_horizon_columns(self):
+        horizon_rates = np.array([[1.0, 100.0, 20.0]])
+
+        rows = select_horizon_columns(horizon_rates, ['USD', 'JPY', 'ZAR'], ['JPY', 'USD'])
+
+        self.assertEqual(rows.tolist(), [[100.0, 1.0]])
+        self.assertIsNone(select_horizon_columns(horizon_rates, ['USD', 'JPY', 'ZAR'], ['USD', 'GBP']))
+
+    def test_compute_horizon_changes(self):
+        horizon_rates = np.array([[1.0, 100.0], [np.nan, np.nan]])
+
+        changes = compute_horizon_changes(['USD', 'JPY'], [1.1, 121.0], horizon_rates, ['1d', 'ytd'])
+
+        self.assertAlmostEqual(changes[0]['1d']['absolute'], 0.1)
+        self.assertAlmostEqual(changes[0]['1d']['percent'], 10.0)
+        self.assertAlmostEqual(changes[1]['1d']['percent'], 21.0)
+        self.assertEqual(changes[1]['ytd'], {'absolute': None, 'percent': None})
+
+    def test_compute_horizon_changes_in_another_base(self):
+        changes = compute_horizon_changes(['USD', 'JPY'], [1.1, 121.0], np.array([[1.0, 100.0]]), ['1d'],
+                                          base='USD', symbols=['JPY'])
+
+        self.assertEqual(len(changes), 1)
+        self.assertAlmostEqual(changes[0]['1d']['absolute'], 10.0)
+        self.assertAlmostEqual(changes[0]['1d']['percent'], 10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
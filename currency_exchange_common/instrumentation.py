@@ -0,0 +1,146 @@
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_NAMESPACE = os.environ.get('METRIC_NAMESPACE', 'CurrencyExchange')
+
+logger = logging.getLogger('currency_exchange')
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+if not logging.getLogger().handlers:
+    # Outside Lambda the root logger has no handler, so messages would be dropped below WARNING
+    logger.addHandler(logging.StreamHandler())
+
+
+class Instrumentation:
+    """
+    Phase timers, embedded metric output and sampled debug logging of one invocation.
+
+    The phases are emitted once per invocation as a CloudWatch embedded metric format
+    (EMF) record, which CloudWatch turns into metrics without extra API calls. Debug
+    messages are only formatted when the logger is at DEBUG or the invocation was
+    sampled, so large values such as the fetched items cost nothing otherwise.
+    """
+
+    def __init__(self, function_name, debug_sample_rate=None):
+        if debug_sample_rate is None:
+            debug_sample_rate = float(os.environ.get('DEBUG_SAMPLE_RATE', '0'))
+        self.function_name = function_name
+        self.debug_sampled = random.random() < debug_sample_rate
+        self.phases = {}
+        self.counts = {}
+        self.properties = {}
+        # The backfill writes from several threads within one invocation
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times a phase of the invocation, adding up repeated phases of the same name.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed_ms
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def tally(self, name, key, value):
+        """
+        Adds a value to one key of a dict property, e.g. the capacity used per index.
+        """
+        with self._lock:
+            totals = self.properties.setdefault(name, {})
+            totals[key] = totals.get(key, 0) + value
+
+    def set_property(self, name, value):
+        # Properties are searchable in the log record but are not metrics
+        self.properties[name] = value
+
+    def debug_enabled(self):
+        return self.debug_sampled or logger.isEnabledFor(logging.DEBUG)
+
+    def debug(self, message, *args):
+        if self.debug_sampled:
+            logger.log(max(logger.getEffectiveLevel(), logging.DEBUG), message, *args)
+        else:
+            logger.debug(message, *args)
+
+    def info(self, message, *args):
+        logger.info(message, *args)
+
+    def build_metrics(self):
+        """
+        Builds the EMF record of the invocation.
+
+        Returns:
+            dict: The record, with one millisecond metric per phase plus 'total'.
+        """
+        values = {f'{name}_ms': round(elapsed_ms, 3) for name, elapsed_ms in self.phases.items()}
+        values['total_ms'] = round((time.perf_counter() - self._started_at) * 1000, 3)
+        metrics = [{'Name': name, 'Unit': 'Milliseconds'} for name in values]
+        metrics += [{'Name': name, 'Unit': 'Count'} for name in self.counts]
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRIC_NAMESPACE,
+                    'Dimensions': [['Function']],
+                    'Metrics': metrics,
+                }],
+            },
+            'Function': self.function_name,
+        }
+        record.update(self.properties)
+        record.update(values)
+        record.update(self.counts)
+        return record
+
+    def emit(self):
+        # EMF records must be written to stdout as plain JSON lines, without a logging prefix
+        print(json.dumps(self.build_metrics(), default=str))
+
+
+_current = None
+
+
+def current_invocation():
+    """
+    Returns the instrumentation of the running invocation, or a detached one outside a handler.
+    """
+    return _current if _current is not None else Instrumentation('unknown')
+
+
+def instrumented(function_name):
+    """
+    Decorates a Lambda handler to time its invocations and emit their metrics.
+
+    The handler and the functions it calls reach the instrumentation through
+    current_invocation().
+
+    Args:
+        function_name (str): The value of the 'Function' metric dimension.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            global _current
+            _current = Instrumentation(function_name)
+            try:
+                response = handler(event, context)
+                _current.set_property('status_code', (response or {}).get('statusCode'))
+                return response
+            finally:
+                _current.emit()
+                _current = None
+        return wrapper
+    return decorator
@@ -0,0 +1,80 @@
+import io
+import json
+import logging
+import unittest
+from contextlib import redirect_stdout
+
+from currency_exchange_common import instrumentation
+from currency_exchange_common.instrumentation import Instrumentation, current_invocation, instrumented
+
+
+class CountingValue:
+    """
+    Counts how often it is formatted into a log message.
+    """
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return 'value'
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.level = instrumentation.logger.level
+        instrumentation.logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        instrumentation.logger.setLevel(self.level)
+
+    def test_builds_embedded_metric_record(self):
+        invocation = Instrumentation('currency_exchange', debug_sample_rate=0)
+        with invocation.phase('db_read'):
+            pass
+        with invocation.phase('db_read'):
+            pass
+        invocation.count('item_count', 30)
+        invocation.set_property('date', '2023-07-06')
+
+        record = invocation.build_metrics()
+
+        directive = record['_aws']['CloudWatchMetrics'][0]
+        self.assertEqual(directive['Dimensions'], [['Function']])
+        self.assertEqual({metric['Name'] for metric in directive['Metrics']}, {'db_read_ms', 'total_ms', 'item_count'})
+        self.assertEqual(record['Function'], 'currency_exchange')
+        self.assertEqual(record['date'], '2023-07-06')
+        self.assertEqual(record['item_count'], 30)
+        self.assertGreaterEqual(record['total_ms'], record['db_read_ms'])
+
+    def test_debug_messages_are_only_formatted_when_sampled(self):
+        value = CountingValue()
+
+        Instrumentation('currency_exchange', debug_sample_rate=0).debug("Items: %s", value)
+        self.assertEqual(value.formatted, 0)
+
+        with self.assertLogs(instrumentation.logger, level=logging.INFO):
+            Instrumentation('currency_exchange', debug_sample_rate=1).debug("Items: %s", value)
+        self.assertEqual(value.formatted, 1)
+
+    def test_decorated_handler_emits_one_record(self):
+        @instrumented('currency_exchange_update_cron')
+        def handler(event, context):
+            with current_invocation().phase('ecb_fetch'):
+                pass
+            return {'statusCode': 200}
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            response = handler({}, None)
+
+        self.assertEqual(response, {'statusCode': 200})
+        record = json.loads(output.getvalue())
+        self.assertEqual(record['Function'], 'currency_exchange_update_cron')
+        self.assertEqual(record['status_code'], 200)
+        self.assertIn('ecb_fetch_ms', record)
+
+
+if __name__ == '__main__':
+    unittest.main()
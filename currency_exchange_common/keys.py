@@ -0,0 +1,38 @@
+def build_item_key(date_val, currency_val):
+    """
+    Builds the deterministic primary key for a currency rate on a given date.
+
+    Args:
+        date_val (str): The date value.
+        currency_val (str): The currency value.
+
+    Returns:
+        str: The item id, e.g. "2023-07-06#USD".
+    """
+    return f"{date_val}#{currency_val}"
+
+
+def build_snapshot_key(date_val):
+    """
+    Builds the primary key of the daily snapshot item for a given date.
+
+    Args:
+        date_val (str): The date value.
+
+    Returns:
+        str: The item id, e.g. "snapshot#2023-07-06".
+    """
+    return f"snapshot#{date_val}"
+
+
+def build_feed_state_key(url):
+    """
+    Builds the primary key of the item holding the cache validators of a feed.
+
+    Args:
+        url (str): The URL of the feed.
+
+    Returns:
+        str: The item id, e.g. "feed#http://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml".
+    """
+    return f"feed#{url}"
@@ -0,0 +1,84 @@
+import array
+import math
+import sys
+
+# Fixed currency orders a packed rate vector is laid out in, by version. A version is
+# never changed once snapshots use it; a new currency order gets a new version.
+CURRENCY_DICTIONARIES = {
+    1: (
+        'USD', 'JPY', 'BGN', 'CZK', 'DKK', 'GBP', 'HUF', 'PLN', 'RON', 'SEK', 'CHF', 'ISK', 'NOK', 'TRY', 'AUD',
+        'BRL', 'CAD', 'CNY', 'HKD', 'IDR', 'ILS', 'INR', 'KRW', 'MXN', 'MYR', 'NZD', 'PHP', 'SGD', 'THB', 'ZAR'
+    ),
+}
+
+
+def find_dictionary(currencies):
+    """
+    Finds the currency dictionary a day's currencies can be packed with.
+
+    The currencies must appear in the dictionary in the same order, so unpacking
+    gives them back in publication order; currencies the dictionary has but the day
+    lacks are packed as NaN.
+
+    Args:
+        currencies (list): The currencies of the day, in publication order.
+
+    Returns:
+        int: The latest fitting dictionary version, or None if none fits.
+    """
+    for version in sorted(CURRENCY_DICTIONARIES, reverse=True):
+        positions = {currency: position for position, currency in enumerate(CURRENCY_DICTIONARIES[version])}
+        indices = [positions.get(currency) for currency in currencies]
+        if None not in indices and indices == sorted(indices):
+            return version
+    return None
+
+
+def pack_rates(version, values):
+    """
+    Packs a day's values into a little-endian float64 vector in dictionary order.
+
+    Args:
+        version (int): The currency dictionary version.
+        values (dict): Currency -> rate, a number or decimal.Decimal.
+
+    Returns:
+        bytes: 8 bytes per dictionary currency, NaN for the currencies without a value.
+    """
+    vector = array.array('d', (
+        float(values[currency]) if currency in values else math.nan
+        for currency in CURRENCY_DICTIONARIES[version]
+    ))
+    if sys.byteorder != 'little':
+        vector.byteswap()
+    return vector.tobytes()
+
+
+def unpack_rates(packed):
+    """
+    Views a packed vector as floats without copying it.
+
+    numpy.frombuffer(packed, dtype='<f8') gives the same values as an array, for
+    callers that compute on them.
+
+    Args:
+        packed (bytes or boto3.dynamodb.types.Binary): The packed vector.
+
+    Returns:
+        memoryview or array.array: The float64 values in dictionary order.
+    """
+    packed = getattr(packed, 'value', packed)
+    if sys.byteorder == 'little':
+        return memoryview(packed).cast('d')
+    vector = array.array('d', packed)
+    vector.byteswap()
+    return vector
+
+
+def iter_packed_rates(version, packed):
+    """
+    Yields the (currency, rate) pairs of a packed vector, skipping the NaN entries.
+    """
+    for currency, rate in zip(CURRENCY_DICTIONARIES[version], unpack_rates(packed)):
+        if not math.isnan(rate):
+            yield currency, rate
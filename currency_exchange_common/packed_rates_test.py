@@ -0,0 +1,61 @@
+import math
+import unittest
+from decimal import Decimal
+
+from boto3.dynamodb.types import Binary
+
+from currency_exchange_common.packed_rates import find_dictionary, pack_rates, unpack_rates
+from currency_exchange_common.snapshots import build_snapshot, get_snapshot_rates, snapshot_to_items
+
+RATES = [('USD', Decimal('1.0899')), ('JPY', Decimal('156.57')), ('ZAR', Decimal('20.6276'))]
+PREVIOUS_RATES = [('USD', Decimal('1.0866')), ('JPY', Decimal('156.99'))]
+
+
+def as_stored(snapshot):
+    # DynamoDB returns binary attributes as Binary and numbers as Decimal
+    return {
+        name: Binary(value) if isinstance(value, bytes) else Decimal(value) if isinstance(value, int) else value
+        for name, value in snapshot.items()
+    }
+
+
+class TestPackedRates(unittest.TestCase):
+    def test_find_dictionary(self):
+        self.assertEqual(find_dictionary(['USD', 'JPY', 'ZAR']), 1)
+        self.assertIsNone(find_dictionary(['JPY', 'USD']))
+        self.assertIsNone(find_dictionary(['USD', 'HRK']))
+
+    def test_round_trip_with_missing_currencies(self):
+        packed = pack_rates(1, dict(RATES))
+
+        values = unpack_rates(Binary(packed))
+
+        self.assertEqual(len(packed), 30 * 8)
+        self.assertEqual(values[0], 1.0899)
+        self.assertEqual(values[29], 20.6276)
+        self.assertTrue(math.isnan(values[2]))
+
+    def test_packed_snapshot_serves_the_same_items(self):
+        map_previous = build_snapshot('2023-07-05', PREVIOUS_RATES, snapshot_format='map')
+        packed_previous = as_stored(build_snapshot('2023-07-05', PREVIOUS_RATES, snapshot_format='packed'))
+        self.assertEqual(get_snapshot_rates(packed_previous), dict(PREVIOUS_RATES))
+
+        map_snapshot = build_snapshot('2023-07-06', RATES, map_previous, snapshot_format='map')
+        packed_snapshot = build_snapshot('2023-07-06', RATES, packed_previous, snapshot_format='packed')
+
+        self.assertNotIn('currencies', packed_snapshot)
+        self.assertEqual(packed_snapshot['previous_date'], '2023-07-05')
+        self.assertEqual(
+            snapshot_to_items(as_stored(packed_snapshot), include_difference=True),
+            snapshot_to_items(map_snapshot, include_difference=True)
+        )
+
+    def test_days_without_a_dictionary_stay_maps(self):
+        snapshot = build_snapshot('2023-07-06', [('JPY', Decimal('156.57')), ('USD', Decimal('1.0899'))],
+                                  snapshot_format='packed')
+
+        self.assertEqual(snapshot['currencies'], ['JPY', 'USD'])
+
+
+if __name__ == '__main__':
+    unittest.main()
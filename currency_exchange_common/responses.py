@@ -0,0 +1,137 @@
+import base64
+import datetime
+import gzip
+import hashlib
+import json
+from email.utils import format_datetime
+
+# Bodies smaller than this are sent uncompressed, where the encoding overhead outweighs the saving
+MIN_COMPRESS_SIZE = 1024
+
+
+def get_request_header(event, name):
+    """
+    Returns a request header of a Lambda function URL event, ignoring the header case.
+
+    Args:
+        event (dict): The event data.
+        name (str): The header name.
+
+    Returns:
+        str: The header value, or None.
+    """
+    name = name.lower()
+    for key, value in ((event or {}).get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def choose_encoding(accept_encoding):
+    """
+    Picks the content encoding preferred by an Accept-Encoding header.
+
+    Only gzip is offered, from the standard library, so the function packages need no
+    compression dependency.
+
+    Args:
+        accept_encoding (str): The Accept-Encoding request header.
+
+    Returns:
+        str: 'gzip', or None for an uncompressed body.
+    """
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, parameters = part.strip().partition(';')
+        quality = 1.0
+        if parameters.strip().startswith('q='):
+            try:
+                quality = float(parameters.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    quality = qualities.get('gzip', qualities.get('*', 0.0))
+    return 'gzip' if quality > 0.0 else None
+
+
+def build_etag(data_date, payload, encoding=None):
+    """
+    Builds the strong ETag of a response from its data date and a digest of its JSON body.
+
+    Args:
+        data_date (str): The date of the served rates.
+        payload (bytes): The uncompressed JSON body.
+        encoding (str, optional): The content encoding, which gets its own ETag.
+
+    Returns:
+        str: The quoted ETag, e.g. '"2023-07-06-1f2e3d4c5b6a7988-gzip"'.
+    """
+    digest = hashlib.sha256(payload).hexdigest()[:16]
+    suffix = f"-{encoding}" if encoding else ''
+    return f'"{data_date}-{digest}{suffix}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Returns whether an If-None-Match header matches an ETag.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in [candidate[2:] if candidate.startswith('W/') else candidate
+                                         for candidate in candidates]
+
+
+def build_json_response(event, body, data_date, expires_at, current_utc_time, cacheable=True):
+    """
+    Builds a compressed, cacheable JSON response for a Lambda function URL.
+
+    Cacheable responses may be kept by clients and CDNs until the next publication, when
+    the served date changes. A request whose If-None-Match matches gets 304 Not Modified.
+
+    Args:
+        event (dict): The event data, for the Accept-Encoding and If-None-Match headers.
+        body (dict): The response body.
+        data_date (str): The date of the served rates.
+        expires_at (datetime.datetime): The next publication time.
+        current_utc_time (datetime.datetime): The current time in UTC.
+        cacheable (bool): False for data that may still change, e.g. a day read while
+            the cron is writing it, which is sent with 'no-cache'.
+
+    Returns:
+        dict: The response object containing the status code, headers and body.
+    """
+    payload = json.dumps(body).encode('utf-8')
+    encoding = None
+    if len(payload) >= MIN_COMPRESS_SIZE:
+        encoding = choose_encoding(get_request_header(event, 'Accept-Encoding'))
+
+    headers = {
+        'Content-Type': 'application/json',
+        'ETag': build_etag(data_date, payload, encoding),
+        'Vary': 'Accept-Encoding',
+    }
+    if cacheable:
+        max_age = max(int((expires_at - current_utc_time).total_seconds()), 0)
+        headers['Cache-Control'] = f'public, max-age={max_age}'
+        headers['Expires'] = format_datetime(expires_at.astimezone(datetime.timezone.utc), usegmt=True)
+    else:
+        headers['Cache-Control'] = 'no-cache'
+
+    if etag_matches(get_request_header(event, 'If-None-Match'), headers['ETag']):
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+
+    if encoding is None:
+        return {'statusCode': 200, 'headers': headers, 'body': payload.decode('utf-8')}
+
+    compressed = gzip.compress(payload, compresslevel=6, mtime=0)
+    headers['Content-Encoding'] = encoding
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': base64.b64encode(compressed).decode('ascii'),
+        'isBase64Encoded': True,
+    }
@@ -0,0 +1,59 @@
+import base64
+import gzip
+import json
+import unittest
+from datetime import datetime, timezone
+
+from currency_exchange_common.responses import build_json_response, choose_encoding, etag_matches
+
+NOW = datetime(2023, 7, 6, 16, 0, tzinfo=timezone.utc)
+NEXT_PUBLICATION = datetime(2023, 7, 7, 15, 0, tzinfo=timezone.utc)
+BODY = {'data': [{'currency': f'C{index:02d}', 'rate': index * 1.5} for index in range(60)], 'message': 'ok'}
+
+
+class TestResponses(unittest.TestCase):
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=0, deflate'), None)
+        self.assertEqual(choose_encoding(None), None)
+        self.assertEqual(choose_encoding('*'), 'gzip')
+        self.assertEqual(choose_encoding('br'), None)
+
+    def test_uncompressed_response_with_cache_headers(self):
+        response = build_json_response({}, BODY, '2023-07-06', NEXT_PUBLICATION, NOW)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body']), BODY)
+        self.assertEqual(response['headers']['Cache-Control'], 'public, max-age=82800')
+        self.assertEqual(response['headers']['Expires'], 'Fri, 07 Jul 2023 15:00:00 GMT')
+        self.assertTrue(response['headers']['ETag'].startswith('"2023-07-06-'))
+        self.assertNotIn('isBase64Encoded', response)
+
+    def test_gzip_response(self):
+        event = {'headers': {'accept-encoding': 'gzip'}}
+
+        response = build_json_response(event, BODY, '2023-07-06', NEXT_PUBLICATION, NOW)
+
+        self.assertTrue(response['isBase64Encoded'])
+        self.assertEqual(response['headers']['Content-Encoding'], 'gzip')
+        self.assertTrue(response['headers']['ETag'].endswith('-gzip"'))
+        self.assertEqual(json.loads(gzip.decompress(base64.b64decode(response['body']))), BODY)
+
+    def test_not_modified(self):
+        etag = build_json_response({}, BODY, '2023-07-06', NEXT_PUBLICATION, NOW)['headers']['ETag']
+
+        response = build_json_response({'headers': {'If-None-Match': etag}}, BODY, '2023-07-06', NEXT_PUBLICATION, NOW)
+
+        self.assertEqual(response['statusCode'], 304)
+        self.assertEqual(response['body'], '')
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+
+    def test_not_cacheable_response(self):
+        response = build_json_response({}, BODY, '2023-07-06', NEXT_PUBLICATION, NOW, cacheable=False)
+
+        self.assertEqual(response['headers']['Cache-Control'], 'no-cache')
+        self.assertNotIn('Expires', response['headers'])
+
+
+if __name__ == '__main__':
+    unittest.main()
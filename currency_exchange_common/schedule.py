@@ -0,0 +1,45 @@
+import datetime
+
+from currency_exchange_common.business_days import get_calendar
+
+# The cron ingests the ECB reference rates every day at 15:00 UTC
+PUBLICATION_HOUR_UTC = 15
+
+
+def resolve_rate_date(current_utc_time):
+    """
+    Resolves the latest date whose rates are published at the given time.
+
+    On a TARGET business day the day's rates are served from the 15:00 UTC cutover on;
+    before it, and on weekends and TARGET holidays, the previous business day's rates.
+
+    Args:
+        current_utc_time (datetime.datetime): The current time in UTC.
+
+    Returns:
+        datetime.date: The date to read the rates for.
+    """
+    today = current_utc_time.date()
+    calendar = get_calendar(today)
+    if current_utc_time.hour >= PUBLICATION_HOUR_UTC:
+        return calendar.latest_business_day(today)
+    return calendar.previous_business_day(today)
+
+
+def next_publication_time(current_utc_time):
+    """
+    Returns the next 15:00 UTC cutover of a TARGET business day strictly after the given time.
+
+    Args:
+        current_utc_time (datetime.datetime): The current time in UTC.
+
+    Returns:
+        datetime.datetime: The time at which the served date next changes.
+    """
+    today = current_utc_time.date()
+    calendar = get_calendar(today)
+    cutover = current_utc_time.replace(hour=PUBLICATION_HOUR_UTC, minute=0, second=0, microsecond=0)
+    if cutover <= current_utc_time or not calendar.is_business_day(today):
+        next_day = calendar.next_business_day(today)
+        cutover += datetime.timedelta(days=(next_day - today).days)
+    return cutover
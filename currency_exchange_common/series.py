@@ -0,0 +1,94 @@
+import datetime
+
+from boto3.dynamodb.conditions import Key
+
+from currency_exchange_common.dynamodb import iterate_items
+
+AGGREGATES = ('min', 'max', 'mean', 'volatility')
+
+
+def fetch_currency_series(table, currency, start, end, limit=None, index_name='CurrencyDateIndex'):
+    """
+    Fetches the daily rates of one currency between two dates, inclusive.
+
+    The read is a paginated key-condition Query on the currency/date GSI, so it only
+    touches the requested range. Dates stored twice, e.g. under an old random id and a
+    date/currency key, are returned once.
+
+    Args:
+        table (DynamoDB.Table): The DynamoDB table object.
+        currency (str): The currency.
+        start (str): The first date, as YYYY-MM-DD.
+        end (str): The last date, as YYYY-MM-DD.
+        limit (int, optional): The maximum number of dates to return.
+        index_name (str): The name of the GSI keyed on currency and date.
+
+    Returns:
+        list: {'date': str, 'rate': float} entries sorted by date.
+    """
+    items = iterate_items(
+        table.query,
+        IndexName=index_name,
+        KeyConditionExpression=Key('currency').eq(currency) & Key('date').between(start, end),
+        ProjectionExpression='#date, #rate',
+        ExpressionAttributeNames={
+            '#date': 'date',
+            '#rate': 'rate'
+        }
+    )
+    series = []
+    for item in items:
+        if series and series[-1]['date'] == item['date']:
+            continue
+        series.append({'date': item['date'], 'rate': float(item['rate'])})
+        if limit is not None and len(series) >= limit:
+            break
+    return series
+
+
+def compute_series_aggregates(rates, names=AGGREGATES):
+    """
+    Computes summary statistics of a rate series in vectorized form.
+
+    The volatility is the sample standard deviation of the daily log returns.
+
+    Args:
+        rates (array-like): The rates in date order.
+        names (iterable): The aggregates to compute, among AGGREGATES.
+
+    Returns:
+        dict: The requested aggregates, None when the series is too short.
+    """
+    import numpy as np
+
+    values = np.asarray(rates, dtype=np.float64)
+    aggregates = {}
+    for name in names:
+        if name == 'volatility':
+            log_returns = np.diff(np.log(values))
+            aggregates[name] = float(np.std(log_returns, ddof=1)) if log_returns.size > 1 else None
+        elif values.size == 0:
+            aggregates[name] = None
+        else:
+            aggregates[name] = float(getattr(np, name)(values))
+    return aggregates
+
+
+def parse_date_parameter(value, name):
+    """
+    Validates a YYYY-MM-DD query string parameter.
+
+    Args:
+        value (str): The raw parameter value.
+        name (str): The name of the parameter, for the error message.
+
+    Returns:
+        str: The normalized date.
+
+    Raises:
+        ValueError: If the value is missing or not a date.
+    """
+    try:
+        return str(datetime.date.fromisoformat(value or ''))
+    except ValueError:
+        raise ValueError(f"Invalid {name} date: {value}")
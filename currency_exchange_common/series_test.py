@@ -0,0 +1,43 @@
+import math
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from currency_exchange_common.series import compute_series_aggregates, fetch_currency_series, parse_date_parameter
+
+
+class TestSeries(unittest.TestCase):
+    def test_fetch_currency_series_pages_and_deduplicates(self):
+        table = MagicMock()
+        table.query.side_effect = [
+            {
+                'Items': [{'date': '2023-07-03', 'rate': Decimal('1.09')}, {'date': '2023-07-03', 'rate': Decimal('1.09')}],
+                'LastEvaluatedKey': {'id': '2023-07-03#USD'}
+            },
+            {'Items': [{'date': '2023-07-04', 'rate': Decimal('1.1')}]},
+        ]
+
+        series = fetch_currency_series(table, 'USD', '2023-07-01', '2023-07-31')
+
+        self.assertEqual(series, [{'date': '2023-07-03', 'rate': 1.09}, {'date': '2023-07-04', 'rate': 1.1}])
+        self.assertEqual(table.query.call_args.kwargs['IndexName'], 'CurrencyDateIndex')
+
+    def test_compute_series_aggregates(self):
+        aggregates = compute_series_aggregates([1.0, 2.0, 4.0])
+
+        self.assertEqual(aggregates['min'], 1.0)
+        self.assertEqual(aggregates['max'], 4.0)
+        self.assertAlmostEqual(aggregates['mean'], 7 / 3)
+        self.assertAlmostEqual(aggregates['volatility'], 0.0)
+        self.assertEqual(compute_series_aggregates([1.0], ['volatility']), {'volatility': None})
+        self.assertTrue(math.isclose(compute_series_aggregates([1.0, 2.0, 2.0], ['volatility'])['volatility'],
+                                     math.log(2) / math.sqrt(2)))
+
+    def test_parse_date_parameter(self):
+        self.assertEqual(parse_date_parameter('2023-07-01', 'start'), '2023-07-01')
+        with self.assertRaises(ValueError):
+            parse_date_parameter('07/01/2023', 'start')
+
+
+if __name__ == '__main__':
+    unittest.main()
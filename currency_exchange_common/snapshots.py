@@ -0,0 +1,175 @@
+import decimal
+import math
+import os
+
+from currency_exchange_common.business_days import business_days_before
+from currency_exchange_common.dynamodb import batch_get_items
+from currency_exchange_common.keys import build_item_key, build_snapshot_key
+from currency_exchange_common.packed_rates import (
+    CURRENCY_DICTIONARIES, find_dictionary, iter_packed_rates, pack_rates, unpack_rates
+)
+
+# 'map' stores the rates as Decimal maps, 'packed' as float64 vectors in a versioned currency order
+SNAPSHOT_FORMAT = os.environ.get('SNAPSHOT_FORMAT', 'map')
+
+
+def get_snapshot_rates(snapshot):
+    """
+    Returns the rates of a snapshot in either storage format.
+
+    Args:
+        snapshot (dict): The snapshot item, or any dict with a 'rates' map.
+
+    Returns:
+        dict: Currency -> decimal.Decimal rate.
+    """
+    if 'currency_dictionary' in snapshot:
+        # ECB rates have at most 6 significant digits, which the float's repr gives back exactly
+        return {
+            currency: decimal.Decimal(repr(rate))
+            for currency, rate in iter_packed_rates(int(snapshot['currency_dictionary']), snapshot['rates'])
+        }
+    return snapshot.get('rates', {})
+
+
+def build_snapshot(date_val, rates, previous_snapshot=None, snapshot_format=None):
+    """
+    Builds the materialized snapshot item holding every rate of a date.
+
+    The snapshot has neither a 'date' nor a 'currency' attribute, so it stays out of
+    the DateIndex and CurrencyDateIndex GSIs that hold the per-currency items.
+
+    In the packed format the rates and differences are float64 vectors laid out in
+    the order of a currency dictionary, whose version the snapshot records. A day
+    whose currencies no dictionary fits is stored in the map format.
+
+    Without the rates of a previous day the snapshot has no 'differences', and the
+    fetchers compute them from the per-currency items instead.
+
+    Args:
+        date_val (str): The date of the rates.
+        rates (list): (currency, decimal.Decimal rate) pairs in publication order.
+        previous_snapshot (dict, optional): The snapshot of the previous business day,
+            or any dict with its 'snapshot_date' and a 'rates' map.
+        snapshot_format (str, optional): 'map' or 'packed'; SNAPSHOT_FORMAT by default.
+
+    Returns:
+        dict: The snapshot item.
+    """
+    currencies = [currency for currency, _ in rates]
+    version = find_dictionary(currencies) if (snapshot_format or SNAPSHOT_FORMAT) == 'packed' else None
+    if version is not None:
+        snapshot = {
+            'id': build_snapshot_key(date_val),
+            'snapshot_date': date_val,
+            'currency_dictionary': version,
+            'rates': pack_rates(version, dict(rates)),
+        }
+    else:
+        snapshot = {
+            'id': build_snapshot_key(date_val),
+            'snapshot_date': date_val,
+            'currencies': currencies,
+            'rates': {currency: rate for currency, rate in rates},
+        }
+    if previous_snapshot:
+        previous_rates = get_snapshot_rates(previous_snapshot)
+        differences = {currency: rate - previous_rates.get(currency, rate) for currency, rate in rates}
+        snapshot['differences'] = pack_rates(version, differences) if version is not None else differences
+        snapshot['previous_date'] = previous_snapshot['snapshot_date']
+    return snapshot
+
+
+def fetch_snapshot(table, date_val):
+    """
+    Fetches the snapshot of a date with a single GetItem.
+
+    Args:
+        table (boto3.resources.factory.dynamodb.Table): The DynamoDB table.
+        date_val (str): The date value.
+
+    Returns:
+        dict: The snapshot item, or None if the date has no snapshot.
+    """
+    response = table.get_item(Key={'id': build_snapshot_key(date_val)})
+    return response.get('Item')
+
+
+def fetch_latest_snapshot_before(resource, table_name, date, lookback_days=5):
+    """
+    Fetches the most recent snapshot strictly before a date.
+
+    The candidate dates are the preceding TARGET business days, read with one
+    BatchGetItem, so a missed cron day still finds the latest earlier snapshot.
+
+    Args:
+        resource (boto3.resources.base.ServiceResource): The DynamoDB resource.
+        table_name (str): The name of the table.
+        date (datetime.date): The date to look back from.
+        lookback_days (int): The number of business days to look back.
+
+    Returns:
+        dict: The latest snapshot found, or None.
+    """
+    keys = [
+        {'id': build_snapshot_key(str(business_day))}
+        for business_day in business_days_before(date, lookback_days)
+    ]
+    snapshots = list(batch_get_items(resource, table_name, keys))
+    if not snapshots:
+        return None
+    return max(snapshots, key=lambda snapshot: snapshot['snapshot_date'])
+
+
+def snapshot_to_items(snapshot, include_difference=False):
+    """
+    Converts a snapshot into the per-currency items returned by the fetchers.
+
+    Packed vectors are read in place, without being copied or converted to Decimal.
+
+    Args:
+        snapshot (dict): The snapshot item.
+        include_difference (bool): Whether to add the 'yesterday_difference' field; the
+            snapshot must then have 'differences'.
+
+    Returns:
+        list: The items in publication order, with float rates.
+    """
+    if 'currency_dictionary' in snapshot:
+        return packed_snapshot_to_items(snapshot, include_difference)
+    date_val = snapshot['snapshot_date']
+    items = []
+    for currency in snapshot['currencies']:
+        item = {
+            'id': build_item_key(date_val, currency),
+            'currency': currency,
+            'date': date_val,
+            'rate': float(snapshot['rates'][currency]),
+        }
+        if include_difference:
+            item['yesterday_difference'] = float(snapshot['differences'].get(currency, decimal.Decimal(0)))
+        items.append(item)
+    return items
+
+
+def packed_snapshot_to_items(snapshot, include_difference=False):
+    """
+    Converts a packed snapshot into the same items as snapshot_to_items.
+    """
+    date_val = snapshot['snapshot_date']
+    rates = unpack_rates(snapshot['rates'])
+    differences = unpack_rates(snapshot['differences']) if include_difference else None
+    items = []
+    for position, currency in enumerate(CURRENCY_DICTIONARIES[int(snapshot['currency_dictionary'])]):
+        if math.isnan(rates[position]):
+            continue
+        item = {
+            'id': build_item_key(date_val, currency),
+            'currency': currency,
+            'date': date_val,
+            'rate': rates[position],
+        }
+        if include_difference:
+            item['yesterday_difference'] = differences[position]
+        items.append(item)
+    return items
@@ -0,0 +1,282 @@
+import argparse
+import datetime
+import itertools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from currency_exchange_common.clients import get_dynamodb_resource
+from currency_exchange_common.dynamodb import BatchWriter, batch_get_items, get_provisioned_write_capacity
+from currency_exchange_common.ecb import FEED_CHUNK_SIZE, iter_ecb_days, iter_ecb_rates, iter_file_chunks, open_feed
+from currency_exchange_common.keys import build_item_key, build_snapshot_key
+from currency_exchange_common.snapshots import build_snapshot, fetch_latest_snapshot_before
+
+TABLE_NAME = 'CurrencyExchange'
+HISTORY_90_DAYS_URL = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist-90d.xml"
+HISTORY_FULL_URL = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist.xml"
+
+
+def iter_history_days(source):
+    """
+    Streams an ECB history feed from a URL or a local file, one date at a time.
+
+    Args:
+        source (str): An http(s) URL or the path of a local eurofxref-hist XML file.
+
+    Yields:
+        tuple: (date, [(currency, decimal.Decimal rate), ...]) in feed order, newest date first.
+    """
+    if source.startswith(('http://', 'https://')):
+        response = open_feed(source)
+        if response is None:
+            raise ConnectionError(f"Could not fetch {source}")
+        response.raise_for_status()
+        chunks = response.iter_content(chunk_size=FEED_CHUNK_SIZE)
+    else:
+        chunks = iter_file_chunks(source)
+    yield from iter_ecb_days(iter_ecb_rates(chunks))
+
+
+def iter_days_with_previous(days, oldest_previous_snapshot=None):
+    """
+    Pairs every date of a newest-first feed with the rates of the previous business day.
+
+    The previous business day of a date is the next date of the feed, so one date of
+    lookahead is enough. The oldest date is paired with oldest_previous_snapshot.
+
+    Args:
+        days (iterable): (date, rates) pairs, newest date first.
+        oldest_previous_snapshot (callable, optional): Returns the previous snapshot of the oldest date.
+
+    Yields:
+        tuple: (date, rates, previous snapshot or None).
+    """
+    pending = None
+    for date_val, rates in days:
+        if pending:
+            previous = {'snapshot_date': date_val, 'rates': dict(rates)}
+            yield pending[0], pending[1], previous
+        pending = (date_val, rates)
+    if pending:
+        previous = oldest_previous_snapshot(pending[0]) if oldest_previous_snapshot else None
+        yield pending[0], pending[1], previous
+
+
+def read_checkpoint(checkpoint_path, source):
+    """
+    Reads the progress of an interrupted backfill run of the same source.
+
+    Args:
+        checkpoint_path (str): The path of the checkpoint file.
+        source (str): The source of the run being started.
+
+    Returns:
+        dict: The 'newest_date' of the interrupted run and the 'last_completed_date' down
+            to which it wrote every date, or None if there is no checkpoint of the source.
+    """
+    if not checkpoint_path or not os.path.isfile(checkpoint_path):
+        return None
+    with open(checkpoint_path, 'r') as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    if checkpoint.get('source') != source:
+        print("Checkpoint Ignored:", checkpoint)
+        return None
+    return checkpoint
+
+
+def write_checkpoint(checkpoint_path, source, newest_date, last_completed_date):
+    """
+    Records that every date from newest_date down to last_completed_date is written, so
+    an interrupted backfill of the same source resumes with the other dates.
+
+    Args:
+        checkpoint_path (str): The path of the checkpoint file.
+        source (str): The source of the run.
+        newest_date (str): The newest date of the run.
+        last_completed_date (str): The last completed date.
+    """
+    if not checkpoint_path:
+        return
+    with open(checkpoint_path, 'w') as checkpoint_file:
+        json.dump({
+            'source': source, 'newest_date': newest_date, 'last_completed_date': last_completed_date
+        }, checkpoint_file)
+
+
+def clear_checkpoint(checkpoint_path):
+    """
+    Removes the checkpoint of a completed run, so a later run checks every date again.
+    """
+    if checkpoint_path and os.path.isfile(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+def fetch_existing_dates(resource, table_name, dates):
+    """
+    Fetches which of the given dates already have a snapshot item.
+
+    Args:
+        resource (boto3.resources.base.ServiceResource): The DynamoDB resource.
+        table_name (str): The name of the table.
+        dates (list): The dates to check.
+
+    Returns:
+        set: The dates that already exist.
+    """
+    keys = [{'id': build_snapshot_key(date_val)} for date_val in dates]
+    items = batch_get_items(resource, table_name, keys, ProjectionExpression='snapshot_date')
+    return {item['snapshot_date'] for item in items}
+
+
+def build_chunk_items(chunk):
+    """
+    Builds the per-currency items and the snapshots of a chunk of dates.
+
+    Args:
+        chunk (list): (date, rates, previous snapshot) tuples.
+
+    Returns:
+        tuple: The per-currency items and the snapshot items.
+    """
+    items = []
+    snapshots = []
+    for date_val, rates, previous_snapshot in chunk:
+        for currency, rate in rates:
+            items.append({
+                'id': build_item_key(date_val, currency),
+                'currency': currency,
+                'rate': rate,
+                'date': date_val
+            })
+        snapshots.append(build_snapshot(date_val, rates, previous_snapshot))
+    return items, snapshots
+
+
+def write_chunk(writer, items, snapshots):
+    """
+    Writes a chunk with batch writes, the snapshots only once all of their items are stored.
+
+    Items are keyed by date and currency, so rewriting a partially written chunk is idempotent.
+    The writer is shared by the threads writing chunks at once, which keeps their combined
+    rate within the write capacity of the table.
+
+    Args:
+        writer (currency_exchange_common.dynamodb.BatchWriter): The rate-limited writer.
+        items (list): The per-currency items.
+        snapshots (list): The snapshot items.
+    """
+    writer.write(items)
+    writer.write(snapshots)
+
+
+def iter_chunks(values, chunk_size):
+    """
+    Groups an iterable into lists of at most chunk_size values.
+    """
+    iterator = iter(values)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def backfill_history(source, checkpoint_path=None, max_workers=4, chunk_size=20, write_capacity=None):
+    """
+    Ingests an ECB history feed, skipping dates that are already stored.
+
+    The feed is streamed newest date first and at most two chunks per worker are held in
+    memory, so the full history loads with a bounded footprint. While the run is going,
+    the checkpoint holds the range of dates that have been written, which a rerun of the
+    same source skips; it is removed once the run completes.
+
+    Args:
+        source (str): An http(s) URL or the path of a local eurofxref-hist XML file.
+        checkpoint_path (str, optional): The checkpoint file used to resume an interrupted run.
+        max_workers (int): The number of chunks written in parallel.
+        chunk_size (int): The number of dates per chunk, at most 100.
+        write_capacity (float, optional): The write units per second to hold the writes to.
+            Defaults to the provisioned capacity of the table; 0 does not limit the writes.
+
+    Returns:
+        dict: The number of dates written and skipped, the number of items written and the
+            throughput report of the writes.
+    """
+    checkpoint = read_checkpoint(checkpoint_path, source)
+    resource = get_dynamodb_resource()
+    if write_capacity is None:
+        write_capacity = get_provisioned_write_capacity(resource.meta.client, TABLE_NAME)
+    writer = BatchWriter(resource, TABLE_NAME, write_capacity=write_capacity)
+
+    def oldest_previous_snapshot(date_val):
+        return fetch_latest_snapshot_before(resource, TABLE_NAME, datetime.date.fromisoformat(date_val))
+
+    days = iter_days_with_previous(iter_history_days(source), oldest_previous_snapshot)
+    totals = {'dates_written': 0, 'dates_skipped': 0, 'items_written': 0}
+    chunk_oldest_dates = []
+    newest_date = None
+    completed_chunks = set()
+    futures = {}
+
+    def wait_for_chunk():
+        future = next(as_completed(list(futures)))
+        index, item_count = futures.pop(future)
+        future.result()
+        totals['items_written'] += item_count
+        completed_chunks.add(index)
+        # The checkpoint only moves past chunks whose newer predecessors are all written
+        contiguous_count = 0
+        while contiguous_count in completed_chunks:
+            contiguous_count += 1
+        if contiguous_count:
+            write_checkpoint(checkpoint_path, source, newest_date, chunk_oldest_dates[contiguous_count - 1])
+
+    def written_before(date_val):
+        return checkpoint is not None and checkpoint['last_completed_date'] <= date_val <= checkpoint['newest_date']
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk in iter_chunks(days, chunk_size):
+            newest_date = newest_date or chunk[0][0]
+            resumed = [day for day in chunk if not written_before(day[0])]
+            existing_dates = fetch_existing_dates(resource, TABLE_NAME, [day[0] for day in resumed])
+            pending = [day for day in resumed if day[0] not in existing_dates]
+            totals['dates_skipped'] += len(chunk) - len(pending)
+            totals['dates_written'] += len(pending)
+
+            items, snapshots = build_chunk_items(pending)
+            chunk_oldest_dates.append(chunk[-1][0])
+            futures[executor.submit(write_chunk, writer, items, snapshots)] = (len(chunk_oldest_dates) - 1, len(items))
+            print("Chunk Submitted:", chunk[0][0], "-", chunk[-1][0])
+
+            while len(futures) >= 2 * max_workers:
+                wait_for_chunk()
+        while futures:
+            wait_for_chunk()
+    clear_checkpoint(checkpoint_path)
+
+    print("Dates Written:", totals['dates_written'])
+    print("Dates Skipped:", totals['dates_skipped'])
+    totals['write_throughput'] = writer.report()
+    print("Write Throughput:", totals['write_throughput'])
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill the CurrencyExchange table from an ECB history feed')
+    parser.add_argument('--source', default=HISTORY_90_DAYS_URL,
+                        help='URL or local path of eurofxref-hist-90d.xml / eurofxref-hist.xml')
+    parser.add_argument('--full-history', action='store_true', help='Use the full ECB history feed')
+    parser.add_argument('--checkpoint', default='backfill_checkpoint.json', help='Checkpoint file path')
+    parser.add_argument('--max-workers', type=int, default=4, help='Number of parallel chunk writers')
+    parser.add_argument('--chunk-size', type=int, default=20, help='Number of dates per chunk')
+    parser.add_argument('--write-capacity', type=float,
+                        help='Write units per second, defaults to the provisioned capacity of the table; 0 for no limit')
+    args = parser.parse_args()
+
+    print(backfill_history(
+        source=HISTORY_FULL_URL if args.full_history else args.source,
+        checkpoint_path=args.checkpoint,
+        max_workers=args.max_workers,
+        chunk_size=args.chunk_size,
+        write_capacity=args.write_capacity
+    ))
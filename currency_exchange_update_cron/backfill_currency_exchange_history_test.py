@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from currency_exchange_common.clients import set_dynamodb_resource
+from currency_exchange_update_cron.backfill_currency_exchange_history import backfill_history, iter_history_days
+
+HISTORY_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref">
+    <gesmes:subject>Reference rates</gesmes:subject>
+    <Cube>
+        <Cube time="2023-07-06">
+            <Cube currency="USD" rate="1.0899"/>
+            <Cube currency="JPY" rate="156.57"/>
+        </Cube>
+        <Cube time="2023-07-05">
+            <Cube currency="USD" rate="1.0866"/>
+            <Cube currency="JPY" rate="156.99"/>
+        </Cube>
+        <Cube time="2023-07-04">
+            <Cube currency="USD" rate="1.0888"/>
+            <Cube currency="JPY" rate="157.02"/>
+        </Cube>
+    </Cube>
+</gesmes:Envelope>"""
+
+
+class TestBackfillCurrencyExchangeHistory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, 'eurofxref-hist.xml')
+        with open(self.source, 'wb') as xml_file:
+            xml_file.write(HISTORY_XML)
+        self.checkpoint = os.path.join(self.directory.name, 'checkpoint.json')
+
+        self.dynamodb_mock = mock.MagicMock()
+        self.dynamodb_mock.meta.client.describe_table.return_value = {
+            'Table': {'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}}
+        }
+        self.dynamodb_mock.batch_write_item.return_value = {}
+        set_dynamodb_resource(self.dynamodb_mock)
+
+    def tearDown(self):
+        set_dynamodb_resource(None)
+        self.directory.cleanup()
+
+    def stored_snapshots(self, *dates):
+        def batch_get_item(RequestItems):
+            keys = [key['id'] for key in RequestItems['CurrencyExchange']['Keys']]
+            found = [{'snapshot_date': date_val, 'rates': {}} for date_val in dates if f'snapshot#{date_val}' in keys]
+            return {'Responses': {'CurrencyExchange': found}}
+        self.dynamodb_mock.batch_get_item.side_effect = batch_get_item
+
+    def written_items(self):
+        return [
+            request['PutRequest']['Item']
+            for call in self.dynamodb_mock.batch_write_item.call_args_list
+            for request in call.kwargs['RequestItems']['CurrencyExchange']
+        ]
+
+    def test_iter_history_days_streams_newest_first(self):
+        history = list(iter_history_days(self.source))
+
+        self.assertEqual([date_val for date_val, _ in history], ['2023-07-06', '2023-07-05', '2023-07-04'])
+        self.assertEqual(history[2][1], [('USD', Decimal('1.0888')), ('JPY', Decimal('157.02'))])
+
+    def test_skips_existing_dates_and_writes_checkpoint(self):
+        self.stored_snapshots('2023-07-05')
+
+        result = backfill_history(self.source, checkpoint_path=self.checkpoint, max_workers=2, chunk_size=1)
+
+        throughput = result.pop('write_throughput')
+        self.assertEqual(result, {'dates_written': 2, 'dates_skipped': 1, 'items_written': 4})
+        self.assertEqual(throughput['items'], 6)
+        self.assertEqual(throughput['rate_limit'], 5.0)
+        written = self.written_items()
+        self.assertEqual(
+            sorted(item['id'] for item in written),
+            ['2023-07-04#JPY', '2023-07-04#USD', '2023-07-06#JPY', '2023-07-06#USD',
+             'snapshot#2023-07-04', 'snapshot#2023-07-06']
+        )
+        snapshot = next(item for item in written if item['id'] == 'snapshot#2023-07-06')
+        self.assertEqual(snapshot['previous_date'], '2023-07-05')
+        self.assertEqual(snapshot['differences']['USD'], Decimal('0.0033'))
+        # A completed run leaves no checkpoint behind
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_interrupted_run_keeps_its_checkpoint(self):
+        self.stored_snapshots()
+        self.dynamodb_mock.batch_write_item.side_effect = [{}, {}, RuntimeError('interrupted')]
+
+        with self.assertRaises(RuntimeError):
+            backfill_history(self.source, checkpoint_path=self.checkpoint, max_workers=1, chunk_size=1)
+
+        with open(self.checkpoint) as checkpoint_file:
+            self.assertEqual(json.load(checkpoint_file), {
+                'source': self.source, 'newest_date': '2023-07-06', 'last_completed_date': '2023-07-06'
+            })
+
+    def test_resumes_after_checkpoint(self):
+        with open(self.checkpoint, 'w') as checkpoint_file:
+            json.dump({
+                'source': self.source, 'newest_date': '2023-07-05', 'last_completed_date': '2023-07-05'
+            }, checkpoint_file)
+        self.stored_snapshots()
+
+        result = backfill_history(self.source, checkpoint_path=self.checkpoint)
+
+        # The run that was interrupted did not cover 2023-07-06, which is newer than its feed
+        self.assertEqual(result['dates_written'], 2)
+        written_ids = sorted(item['id'] for item in self.written_items())
+        self.assertEqual(written_ids, [
+            '2023-07-04#JPY', '2023-07-04#USD', '2023-07-06#JPY', '2023-07-06#USD',
+            'snapshot#2023-07-04', 'snapshot#2023-07-06'
+        ])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_checkpoint_of_another_source_is_ignored(self):
+        with open(self.checkpoint, 'w') as checkpoint_file:
+            json.dump({
+                'source': 'eurofxref-hist-90d.xml', 'newest_date': '2023-07-06', 'last_completed_date': '2023-07-04'
+            }, checkpoint_file)
+        self.stored_snapshots('2023-07-04', '2023-07-06')
+
+        result = backfill_history(self.source, checkpoint_path=self.checkpoint)
+
+        self.assertEqual(result['dates_written'], 1)
+        self.assertEqual(sorted(item['id'] for item in self.written_items()),
+                         ['2023-07-05#JPY', '2023-07-05#USD', 'snapshot#2023-07-05'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,106 +1,203 @@
-import decimal
+import datetime
 import json
-import requests
-import xmltodict
-import boto3
-import uuid
+from boto3.dynamodb.conditions import Key
 
+from currency_exchange_common.business_days import previous_business_day
+from currency_exchange_common.clients import get_dynamodb_resource, get_table
+from currency_exchange_common.dynamodb import BatchWriter, get_provisioned_write_capacity, iterate_items
+from currency_exchange_common.ecb import FEED_CHUNK_SIZE, get_feed_validators, iter_ecb_days, iter_ecb_rates, open_feed
+from currency_exchange_common.instrumentation import current_invocation, instrumented
+from currency_exchange_common.keys import build_feed_state_key, build_item_key
+from currency_exchange_common.snapshots import build_snapshot, fetch_latest_snapshot_before
 
-def render_xml_as_dict(url):
+# Seconds of the invocation kept for the snapshot and feed state writes after the batch writes
+WRITE_TIME_RESERVE = 1.0
+
+
+def fetch_daily_rates(url, validators=None):
     """
-    Fetches XML data from the provided URL and converts it to a dictionary.
+    Fetches the ECB daily feed from the provided URL and parses it while it streams in.
+
+    The request is conditional on the validators of the previous fetch and transient
+    failures are retried with backoff.
 
     Args:
         url (str): The URL to fetch the XML data from.
+        validators (dict, optional): The 'etag' and 'last_modified' of the previous fetch.
 
     Returns:
-        dict: The XML data as a dictionary.
+        tuple: The HTTP status code, the date, its [(currency, decimal.Decimal rate), ...]
+            pairs and the validators of this fetch. The date is None unless the status is 200.
     """
-    response = requests.get(url)
-    if response.status_code == 200:
-        xml_data = response.content
-        xml_dict = xmltodict.parse(xml_data)
-        return xml_dict
-    else:
-        return {}
+    response = open_feed(url, validators)
+    if response is None or response.status_code != 200:
+        return (response.status_code if response is not None else None), None, [], {}
+    days = iter_ecb_days(iter_ecb_rates(response.iter_content(chunk_size=FEED_CHUNK_SIZE)))
+    date_val, rates = next(days, (None, []))
+    return response.status_code, date_val, rates, get_feed_validators(response)
+
+
+def load_feed_validators(table, url):
+    """
+    Loads the cache validators stored by the last successful ingest of a feed.
+
+    Args:
+        table (boto3.resources.factory.dynamodb.Table): The DynamoDB table.
+        url (str): The URL of the feed.
+
+    Returns:
+        dict: The 'etag' and 'last_modified' values, empty if none are stored.
+    """
+    item = table.get_item(Key={'id': build_feed_state_key(url)}).get('Item') or {}
+    return {key: item[key] for key in ('etag', 'last_modified') if item.get(key)}
+
+
+def save_feed_validators(table, url, validators):
+    """
+    Stores the cache validators of a feed once its data has been ingested.
+
+    Args:
+        table (boto3.resources.factory.dynamodb.Table): The DynamoDB table.
+        url (str): The URL of the feed.
+        validators (dict): The 'etag' and 'last_modified' values.
+    """
+    if validators:
+        table.put_item(Item=dict(validators, id=build_feed_state_key(url)))
 
 
-def check_existing_key(table, date_val, currency_val):
+def fetch_existing_currencies(table, date_val):
     """
-    Checks if a record with the given date and currency already exists in the DynamoDB table.
+    Fetches the currencies that already have a record for the given date in the DynamoDB table.
+
+    A single Query on the date index covers the whole day, so the cost of the check does not
+    depend on the number of currencies or on the size of the table.
 
     Args:
         table (boto3.resources.factory.dynamodb.Table): The DynamoDB table to check.
         date_val (str): The date value.
-        currency_val (str): The currency value.
 
     Returns:
-        bool: True if a matching record exists, False otherwise.
+        set: The currencies stored for the date.
     """
-    response = table.scan(
-        FilterExpression='#date = :date_val AND #currency = :currency_val',
+    items = iterate_items(
+        table.query,
+        IndexName='DateIndex',
+        KeyConditionExpression=Key('date').eq(date_val),
+        ProjectionExpression='#currency',
         ExpressionAttributeNames={
-            '#date': 'date',
             '#currency': 'currency'
-        },
-        ExpressionAttributeValues={
-            ':date_val': date_val,
-            ':currency_val': currency_val
         }
     )
-    return len(response['Items']) > 0
+    return {item['currency'] for item in items}
+
+
+def fetch_previous_day_rates(table, date):
+    """
+    Reads the per-currency rates of the business day before a date from the date index.
+
+    This stands in for the previous snapshot when the earlier days have none, so the
+    differences of the new snapshot are still taken from the published rates.
+
+    Args:
+        table (boto3.resources.factory.dynamodb.Table): The DynamoDB table.
+        date (datetime.date): The date to look back from.
+
+    Returns:
+        dict: The 'snapshot_date' and 'rates' of the previous business day, or None if it has no items.
+    """
+    previous_date_val = str(previous_business_day(date))
+    items = iterate_items(
+        table.query,
+        IndexName='DateIndex',
+        KeyConditionExpression=Key('date').eq(previous_date_val),
+        ProjectionExpression='#currency, #rate',
+        ExpressionAttributeNames={
+            '#currency': 'currency',
+            '#rate': 'rate'
+        }
+    )
+    rates = {item['currency']: item['rate'] for item in items}
+    if not rates:
+        return None
+    return {'snapshot_date': previous_date_val, 'rates': rates}
 
 
+@instrumented('currency_exchange_update_cron')
 def currency_exchange_price_daily(event, context):
     """
     AWS Lambda handler function to update currency exchange prices daily.
     """
-    print("Fetching XML data...")
+    instrumentation = current_invocation()
     url = "http://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml"
-    xml_dict = render_xml_as_dict(url)
-    print("XML Data:", xml_dict)
-
-    if xml_dict:
-        envelope = xml_dict.get('gesmes:Envelope', {})
-        cube = envelope.get('Cube', {}).get('Cube', [])
-        date_val = cube.get('@time')
-        final_val = cube.get('Cube', [])
+    table = get_table('CurrencyExchange')
+    with instrumentation.phase('db_read'):
+        validators = load_feed_validators(table, url)
+    with instrumentation.phase('ecb_fetch'):
+        feed_status, date_val, rates, validators = fetch_daily_rates(url, validators)
+    instrumentation.set_property('feed_status', feed_status)
+    instrumentation.debug("Rates: %s", rates)
+
+    if feed_status == 304:
+        # The feed is unchanged since the last ingest, so there is nothing to read or write
+        body = 'Feed not modified'
+        status_code = 200
+    elif date_val:
         items = []
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table('CurrencyExchange')
-        print("Date:", date_val)
-
-        for i in final_val:
-            currency = i.get('@currency')
-            is_key_exists = check_existing_key(table=table, date_val=date_val, currency_val=currency)
-            print("Currency:", currency)
-            print("Key Exists:", is_key_exists)
-
-            if not is_key_exists:
-                uuid_val = str(uuid.uuid4())
+        instrumentation.set_property('date', date_val)
+
+        with instrumentation.phase('db_read'):
+            existing_currencies = fetch_existing_currencies(table=table, date_val=date_val)
+        instrumentation.debug("Existing Currencies: %s", existing_currencies)
+
+        for currency, rate in rates:
+            if currency not in existing_currencies:
                 item = {
-                    'id': uuid_val,
+                    'id': build_item_key(date_val, currency),
                     'currency': currency,
-                    'rate': decimal.Decimal(i.get('@rate')),
+                    'rate': rate,
                     'date': date_val
                 }
                 items.append(item)
-                print("Item to Insert:", item)
+        instrumentation.debug("Items to Insert: %s", items)
+
+        # The missing currencies are written in batches, backing off while the table throttles. A throttle
+        # slows down to the provisioned capacity, and a wait past the function timeout fails the invocation.
+        resource = get_dynamodb_resource()
+        get_remaining_time = getattr(context, 'get_remaining_time_in_millis', None)
+        writer = BatchWriter(
+            resource, 'CurrencyExchange',
+            initial_rate=get_provisioned_write_capacity(resource.meta.client, 'CurrencyExchange'),
+            remaining_time=(lambda: get_remaining_time() / 1000 - WRITE_TIME_RESERVE) if get_remaining_time else None
+        )
+        with instrumentation.phase('batch_write'):
+            writer.write(items)
+        write_report = writer.report()
+        inserted_count = write_report['items']
+        instrumentation.count('items_written', inserted_count)
+        instrumentation.count('write_throttles', write_report['throttles'])
+
+        # Materialize the whole day, with the differences from the previous business day, for single-read serving
+        with instrumentation.phase('db_read'):
+            date = datetime.date.fromisoformat(date_val)
+            previous_snapshot = fetch_latest_snapshot_before(get_dynamodb_resource(), 'CurrencyExchange', date)
+            if previous_snapshot is None:
+                previous_snapshot = fetch_previous_day_rates(table, date)
+        snapshot = build_snapshot(date_val, rates, previous_snapshot)
+        with instrumentation.phase('batch_write'):
+            table.put_item(Item=snapshot)
+            save_feed_validators(table, url, validators)
 
-        if items:
-            with table.batch_writer() as batch:
-                for item in items:
-                    batch.put_item(Item=item)
+        if inserted_count:
             status_code = 200
             body = 'Data inserted into DynamoDB'
         else:
             body = 'No new data to insert'
             status_code = 200
-        print("Response Body:", body)
     else:
         body = {"message": "Failure"}
         status_code = 400
-        print("Failure message")
+        instrumentation.info("Feed could not be read, status %s", feed_status)
 
+    instrumentation.info("Response Body: %s", body)
     response = {"statusCode": status_code, "body": json.dumps(body)}
     return response
@@ -1,17 +1,14 @@
 import os
 import unittest
+from decimal import Decimal
 from unittest import mock
 
-from currency_exchange_update_cron.update_currency_exchange_price_daily import currency_exchange_price_daily
-
+from botocore.exceptions import ClientError
 
-class TestUpdateCurrencyExchangePriceDaily(unittest.TestCase):
+from currency_exchange_common.clients import set_dynamodb_resource
+from currency_exchange_update_cron.update_currency_exchange_price_daily import currency_exchange_price_daily
 
-    @mock.patch("update_currency_exchange_price_daily.requests.get")
-    def test_lambda_handler_success(self, mock_get):
-        mock_get.return_value.status_code = 200
-        # mock_get.return_value.content = b"<?xml version='1.0'?><data>Test Data</data>"
-        mock_get.return_value.content = """<?xml version="1.0" encoding="UTF-8"?>
+DAILY_FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
                                             <gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref">
                                                 <gesmes:subject>Reference rates</gesmes:subject>
                                                 <gesmes:Sender>
@@ -25,16 +22,135 @@ class TestUpdateCurrencyExchangePriceDaily(unittest.TestCase):
                                                 </Cube>
                                             </gesmes:Envelope>"""
 
+
+class TestUpdateCurrencyExchangePriceDaily(unittest.TestCase):
+
+    def setUp(self):
+        self.table_mock = mock.MagicMock()
+        self.table_mock.get_item.return_value = {}
+        self.dynamodb_mock = mock.MagicMock()
+        self.dynamodb_mock.Table.return_value = self.table_mock
+        self.dynamodb_mock.batch_write_item.return_value = {}
+        set_dynamodb_resource(self.dynamodb_mock)
+
+    def tearDown(self):
+        set_dynamodb_resource(None)
+
+    @mock.patch("currency_exchange_update_cron.update_currency_exchange_price_daily.open_feed")
+    def test_lambda_handler_success(self, mock_open_feed):
+        table_mock = self.table_mock
+        table_mock.query.return_value = {'Items': [{'currency': 'JPY'}]}
+        self.dynamodb_mock.batch_get_item.return_value = {
+            'Responses': {
+                'CurrencyExchange': [
+                    {
+                        'id': 'snapshot#2023-07-05',
+                        'snapshot_date': '2023-07-05',
+                        'currencies': ['USD', 'JPY'],
+                        'rates': {'USD': Decimal('1.0866'), 'JPY': Decimal('156.99')},
+                    }
+                ]
+            }
+        }
+        mock_open_feed.return_value.status_code = 200
+        mock_open_feed.return_value.headers = {'ETag': '"abc"', 'Last-Modified': 'Thu, 06 Jul 2023 14:15:00 GMT'}
+        # mock_open_feed.return_value.content = b"<?xml version='1.0'?><data>Test Data</data>"
+        mock_open_feed.return_value.iter_content.return_value = [DAILY_FEED]
+
         event = {}
         context = {}
         os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
         response = currency_exchange_price_daily(event, context)
 
         self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(table_mock.query.call_count, 1)
+        self.assertEqual(self.dynamodb_mock.batch_write_item.call_count, 1)
+        requests = self.dynamodb_mock.batch_write_item.call_args.kwargs['RequestItems']['CurrencyExchange']
+        written_ids = [request['PutRequest']['Item']['id'] for request in requests]
+        self.assertEqual(written_ids, ['2023-07-06#USD', '2023-07-06#ZAR'])
+
+        written = {call.kwargs['Item']['id']: call.kwargs['Item'] for call in table_mock.put_item.call_args_list}
+        snapshot = written['snapshot#2023-07-06']
+        self.assertEqual(snapshot['previous_date'], '2023-07-05')
+        self.assertEqual(snapshot['currencies'], ['USD', 'JPY', 'ZAR'])
+        self.assertEqual(snapshot['differences'], {
+            'USD': Decimal('0.0033'), 'JPY': Decimal('-0.42'), 'ZAR': Decimal('0')
+        })
+        self.assertEqual(written['feed#http://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml'], {
+            'id': 'feed#http://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml',
+            'etag': '"abc"',
+            'last_modified': 'Thu, 06 Jul 2023 14:15:00 GMT'
+        })
+
+    @mock.patch("currency_exchange_update_cron.update_currency_exchange_price_daily.open_feed")
+    def test_differences_from_previous_day_items_without_snapshot(self, mock_open_feed):
+        def query(**kwargs):
+            if kwargs.get('ProjectionExpression') == '#currency, #rate':
+                return {'Items': [{'currency': 'USD', 'rate': Decimal('1.0866')}]}
+            return {'Items': []}
+        self.table_mock.query.side_effect = query
+        self.dynamodb_mock.batch_get_item.return_value = {'Responses': {'CurrencyExchange': []}}
+        mock_open_feed.return_value.status_code = 200
+        mock_open_feed.return_value.headers = {}
+        mock_open_feed.return_value.iter_content.return_value = [DAILY_FEED]
+
+        response = currency_exchange_price_daily({}, {})
+
+        self.assertEqual(response["statusCode"], 200)
+        snapshot = self.table_mock.put_item.call_args.kwargs['Item']
+        self.assertEqual(snapshot['previous_date'], '2023-07-05')
+        self.assertEqual(snapshot['differences'], {
+            'USD': Decimal('0.0033'), 'JPY': Decimal('0'), 'ZAR': Decimal('0')
+        })
+
+    @mock.patch("currency_exchange_update_cron.update_currency_exchange_price_daily.open_feed")
+    def test_no_differences_without_previous_day(self, mock_open_feed):
+        self.table_mock.query.return_value = {'Items': []}
+        self.dynamodb_mock.batch_get_item.return_value = {'Responses': {'CurrencyExchange': []}}
+        mock_open_feed.return_value.status_code = 200
+        mock_open_feed.return_value.headers = {}
+        mock_open_feed.return_value.iter_content.return_value = [DAILY_FEED]
+
+        response = currency_exchange_price_daily({}, {})
+
+        self.assertEqual(response["statusCode"], 200)
+        snapshot = self.table_mock.put_item.call_args.kwargs['Item']
+        self.assertNotIn('differences', snapshot)
+        self.assertNotIn('previous_date', snapshot)
+
+    @mock.patch("currency_exchange_update_cron.update_currency_exchange_price_daily.open_feed")
+    def test_throttled_writes_fail_before_the_function_timeout(self, mock_open_feed):
+        self.table_mock.query.return_value = {'Items': []}
+        self.dynamodb_mock.batch_write_item.side_effect = ClientError(
+            {'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'BatchWriteItem'
+        )
+        mock_open_feed.return_value.status_code = 200
+        mock_open_feed.return_value.headers = {}
+        mock_open_feed.return_value.iter_content.return_value = [DAILY_FEED]
+        context = mock.MagicMock()
+        context.get_remaining_time_in_millis.return_value = 1000
+
+        with self.assertRaises(TimeoutError):
+            currency_exchange_price_daily({}, context)
+
+        self.table_mock.put_item.assert_not_called()
+
+    @mock.patch("currency_exchange_update_cron.update_currency_exchange_price_daily.open_feed")
+    def test_lambda_handler_not_modified(self, mock_open_feed):
+        self.table_mock.get_item.return_value = {'Item': {'etag': '"abc"'}}
+        mock_open_feed.return_value.status_code = 304
+
+        response = currency_exchange_price_daily({}, {})
+
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(response["body"], "\"Feed not modified\"")
+        self.assertEqual(mock_open_feed.call_args.args[1], {'etag': '"abc"'})
+        self.table_mock.query.assert_not_called()
+        self.table_mock.put_item.assert_not_called()
 
-    @mock.patch("update_currency_exchange_price_daily.requests.get")
-    def test_lambda_handler_failure(self, mock_get):
-        mock_get.return_value.status_code = 404
+    @mock.patch("currency_exchange_update_cron.update_currency_exchange_price_daily.open_feed")
+    def test_lambda_handler_failure(self, mock_open_feed):
+        mock_open_feed.return_value.status_code = 404
 
         event = {}
         context = {}
@@ -1,90 +1,178 @@
 import json
 import datetime
-import boto3
-import pytz
+import os
+from boto3.dynamodb.conditions import Key
 
+from currency_exchange_common.business_days import previous_business_day
+from currency_exchange_common.cache import RateCache
+from currency_exchange_common.clients import get_dynamodb_resource, get_table
+from currency_exchange_common.cross_rates import BASE_CURRENCY, convert_items
+from currency_exchange_common.dynamodb import iterate_items
+from currency_exchange_common.events import get_query_parameters, parse_list_parameter
+from currency_exchange_common.horizons import (
+    HORIZONS, compute_horizon_changes, fetch_horizon_rates, select_horizon_columns
+)
+from currency_exchange_common.instrumentation import current_invocation, instrumented
+from currency_exchange_common.responses import build_json_response
+from currency_exchange_common.schedule import next_publication_time, resolve_rate_date
+from currency_exchange_common.snapshots import fetch_snapshot, snapshot_to_items
 
-def fetch_items_by_date(table, column_name, column_value):
+# Rates of a published date never change, so warm invocations serve them from memory
+rate_cache = RateCache(max_size=int(os.environ.get('RATE_CACHE_MAX_SIZE', '32')))
+
+
+def fetch_items_by_date(table, column_name, column_value, index_name='DateIndex', limit=None):
     """
     Fetches items from the DynamoDB table based on a specific date column value.
 
+    The lookup is a key-condition Query on the date-keyed GSI, so only the items
+    for the requested date are read regardless of how much history the table holds.
+    Every result page is followed, and items are streamed rather than collected.
+
     Args:
         table (DynamoDB.Table): The DynamoDB table object.
-        column_name (str): The name of the column to filter on.
+        column_name (str): The name of the column to filter on (hash key of the index).
         column_value (str): The value to filter the column on.
+        index_name (str): The name of the GSI keyed on the column.
+        limit (int, optional): The maximum number of items to return.
 
     Returns:
-        list: A list of items matching the filter criteria.
+        generator: The items matching the filter criteria.
     """
-    response = table.scan(
-        FilterExpression='#column = :value',
-        ExpressionAttributeNames={
-            '#column': column_name
-        },
-        ExpressionAttributeValues={
-            ':value': column_value
-        }
+    return iterate_items(
+        table.query,
+        limit=limit,
+        IndexName=index_name,
+        KeyConditionExpression=Key(column_name).eq(column_value)
     )
-    items = response['Items']
-    return items
 
 
-def fetch_currency_exchange_data(event, context):
+def fetch_items_with_difference(table, date):
     """
-    Lambda function that fetches currency exchange data for a specific date.
+    Fetches the items of a date and computes their difference from the previous day.
+
+    The difference is taken from the previous TARGET business day. This is the fallback
+    for dates that have no snapshot item.
 
     Args:
-        event (dict): The event data.
-        context (LambdaContext): The context object.
+        table (DynamoDB.Table): The DynamoDB table object.
+        date (datetime.date): The date to fetch.
 
     Returns:
-        dict: The response object containing the status code and response body.
+        list: The items with float 'rate' and 'yesterday_difference' fields.
     """
-    print("Fetching currency exchange data...")
-    current_utc_time = datetime.datetime.now(pytz.utc)
-    current_hour = current_utc_time.hour
-    print("Current UTC Time:", current_utc_time)
-    print("Current Hour:", current_hour)
-    if current_utc_time.weekday() == 0:
-        if current_hour < 15:
-            date = current_utc_time - datetime.timedelta(days=3)
-        else:
-            date = datetime.datetime.now(pytz.utc)
-    elif current_hour >= 15:
-        date = datetime.datetime.now(pytz.utc)
-    else:
-        date = current_utc_time - datetime.timedelta(days=1)
-    date_val = str(date.date())
-    print("Selected Date:", date_val)
-
-    dynamodb = boto3.resource('dynamodb')
-    table_name = 'CurrencyExchange'
-    table = dynamodb.Table(table_name)
-    print("Table Name:", table_name)
-
-    items = fetch_items_by_date(table, column_name='date', column_value=date_val)
-    print("Fetched Items:")
-    for item in items:
-        item['rate'] = float(str(item['rate']))
-        print(item)
+    items = list(fetch_items_by_date(table, column_name='date', column_value=str(date)))
 
-    previous_date = date - datetime.timedelta(days=1)
-    previous_date_val = str(previous_date.date())
+    # Weekends and TARGET holidays have no rates, so compare with the previous business day
+    previous_date = previous_business_day(date)
+    previous_date_val = str(previous_date)
     previous_date_items = fetch_items_by_date(table, column_name='date', column_value=previous_date_val)
     previous_date_data = {}
     for val in previous_date_items:
         previous_date_data[val['currency']] = val['rate']
-    print("Previous Date Data:", previous_date_data)
+    current_invocation().debug("Previous Date Data: %s", previous_date_data)
 
     for item in items:
         item['yesterday_difference'] = float(str(item['rate'] - previous_date_data.get(item['currency'], item['rate'])))
         item['rate'] = float(str(item['rate']))
+    return items
+
+
+@instrumented('currency_exchange_with_difference')
+def fetch_currency_exchange_data(event, context):
+    """
+    Lambda function that fetches currency exchange data for a specific date.
+
+    The optional 'base' and 'symbols' query string parameters return the cross rates
+    of the given currencies expressed in the base currency instead of EUR. The optional
+    'horizons' parameter (comma separated 1d, 1w, 1m, ytd) adds the absolute and
+    percentage changes over each horizon.
+
+    Args:
+        event (dict): The event data.
+        context (LambdaContext): The context object.
+
+    Responses are gzip encoded when the client accepts it, carry an ETag and
+    may be cached until the next publication; a matching If-None-Match gets a 304.
+
+    Returns:
+        dict: The response object containing the status code and response body.
+    """
+    instrumentation = current_invocation()
+    parameters = get_query_parameters(event)
+    base = parameters.get('base', BASE_CURRENCY).upper()
+    symbols = parse_list_parameter(parameters.get('symbols'))
+    horizons = [horizon.lower() for horizon in parse_list_parameter(parameters.get('horizons'))]
+    unknown_horizons = [horizon for horizon in horizons if horizon not in HORIZONS]
+    if unknown_horizons:
+        return {'statusCode': 400, 'body': json.dumps({'message': f"Unknown horizon: {', '.join(unknown_horizons)}"})}
+    with instrumentation.phase('resolve_date'):
+        current_utc_time = datetime.datetime.now(datetime.timezone.utc)
+        date = resolve_rate_date(current_utc_time)
+        date_val = str(date)
+    instrumentation.set_property('date', date_val)
+
+    items = rate_cache.get(date_val, current_utc_time)
+    complete = items is not None
+    instrumentation.set_property('cache_hit', complete)
+    if items is None:
+        table = get_table('CurrencyExchange')
+
+        with instrumentation.phase('db_read'):
+            snapshot = fetch_snapshot(table, date_val)
+            if snapshot and 'differences' in snapshot:
+                items = snapshot_to_items(snapshot, include_difference=True)
+                complete = True
+            else:
+                # Dates ingested before snapshots existed, or whose snapshot was built without
+                # the previous day's rates, are read item by item
+                items = fetch_items_with_difference(table, date)
+        instrumentation.debug("Fetched Items: %s", items)
+
+        # Only snapshot days are complete; a per-item read may race the cron, so it is neither
+        # cached here nor by clients
+        if complete:
+            rate_cache.set(date_val, items, next_publication_time(current_utc_time))
+    instrumentation.count('item_count', len(items))
+    instrumentation.debug("Rate Cache: %s", rate_cache.stats())
 
     body = {
         'data': items,
         'message': 'Data Fetched Successfully',
     }
 
-    print("Response Body:", body)
+    # Cross rates are derived from the cached EUR rates, so any pair is served from the same read
+    if items and (base != BASE_CURRENCY or symbols):
+        try:
+            with instrumentation.phase('transform'):
+                body['data'] = convert_items(items, base=base, symbols=symbols)
+        except ValueError as e:
+            return {'statusCode': 400, 'body': json.dumps({'message': str(e)})}
+        body['base'] = base
+
+    if items and horizons:
+        currencies = [item['currency'] for item in items]
+        cache_key = f"horizons:{date_val}:{','.join(horizons)}"
+        # The matrix is cached with the currencies of its columns, which a per-item read orders differently
+        cached = rate_cache.get(cache_key, current_utc_time)
+        horizon_rates = select_horizon_columns(cached[1], cached[0], currencies) if cached else None
+        if horizon_rates is None:
+            with instrumentation.phase('db_read'):
+                horizon_rates = fetch_horizon_rates(
+                    get_dynamodb_resource(), 'CurrencyExchange', currencies, date, horizons
+                )
+            # Only the columns of a complete day are cached, so a partial read cannot shadow them
+            if complete:
+                rate_cache.set(cache_key, (currencies, horizon_rates), next_publication_time(current_utc_time))
+        with instrumentation.phase('transform'):
+            changes = compute_horizon_changes(
+                currencies, [item['rate'] for item in items], horizon_rates, horizons, base=base, symbols=symbols
+            )
+            body['data'] = [dict(item, changes=item_changes) for item, item_changes in zip(body['data'], changes)]
+
+    instrumentation.debug("Response Body: %s", body)
 
-    return {'statusCode': 200, 'body': json.dumps(body)}
+    with instrumentation.phase('serialize'):
+        return build_json_response(
+            event, body, date_val, next_publication_time(current_utc_time), current_utc_time, cacheable=complete
+        )
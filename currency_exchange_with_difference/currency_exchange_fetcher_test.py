@@ -1,34 +1,58 @@
 import unittest
 from unittest.mock import MagicMock
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 
-import boto3
-
-from currency_exchange_with_difference.currency_exchange_fetcher import fetch_currency_exchange_data
-from pytz import utc
+from currency_exchange_common.clients import set_dynamodb_resource
+from currency_exchange_with_difference.currency_exchange_fetcher import fetch_currency_exchange_data, rate_cache
 import json
 
 
+def past_snapshots(rates):
+    """
+    Answers a BatchGetItem with a snapshot holding the same rates for every requested date.
+    """
+    def batch_get_item(RequestItems):
+        keys = RequestItems['CurrencyExchange']['Keys']
+        return {'Responses': {'CurrencyExchange': [
+            {'snapshot_date': key['id'].split('#', 1)[1], 'rates': rates} for key in keys
+        ]}}
+    return batch_get_item
+
+
 class TestFetchCurrencyExchangeData(unittest.TestCase):
+    def setUp(self):
+        rate_cache.clear()
+
+    def tearDown(self):
+        set_dynamodb_resource(None)
+
     def test_fetch_currency_exchange_data(self):
         # Mock the DynamoDB table
         table_mock = MagicMock()
-        table_mock.scan.return_value = {
-            'Items': [
-                {'currency': 'USD', 'date': '2022-01-01', 'rate': '1.2'},
-                {'currency': 'EUR', 'date': '2022-01-01', 'rate': '0.9'},
-                {'currency': 'USD', 'date': '2022-01-02', 'rate': '1.3'},
-                {'currency': 'EUR', 'date': '2022-01-02', 'rate': '0.8'},
-            ]
-        }
+        table_mock.get_item.return_value = {}
+        table_mock.query.side_effect = [
+            {
+                'Items': [
+                    {'currency': 'USD', 'date': '2022-01-02', 'rate': Decimal('1.3')},
+                    {'currency': 'EUR', 'date': '2022-01-02', 'rate': Decimal('0.8')},
+                ]
+            },
+            {
+                'Items': [
+                    {'currency': 'USD', 'date': '2022-01-01', 'rate': Decimal('1.2')},
+                    {'currency': 'EUR', 'date': '2022-01-01', 'rate': Decimal('0.9')},
+                ]
+            },
+        ]
 
         # Mock the DynamoDB resource
         dynamodb_mock = MagicMock()
         dynamodb_mock.Table.return_value = table_mock
-        boto3.resource = MagicMock(return_value=dynamodb_mock)
+        set_dynamodb_resource(dynamodb_mock)
 
         # Set the current UTC time to a specific date and time
-        current_utc_time = datetime(2022, 1, 3, 10, 0, 0, tzinfo=utc)
+        current_utc_time = datetime(2022, 1, 3, 10, 0, 0, tzinfo=timezone.utc)
 
         # Call the Lambda function
         result = fetch_currency_exchange_data({}, {'utc_time': current_utc_time})
@@ -47,7 +71,178 @@ class TestFetchCurrencyExchangeData(unittest.TestCase):
 
         # Set self.maxDiff to None to view the full diff
         self.maxDiff = None
+        self.assertEqual(result['statusCode'], expected_response['statusCode'])
+        self.assertEqual(result['body'], expected_response['body'])
+
+        # A day read item by item may still be incomplete, so it is neither cached in memory nor by clients
+        self.assertEqual(result['headers']['Cache-Control'], 'no-cache')
+        self.assertEqual(len(rate_cache), 0)
+
+    def test_fetch_currency_exchange_data_from_snapshot(self):
+        table_mock = MagicMock()
+        table_mock.get_item.return_value = {
+            'Item': {
+                'id': 'snapshot#2022-01-02',
+                'snapshot_date': '2022-01-02',
+                'previous_date': '2022-01-01',
+                'currencies': ['USD', 'JPY'],
+                'rates': {'USD': Decimal('1.3'), 'JPY': Decimal('140.5')},
+                'differences': {'USD': Decimal('0.1'), 'JPY': Decimal('-0.25')},
+            }
+        }
+        dynamodb_mock = MagicMock()
+        dynamodb_mock.Table.return_value = table_mock
+        set_dynamodb_resource(dynamodb_mock)
+
+        result = fetch_currency_exchange_data({}, {})
+
+        body = json.loads(result['body'])
+        self.assertEqual(body['data'], [
+            {'id': '2022-01-02#USD', 'currency': 'USD', 'date': '2022-01-02', 'rate': 1.3, 'yesterday_difference': 0.1},
+            {'id': '2022-01-02#JPY', 'currency': 'JPY', 'date': '2022-01-02', 'rate': 140.5, 'yesterday_difference': -0.25},
+        ])
+        table_mock.query.assert_not_called()
+        self.assertEqual(table_mock.get_item.call_count, 1)
+        self.assertTrue(result['headers']['Cache-Control'].startswith('public, max-age='))
+
+        # A warm invocation for the same date is answered from the rate cache
+        cached_result = fetch_currency_exchange_data({}, {})
+        self.assertEqual(cached_result['body'], result['body'])
+        self.assertEqual(table_mock.get_item.call_count, 1)
+        self.assertEqual(rate_cache.hits, 1)
+
+        # A client holding the same representation gets a 304 Not Modified
+        not_modified = fetch_currency_exchange_data({'headers': {'if-none-match': result['headers']['ETag']}}, {})
+        self.assertEqual(not_modified['statusCode'], 304)
+        self.assertEqual(not_modified['body'], '')
+
+    def test_snapshot_without_differences_is_read_item_by_item(self):
+        table_mock = MagicMock()
+        table_mock.get_item.return_value = {
+            'Item': {
+                'id': 'snapshot#2022-01-02',
+                'snapshot_date': '2022-01-02',
+                'currencies': ['USD'],
+                'rates': {'USD': Decimal('1.3')},
+            }
+        }
+        table_mock.query.side_effect = [
+            {'Items': [{'currency': 'USD', 'date': '2022-01-02', 'rate': Decimal('1.3')}]},
+            {'Items': [{'currency': 'USD', 'date': '2022-01-01', 'rate': Decimal('1.2')}]},
+        ]
+        dynamodb_mock = MagicMock()
+        dynamodb_mock.Table.return_value = table_mock
+        set_dynamodb_resource(dynamodb_mock)
+
+        result = fetch_currency_exchange_data({}, {})
+
+        body = json.loads(result['body'])
+        self.assertEqual(body['data'], [
+            {'currency': 'USD', 'date': '2022-01-02', 'rate': 1.3, 'yesterday_difference': 0.1},
+        ])
+        self.assertEqual(result['headers']['Cache-Control'], 'no-cache')
+        self.assertEqual(len(rate_cache), 0)
+
+    def test_fetch_currency_exchange_data_in_another_base(self):
+        table_mock = MagicMock()
+        table_mock.get_item.return_value = {
+            'Item': {
+                'id': 'snapshot#2022-01-02',
+                'snapshot_date': '2022-01-02',
+                'currencies': ['USD', 'JPY'],
+                'rates': {'USD': Decimal('1.25'), 'JPY': Decimal('150')},
+                'differences': {'USD': Decimal('0'), 'JPY': Decimal('-30')},
+            }
+        }
+        dynamodb_mock = MagicMock()
+        dynamodb_mock.Table.return_value = table_mock
+        set_dynamodb_resource(dynamodb_mock)
+
+        result = fetch_currency_exchange_data({'queryStringParameters': {'base': 'usd', 'symbols': 'JPY,EUR'}}, {})
+
+        body = json.loads(result['body'])
+        self.assertEqual(body['base'], 'USD')
+        self.assertEqual(body['data'], [
+            {'currency': 'JPY', 'date': '2022-01-02', 'rate': 120.0, 'yesterday_difference': -24.0},
+            {'currency': 'EUR', 'date': '2022-01-02', 'rate': 0.8, 'yesterday_difference': 0.0},
+        ])
+
+        unknown = fetch_currency_exchange_data({'queryStringParameters': {'symbols': 'XXX'}}, {})
+        self.assertEqual(unknown['statusCode'], 400)
+
+    def test_fetch_currency_exchange_data_with_horizons(self):
+        table_mock = MagicMock()
+        table_mock.get_item.return_value = {
+            'Item': {
+                'id': 'snapshot#2022-01-04',
+                'snapshot_date': '2022-01-04',
+                'currencies': ['USD', 'JPY'],
+                'rates': {'USD': Decimal('1.2'), 'JPY': Decimal('132')},
+                'differences': {'USD': Decimal('0.1'), 'JPY': Decimal('2')},
+            }
+        }
+        dynamodb_mock = MagicMock()
+        dynamodb_mock.Table.return_value = table_mock
+        dynamodb_mock.batch_get_item.side_effect = past_snapshots({'USD': Decimal('1.0'), 'JPY': Decimal('120')})
+        set_dynamodb_resource(dynamodb_mock)
+
+        result = fetch_currency_exchange_data({'queryStringParameters': {'horizons': '1d,1w'}}, {})
+
+        body = json.loads(result['body'])
+        usd, jpy = body['data']
+        self.assertEqual(set(usd['changes']), {'1d', '1w'})
+        self.assertAlmostEqual(usd['changes']['1d']['absolute'], 0.2)
+        self.assertAlmostEqual(usd['changes']['1d']['percent'], 20.0)
+        self.assertAlmostEqual(jpy['changes']['1w']['absolute'], 12.0)
+        self.assertAlmostEqual(jpy['changes']['1w']['percent'], 10.0)
+        self.assertEqual(dynamodb_mock.batch_get_item.call_count, 1)
+
+        cached_result = fetch_currency_exchange_data({'queryStringParameters': {'horizons': '1d,1w'}}, {})
+        self.assertEqual(cached_result['body'], result['body'])
+        self.assertEqual(dynamodb_mock.batch_get_item.call_count, 1)
+
+        unknown = fetch_currency_exchange_data({'queryStringParameters': {'horizons': '5y'}}, {})
+        self.assertEqual(unknown['statusCode'], 400)
+
+    def test_horizons_of_a_per_item_read_are_not_cached(self):
+        table_mock = MagicMock()
+        table_mock.get_item.return_value = {}
+        # The date index returns the day in currency order, not in publication order
+        table_mock.query.side_effect = [
+            {'Items': [
+                {'currency': 'JPY', 'date': '2022-01-04', 'rate': Decimal('132')},
+                {'currency': 'USD', 'date': '2022-01-04', 'rate': Decimal('1.2')},
+            ]},
+            {'Items': []},
+        ]
+        dynamodb_mock = MagicMock()
+        dynamodb_mock.Table.return_value = table_mock
+        dynamodb_mock.batch_get_item.side_effect = past_snapshots({'USD': Decimal('1.0'), 'JPY': Decimal('120')})
+        set_dynamodb_resource(dynamodb_mock)
+
+        result = fetch_currency_exchange_data({'queryStringParameters': {'horizons': '1d'}}, {})
+
+        jpy, usd = json.loads(result['body'])['data']
+        self.assertAlmostEqual(jpy['changes']['1d']['percent'], 10.0)
+        self.assertAlmostEqual(usd['changes']['1d']['percent'], 20.0)
+        self.assertEqual(len(rate_cache), 0)
+
+        # The snapshot written later is read in publication order, with its own horizon read
+        table_mock.get_item.return_value = {
+            'Item': {
+                'id': 'snapshot#2022-01-04',
+                'snapshot_date': '2022-01-04',
+                'currencies': ['USD', 'JPY'],
+                'rates': {'USD': Decimal('1.2'), 'JPY': Decimal('132')},
+                'differences': {'USD': Decimal('0.2'), 'JPY': Decimal('12')},
+            }
+        }
+        result = fetch_currency_exchange_data({'queryStringParameters': {'horizons': '1d'}}, {})
 
+        usd, jpy = json.loads(result['body'])['data']
+        self.assertAlmostEqual(usd['changes']['1d']['percent'], 20.0)
+        self.assertAlmostEqual(jpy['changes']['1d']['percent'], 10.0)
+        self.assertEqual(dynamodb_mock.batch_get_item.call_count, 2)
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,31 +1,42 @@
 import json
 import os
+import shutil
 import subprocess
+import sys
+import tempfile
 import zipfile
 import argparse
+import base64
+import fnmatch
+import hashlib
+import importlib.util
+import itertools
+import py_compile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import boto3
 from botocore.exceptions import ClientError
 
-# Step 1: Parse command line arguments
-parser = argparse.ArgumentParser()
-parser.add_argument('--secret-key', help='AWS secret key')
-parser.add_argument('--access-key', help='AWS access key')
-parser.add_argument('--role-arn', help='IAM role ARN')
-parser.add_argument('--region', help='AWS region')
-args = parser.parse_args()
-
-
-# Step 2: Set AWS credentials from command line arguments
-aws_access_key_id = args.access_key
-aws_secret_access_key = args.secret_key
-role_arn = args.role_arn
-aws_region = args.region  # Replace with your desired region
-
-# Step 3: Set the current directory
+# Step 1: Set the current directory and the configuration files
 current_directory = os.getcwd()
-
-# Step 4: Read the JSON configuration file
 json_file_path = "config_data.json"
+manifest_file_path = ".deploy_manifest.json"
+
+
+def parse_arguments(argv=None):
+    # Parse command line arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--secret-key', help='AWS secret key')
+    parser.add_argument('--access-key', help='AWS access key')
+    parser.add_argument('--role-arn', help='IAM role ARN')
+    parser.add_argument('--region', help='AWS region')
+    parser.add_argument('--force', action='store_true', help='Rebuild and upload every function')
+    parser.add_argument('--max-workers', type=int, default=4, help='Number of functions deployed in parallel')
+    parser.add_argument('--layer', action='store_true', help='Publish the dependencies as one shared Lambda layer')
+    parser.add_argument('--precompile', action='store_true', help='Add compiled bytecode to the packages')
+    return parser.parse_args(argv)
 
 
 def read_json(file_path):
@@ -34,146 +45,439 @@ def read_json(file_path):
     return data
 
 
-json_data = read_json(json_file_path)
+def update_json_file(json_file_path, key_to_update, new_value):
+    # Read the JSON file and load its contents into a dictionary
+    with open(json_file_path, 'r') as json_file:
+        data = json.load(json_file)
 
+    # Update the value of the specified key
+    data[key_to_update] = new_value
 
-# Step 5: Zip Function Directories
+    # Write the updated dictionary back to the JSON file
+    with open(json_file_path, 'w') as json_file:
+        json.dump(data, json_file, indent=4)
 
-def install_dependencies(directory_path):
-    # Change to the directory
-    os.chdir(directory_path)
 
-    # Check if the requirements.txt file exists
-    requirements_file = os.path.join(directory_path, "requirements.txt")
-    if os.path.isfile(requirements_file):
-        # Install dependencies using pip
-        subprocess.check_call(["pip3", "install", "-r", requirements_file, "--target", directory_path])
+# Step 2: Hash Function Sources
 
-    # Change back to the original directory
-    os.chdir("..")
+def list_source_files(directory_path, shared_package_directories=()):
+    # The function's own files sit at the top of its directory; subdirectories hold installed dependencies
+    source_files = []
+    for file in os.listdir(directory_path):
+        file_path = os.path.join(directory_path, file)
+        if os.path.isfile(file_path) and not file.endswith('.pyc'):
+            source_files.append((file, file_path))
 
+    # Shared packages are bundled whole, under their package directory
+    for package_path in shared_package_directories:
+        package_parent = os.path.dirname(package_path)
+        for root, dirs, files in os.walk(package_path):
+            dirs[:] = [directory for directory in dirs if directory != '__pycache__']
+            for file in files:
+                if not file.endswith('.pyc'):
+                    file_path = os.path.join(root, file)
+                    source_files.append((os.path.relpath(file_path, package_parent), file_path))
 
-def zip_directory(directory_path):
-    # Get the directory name from the path
-    directory_name = os.path.basename(directory_path)
-    # Create a zip file with the directory name outside the directory
-    zip_filename = f"{directory_name}.zip"
+    return sorted(source_files)
 
-    # Install dependencies in the directory
-    install_dependencies(directory_path)
 
-    # Create a ZipFile object with write mode
-    with zipfile.ZipFile(zip_filename, "w", zipfile.ZIP_DEFLATED) as zipf:
-        # Add the files to the zip file
-        for root, _, files in os.walk(directory_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                relative_file_path = os.path.relpath(file_path, directory_path)
-                zipf.write(file_path, arcname=relative_file_path)
+def hash_function_sources(directory_path, shared_package_directories=()):
+    # Hash the paths and contents of the sources and the requirements, in a stable order
+    digest = hashlib.sha256()
+    for relative_file_path, file_path in list_source_files(directory_path, shared_package_directories):
+        digest.update(relative_file_path.replace(os.sep, '/').encode('utf-8'))
+        digest.update(b'\0')
+        with open(file_path, 'rb') as source_file:
+            digest.update(hashlib.sha256(source_file.read()).digest())
+    return digest.hexdigest()
+
 
-    print(f"Successfully created zipped file: {zip_filename}")
+def read_manifest(file_path):
+    # The manifest records the source hash and the uploaded CodeSha256 of each function
+    if not os.path.isfile(file_path):
+        return {}
+    return read_json(file_path)
 
 
-lambda_paths = json_data.get('lambda_function', {}).keys()
-functions_data = json_data.get('lambda_function')
+def write_manifest(file_path, manifest):
+    with open(file_path, 'w') as json_file:
+        json.dump(manifest, json_file, indent=4, sort_keys=True)
 
-lambda_function_directories = [os.path.join(current_directory, item) for item in lambda_paths]
 
-# Iterate over all subdirectories in the current directory
-for item_path in lambda_function_directories:
-    if os.path.isdir(item_path):
-        zip_directory(item_path)
+def get_remote_code_sha256(lambda_client, func_name):
+    try:
+        response = lambda_client.get_function(FunctionName=func_name)
+    except lambda_client.exceptions.ResourceNotFoundException:
+        return None
+    return response['Configuration'].get('CodeSha256')
 
-# Step 6: Create DynamoDB Table
 
-# Create a DynamoDB client
-dynamodb_client = boto3.client(
-    'dynamodb',
-    aws_access_key_id=aws_access_key_id,
-    aws_secret_access_key=aws_secret_access_key,
-    region_name=aws_region
-)
+def is_function_unchanged(manifest_entry, source_hash, remote_code_sha256):
+    # Skip only if the sources are unchanged and the deployed code is still the one we uploaded
+    return (
+        manifest_entry is not None
+        and manifest_entry.get('source_hash') == source_hash
+        and remote_code_sha256 is not None
+        and manifest_entry.get('code_sha256') == remote_code_sha256
+    )
 
-# Set the details for the DynamoDB table
-table_name = 'CurrencyExchange'
-partition_key = 'id'
 
-# Check if the DynamoDB table already exists
-try:
-    dynamodb_client.describe_table(TableName=table_name)
-    table_exists = True
-except dynamodb_client.exceptions.ResourceNotFoundException:
-    table_exists = False
+# Step 3: Zip Function Directories
+
+# Dependencies are installed for the Lambda runtime rather than for the machine running the deploy
+LAMBDA_RUNTIME = 'python3.8'
+LAMBDA_PYTHON_VERSION = '3.8'
+LAMBDA_PLATFORM = 'manylinux2014_x86_64'
+BUILD_CACHE_DIRECTORY = os.path.join(current_directory, '.build_cache')
+DEPENDENCY_LAYER_NAME = 'currency_exchange_dependencies'
+
+_install_locks = {}
+_install_locks_lock = threading.Lock()
+
+
+def read_requirements(requirements_files):
+    # Merge the requirement lines of several files, ignoring comments, blank lines and order
+    requirements = set()
+    for requirements_file in requirements_files:
+        if not os.path.isfile(requirements_file):
+            continue
+        with open(requirements_file) as file:
+            for line in file:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    requirements.add(line)
+    return sorted(requirements)
+
+
+def dependency_cache_key(requirements, python_version=LAMBDA_PYTHON_VERSION, platform=LAMBDA_PLATFORM):
+    digest = hashlib.sha256()
+    for part in [python_version, platform] + list(requirements):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+def install_dependencies(requirements, cache_directory=BUILD_CACHE_DIRECTORY):
+    """
+    Installs a set of requirements once into the build cache and returns its directory.
+
+    The cache is keyed by the requirements, the Python version and the platform of the
+    Lambda runtime, so every function with the same dependencies reuses one install.
+    Parallel builds of the same key wait for the first one instead of installing twice.
+
+    Returns:
+        str: The directory holding the installed packages, or None without requirements.
+    """
+    if not requirements:
+        return None
+    cache_key = dependency_cache_key(requirements)
+    target_directory = os.path.join(cache_directory, cache_key)
+
+    with _install_locks_lock:
+        install_lock = _install_locks.setdefault(cache_key, threading.Lock())
+    with install_lock:
+        if os.path.isdir(target_directory):
+            print(f"Using cached dependencies: {cache_key}")
+            return target_directory
+
+        # Install next to the final directory and rename it, so an interrupted install is never reused
+        staging_directory = f"{target_directory}.tmp-{os.getpid()}"
+        shutil.rmtree(staging_directory, ignore_errors=True)
+        os.makedirs(staging_directory)
+        requirements_file = os.path.join(staging_directory, 'requirements.txt')
+        with open(requirements_file, 'w') as file:
+            file.write('\n'.join(requirements) + '\n')
+        subprocess.check_call([
+            "pip3", "install", "-r", requirements_file, "--target", staging_directory,
+            "--platform", LAMBDA_PLATFORM, "--python-version", LAMBDA_PYTHON_VERSION,
+            "--implementation", "cp", "--only-binary=:all:"
+        ])
+        os.remove(requirements_file)
+        os.replace(staging_directory, target_directory)
+        return target_directory
+
+
+# Packages the Lambda Python runtime already provides
+RUNTIME_PROVIDED_PACKAGES = ('boto3', 'botocore', 's3transfer')
+# Paths left out of the packages, matched against the names in the zip
+PACKAGE_EXCLUDE_PATTERNS = (
+    '*_test.py', 'test_*.py', '*/tests/*', 'tests/*', '*__pycache__/*', '*.pyc', '*.pyo',
+    '*.dist-info/*', '*.egg-info/*', 'bin/*', 'requirements.txt',
+) + tuple(f'{package}/*' for package in RUNTIME_PROVIDED_PACKAGES)
+# Timestamp of every zip entry, the earliest the zip format can store, so identical inputs give identical zips
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def is_packaged(arcname, exclude_patterns=PACKAGE_EXCLUDE_PATTERNS, include_patterns=()):
+    # Include patterns take precedence over the exclude patterns
+    if any(fnmatch.fnmatchcase(arcname, pattern) for pattern in include_patterns):
+        return True
+    return not any(fnmatch.fnmatchcase(arcname, pattern) for pattern in exclude_patterns)
+
+
+def iter_directory_files(directory_path, arcname_prefix=''):
+    # Yield (path, name in the zip) for every file below a directory
+    for root, _, files in os.walk(directory_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            arcname = os.path.join(arcname_prefix, os.path.relpath(file_path, directory_path))
+            yield file_path, arcname.replace(os.sep, '/')
+
+
+def compile_bytecode(file_path, arcname):
+    """
+    Compiles a module to the bytecode Lambda would otherwise compile on every cold start.
+
+    The code directory of a function is read-only, so Python cannot cache the bytecode
+    it compiles there. Unchecked hash-based pycs are independent of file timestamps.
+
+    Returns:
+        tuple: (name of the pyc in the zip, pyc bytes).
+    """
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        cfile = os.path.join(temporary_directory, 'module.pyc')
+        py_compile.compile(file_path, cfile=cfile, dfile=arcname, doraise=True,
+                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+        with open(cfile, 'rb') as pyc_file:
+            return importlib.util.cache_from_source(arcname), pyc_file.read()
+
+
+def can_compile_bytecode():
+    # Bytecode is specific to a Python version, so it is only useful when built by the runtime's version
+    return f"{sys.version_info.major}.{sys.version_info.minor}" == LAMBDA_PYTHON_VERSION
+
+
+def write_package(zip_filename, sources, exclude_patterns=PACKAGE_EXCLUDE_PATTERNS, include_patterns=(),
+                  precompile=False):
+    """
+    Writes a deterministic zip of the files that pass the package rules.
+
+    The entries are sorted by name and carry a fixed timestamp and permissions, so the
+    same inputs always give a byte-identical zip and the same CodeSha256.
+
+    Args:
+        zip_filename (str): The path of the zip to write.
+        sources (iterable): (path, name in the zip) pairs; the first file of a name wins.
+        exclude_patterns (tuple): Glob patterns of the names left out.
+        include_patterns (tuple): Glob patterns of the names kept even if excluded.
+        precompile (bool): Whether to add the compiled bytecode of every module.
+
+    Returns:
+        int: The number of files written.
+    """
+    entries = {}
+    for file_path, arcname in sources:
+        if arcname not in entries and is_packaged(arcname, exclude_patterns, include_patterns):
+            entries[arcname] = file_path
+
+    contents = []
+    for arcname, file_path in entries.items():
+        with open(file_path, 'rb') as file:
+            contents.append((arcname, file.read(), os.access(file_path, os.X_OK)))
+        if precompile and arcname.endswith('.py'):
+            pyc_arcname, pyc_content = compile_bytecode(file_path, arcname)
+            contents.append((pyc_arcname, pyc_content, False))
 
-if not table_exists:
-    # Create the DynamoDB table
-    response = dynamodb_client.create_table(
-        TableName=table_name,
-        AttributeDefinitions=[
-            {
-                'AttributeName': 'id',
-                'AttributeType': 'S'
+    with zipfile.ZipFile(zip_filename, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for arcname, content, executable in sorted(contents):
+            zip_info = zipfile.ZipInfo(arcname, date_time=ZIP_DATE_TIME)
+            zip_info.compress_type = zipfile.ZIP_DEFLATED
+            zip_info.create_system = 3
+            zip_info.external_attr = (0o100755 if executable else 0o100644) << 16
+            zipf.writestr(zip_info, content)
+    return len(contents)
+
+
+def zip_directory(directory_path, shared_package_directories=(), output_directory='.', dependency_directory=None,
+                  exclude_patterns=PACKAGE_EXCLUDE_PATTERNS, include_patterns=(), precompile=False):
+    # Get the directory name from the path
+    directory_name = os.path.basename(directory_path)
+    # Create a zip file with the directory name outside the directory
+    zip_filename = os.path.join(output_directory, f"{directory_name}.zip")
+
+    # The function's files, then the cached dependencies read in place, then the shared packages
+    # at the root of the zip so the handler can import them
+    sources = [iter_directory_files(directory_path)]
+    if dependency_directory:
+        sources.append(iter_directory_files(dependency_directory))
+    for package_path in shared_package_directories:
+        sources.append(iter_directory_files(package_path, os.path.basename(package_path)))
+
+    file_count = write_package(zip_filename, itertools.chain.from_iterable(sources), exclude_patterns,
+                               include_patterns, precompile)
+    print(f"Successfully created zipped file: {zip_filename} ({file_count} files, "
+          f"{os.path.getsize(zip_filename)} bytes)")
+    return zip_filename
+
+
+def zip_dependency_layer(dependency_directory, output_directory='.', exclude_patterns=PACKAGE_EXCLUDE_PATTERNS,
+                         include_patterns=(), precompile=False):
+    # Lambda adds the python/ directory of a layer to the import path; the rules apply to the names inside it
+    zip_filename = os.path.join(output_directory, f"{DEPENDENCY_LAYER_NAME}.zip")
+    sources = [(file_path, f"python/{arcname}") for file_path, arcname in iter_directory_files(dependency_directory)
+               if is_packaged(arcname, exclude_patterns, include_patterns)]
+    file_count = write_package(zip_filename, sources, (), (), precompile)
+    print(f"Successfully created zipped layer: {zip_filename} ({file_count} files, "
+          f"{os.path.getsize(zip_filename)} bytes)")
+    return zip_filename
+
+
+def get_zip_code_sha256(zip_file_path):
+    # The CodeSha256 Lambda reports is the base64 encoded SHA-256 of the uploaded zip
+    with open(zip_file_path, 'rb') as zip_file:
+        return base64.b64encode(hashlib.sha256(zip_file.read()).digest()).decode('ascii')
+
+
+def publish_dependency_layer(lambda_client, zip_file_path, cache_key):
+    with open(zip_file_path, 'rb') as zip_file:
+        response = lambda_client.publish_layer_version(
+            LayerName=DEPENDENCY_LAYER_NAME,
+            Description=f'Dependencies {cache_key}',
+            Content={
+                'ZipFile': zip_file.read()
             },
+            CompatibleRuntimes=[LAMBDA_RUNTIME]
+        )
+    return response['LayerVersionArn']
+
+
+# Step 4: Create DynamoDB Table
+
+def create_or_update_dynamodb_table(dynamodb_client, table_name='CurrencyExchange'):
+    # Check if the DynamoDB table already exists
+    try:
+        dynamodb_client.describe_table(TableName=table_name)
+        table_exists = True
+    except dynamodb_client.exceptions.ResourceNotFoundException:
+        table_exists = False
+
+    # Date-keyed GSI used by the fetchers to read a single day with a Query instead of a full-table scan
+    date_index_name = 'DateIndex'
+    date_index = {
+        'IndexName': date_index_name,
+        'KeySchema': [
             {
                 'AttributeName': 'date',
-                'AttributeType': 'S'
+                'KeyType': 'HASH'
             },
             {
                 'AttributeName': 'currency',
-                'AttributeType': 'S'
+                'KeyType': 'RANGE'
             }
         ],
-        KeySchema=[
-            {
-                'AttributeName': 'id',
-                'KeyType': 'HASH'
-            }
-        ],
-        ProvisionedThroughput={
+        'Projection': {
+            'ProjectionType': 'ALL'
+        },
+        'ProvisionedThroughput': {
             'ReadCapacityUnits': 5,
             'WriteCapacityUnits': 5
-        },
-        GlobalSecondaryIndexes=[
-            {
-                'IndexName': 'CurrencyDateIndex',
-                'KeySchema': [
-                    {
-                        'AttributeName': 'currency',
-                        'KeyType': 'HASH'
+        }
+    }
+
+    if not table_exists:
+        # Create the DynamoDB table
+        response = dynamodb_client.create_table(
+            TableName=table_name,
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'id',
+                    'AttributeType': 'S'
+                },
+                {
+                    'AttributeName': 'date',
+                    'AttributeType': 'S'
+                },
+                {
+                    'AttributeName': 'currency',
+                    'AttributeType': 'S'
+                }
+            ],
+            KeySchema=[
+                {
+                    'AttributeName': 'id',
+                    'KeyType': 'HASH'
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 5,
+                'WriteCapacityUnits': 5
+            },
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': 'CurrencyDateIndex',
+                    'KeySchema': [
+                        {
+                            'AttributeName': 'currency',
+                            'KeyType': 'HASH'
+                        },
+                        {
+                            'AttributeName': 'date',
+                            'KeyType': 'RANGE'
+                        }
+                    ],
+                    'Projection': {
+                        'ProjectionType': 'ALL'
                     },
+                    'ProvisionedThroughput': {
+                        'ReadCapacityUnits': 5,
+                        'WriteCapacityUnits': 5
+                    }
+                },
+                date_index
+            ]
+        )
+
+        # Print the response
+        print('DynamoDB table created:', response['TableDescription']['TableArn'])
+    else:
+        print('DynamoDB table already exists:', table_name)
+        # Add the date index to tables created before it existed
+        table_description = dynamodb_client.describe_table(TableName=table_name)['Table']
+        existing_index_names = [index['IndexName'] for index in table_description.get('GlobalSecondaryIndexes', [])]
+        if date_index_name not in existing_index_names:
+            response = dynamodb_client.update_table(
+                TableName=table_name,
+                AttributeDefinitions=[
                     {
                         'AttributeName': 'date',
-                        'KeyType': 'RANGE'
+                        'AttributeType': 'S'
+                    },
+                    {
+                        'AttributeName': 'currency',
+                        'AttributeType': 'S'
                     }
                 ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            }
-        ]
-    )
+                GlobalSecondaryIndexUpdates=[
+                    {
+                        'Create': date_index
+                    }
+                ]
+            )
+            print('DynamoDB index created:', date_index_name)
+
+    # Wait until the table is active before the functions that read it are deployed
+    dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
+    # A table reports ACTIVE while an index added to it is still being backfilled
+    wait_for_index_active(dynamodb_client, table_name, date_index_name)
 
-    # Print the response
-    print('DynamoDB table created:', response['TableDescription']['TableArn'])
-else:
-    print('DynamoDB table already exists:', table_name)
 
-# Step 7: Create or Update Lambda Functions
+def wait_for_index_active(dynamodb_client, table_name, index_name, delay=5, max_attempts=360):
+    for _ in range(max_attempts):
+        table_description = dynamodb_client.describe_table(TableName=table_name)['Table']
+        statuses = {
+            index['IndexName']: index.get('IndexStatus')
+            for index in table_description.get('GlobalSecondaryIndexes', [])
+        }
+        if statuses.get(index_name) == 'ACTIVE':
+            return
+        print(f'Waiting for index {index_name}:', statuses.get(index_name))
+        time.sleep(delay)
+    raise TimeoutError(f'Index {index_name} of {table_name} is still not active')
 
-# Create a Lambda client
-lambda_client = boto3.client(
-    'lambda',
-    aws_access_key_id=aws_access_key_id,
-    aws_secret_access_key=aws_secret_access_key,
-    region_name=aws_region
-)
 
+# Step 5: Create or Update Lambda Functions
 
-def create_or_update_lambda_function(func_name, zip_file_path, handler):
+def create_or_update_lambda_function(lambda_client, func_name, zip_file_path, handler, role_arn, layers=None):
     # Check if the Lambda function exists
     try:
         lambda_client.get_function(FunctionName=func_name)
@@ -181,29 +485,41 @@ def create_or_update_lambda_function(func_name, zip_file_path, handler):
     except lambda_client.exceptions.ResourceNotFoundException:
         function_exists = False
 
+    with open(zip_file_path, 'rb') as zip_file:
+        zip_content = zip_file.read()
+
     if function_exists:
+        # A function accepts one update at a time, so let a previous update finish first
+        lambda_client.get_waiter('function_updated_v2').wait(FunctionName=func_name)
         # Update the existing Lambda function
         update_response = lambda_client.update_function_code(
             FunctionName=func_name,
-            ZipFile=open(zip_file_path, 'rb').read()
+            ZipFile=zip_content
         )
+        lambda_client.get_waiter('function_updated_v2').wait(FunctionName=func_name)
+        if layers is not None:
+            lambda_client.update_function_configuration(FunctionName=func_name, Layers=layers)
+            lambda_client.get_waiter('function_updated_v2').wait(FunctionName=func_name)
         return update_response
     else:
         # Create a new Lambda function
         create_response = lambda_client.create_function(
             FunctionName=func_name,
-            Runtime='python3.8',
+            Runtime=LAMBDA_RUNTIME,
             Role=role_arn,
             Handler=handler,
             Timeout=10,
             Code={
-                'ZipFile': open(zip_file_path, 'rb').read()
+                'ZipFile': zip_content
             },
+            Layers=layers or [],
         )
+        # The function can only be configured once it left the Pending state
+        lambda_client.get_waiter('function_active_v2').wait(FunctionName=func_name)
         return create_response
 
 
-def get_lambda_function_url(func_name):
+def get_lambda_function_url(lambda_client, func_name):
     final_response = {}
     try:
         response = lambda_client.get_function_url_config(FunctionName=func_name)
@@ -222,81 +538,36 @@ def get_lambda_function_url(func_name):
         )
     final_response["FunctionUrl"] = response.get('FunctionUrl')
     final_response["FunctionArn"] = response.get('FunctionArn')
-    statement_id = 'FunctionURLAllowPublicAccess'
-    add_permission = True
-    try:
-        response = lambda_client.get_policy(FunctionName=func_name)
-        if 'Policy' in response:
-            policy = json.loads(response['Policy'])
-            existing_statements = policy.get('Statement', [])
-            existing_statement_ids = [statement.get('Sid') for statement in existing_statements]
-
-            if statement_id in existing_statement_ids:
-                add_permission = False
-    except Exception as e:
-        pass
-
-    if add_permission:
-        permission_response = lambda_client.add_permission(
-            FunctionName=func_name,
-            StatementId=statement_id,
-            Action='lambda:invokeFunctionUrl',
-            Principal='*',
-            FunctionUrlAuthType='NONE'
-        )
-        final_response["policy_config"] = permission_response
     return final_response
 
 
-urls_data = {}
-arn_data = {}
-
-# Iterate over the functions_data dictionary and create or update Lambda functions
-for func_name, val in functions_data.items():
-    zip_file = f"{func_name}.zip"
-    function_arn = create_or_update_lambda_function(func_name, zip_file, val)
-    function_url = get_lambda_function_url(func_name)
-    urls_data[func_name] = function_url.get("FunctionUrl")
-    arn_data[func_name] = function_url.get("FunctionArn")
-
-for key, val in urls_data.items():
-    print(f"Function Name: {key}, URL: {val}")
-
-for key, val in arn_data.items():
-    print(f"Function Name: {key}, URL: {val}")
-
-
-def update_json_file(json_file_path, key_to_update, new_value):
-    # Read the JSON file and load its contents into a dictionary
-    with open(json_file_path, 'r') as json_file:
-        data = json.load(json_file)
-
-    # Update the value of the specified key
-    data[key_to_update] = new_value
-
-    # Write the updated dictionary back to the JSON file
-    with open(json_file_path, 'w') as json_file:
-        json.dump(data, json_file, indent=4)
-
-
-json_file_path = 'config_data.json'
-key_to_update = 'lambda_arn'
-new_value = arn_data
-
-update_json_file(json_file_path, key_to_update, new_value)
+def has_permission_statement(lambda_client, func_name, statement_id):
+    try:
+        response = lambda_client.get_policy(FunctionName=func_name)
+    except lambda_client.exceptions.ResourceNotFoundException:
+        return False
+    policy = json.loads(response.get('Policy', '{}'))
+    return statement_id in [statement.get('Sid') for statement in policy.get('Statement', [])]
 
-key_to_update = 'lambda_url'
-new_value = urls_data
-update_json_file(json_file_path, key_to_update, new_value)
 
-# Step 8: Create or Update CloudWatch Event Rules
+def add_function_url_permission(lambda_client, func_name):
+    statement_id = 'FunctionURLAllowPublicAccess'
+    if has_permission_statement(lambda_client, func_name, statement_id):
+        return None
+
+    return lambda_client.add_permission(
+        FunctionName=func_name,
+        StatementId=statement_id,
+        Action='lambda:invokeFunctionUrl',
+        Principal='*',
+        FunctionUrlAuthType='NONE'
+    )
 
-cloudwatch_client = boto3.client('events', aws_access_key_id=aws_access_key_id,
-                                 aws_secret_access_key=aws_secret_access_key,
-                                 region_name=aws_region)
 
+# Step 6: Create or Update CloudWatch Event Rules
 
-def create_or_update_cloudwatch_event_rule(rule_name, rule_description, schedule_expression, target_lambda_arn):
+def create_or_update_cloudwatch_event_rule(cloudwatch_client, rule_name, rule_description, schedule_expression,
+                                           target_lambda_arn):
     try:
         response = cloudwatch_client.put_rule(
             Name=rule_name,
@@ -316,8 +587,11 @@ def create_or_update_cloudwatch_event_rule(rule_name, rule_description, schedule
             )
             print(f"CloudWatch Event Rule '{rule_name}' updated successfully.")
         else:
-            # Other error occurred, handle as needed
+            # The rule is required by the schedule, so any other error stops the deployment
             print("Error occurred while creating/updating CloudWatch Event Rule:", str(e))
+            raise
+
+    rule_arn = response['RuleArn']
 
     # Add the target to the rule
     response = cloudwatch_client.put_targets(
@@ -332,15 +606,267 @@ def create_or_update_cloudwatch_event_rule(rule_name, rule_description, schedule
 
     # Print the response
     print(response)
+    return rule_arn
+
+
+def add_schedule_permission(lambda_client, func_name, rule_name, rule_arn):
+    # Allow the rule to invoke the function, otherwise the scheduled invocations are rejected
+    statement_id = f'{rule_name}-invoke'
+    if has_permission_statement(lambda_client, func_name, statement_id):
+        return None
+
+    return lambda_client.add_permission(
+        FunctionName=func_name,
+        StatementId=statement_id,
+        Action='lambda:InvokeFunction',
+        Principal='events.amazonaws.com',
+        SourceArn=rule_arn
+    )
+
+
+# Step 7: Deploy the Functions in Parallel
+
+class DeploymentTimings:
+    """
+    Collects the wall time of every deployment step, recorded from several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+        self.steps = []
+        self.total_seconds = None
+
+    @contextmanager
+    def step(self, name, step):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.steps.append((name, step, time.perf_counter() - started_at))
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self._started_at
+
+    def report(self):
+        lines = [f"{name:<40} {step:<12} {seconds:8.2f}s" for name, step, seconds in self.steps]
+        lines.append(f"Total wall time: {self.total_seconds:.2f}s")
+        return '\n'.join(lines)
+
+
+class DeploymentPipeline:
+    """
+    Deploys the table and the functions concurrently.
+
+    The functions are independent of each other and run on a thread pool, while the
+    steps of one function run in dependency order: build, upload, url_config,
+    permissions and schedule. Every step waits for the function to be ready before
+    the next one starts, so no step races a pending create or update. The functions
+    are built while the table deploys and uploaded once it and its indexes are active.
+
+    Dependencies come from the build cache. With use_layer, the requirements of every
+    function are published once as a shared layer and left out of the function zips.
+    """
+
+    def __init__(self, dynamodb_client, lambda_client, cloudwatch_client, role_arn, shared_package_directories=(),
+                 schedules=None, base_directory=current_directory, output_directory='.',
+                 manifest_path=manifest_file_path, force=False, use_layer=False,
+                 cache_directory=BUILD_CACHE_DIRECTORY, exclude_patterns=PACKAGE_EXCLUDE_PATTERNS,
+                 include_patterns=(), precompile=False):
+        self.dynamodb_client = dynamodb_client
+        self.lambda_client = lambda_client
+        self.cloudwatch_client = cloudwatch_client
+        self.role_arn = role_arn
+        self.shared_package_directories = list(shared_package_directories)
+        self.schedules = schedules or {}
+        self.base_directory = base_directory
+        self.output_directory = output_directory
+        self.manifest_path = manifest_path
+        self.force = force
+        self.use_layer = use_layer
+        self.cache_directory = cache_directory
+        self.layer_arn = None
+        self.exclude_patterns = tuple(exclude_patterns)
+        self.include_patterns = tuple(include_patterns)
+        self.precompile = precompile
+        if precompile and not can_compile_bytecode():
+            print(f"Python {LAMBDA_PYTHON_VERSION} is required to precompile bytecode for {LAMBDA_RUNTIME}, "
+                  f"packaging sources only")
+            self.precompile = False
+        self.manifest = read_manifest(manifest_path)
+        self.timings = DeploymentTimings()
+        self.table_future = None
+        self._manifest_lock = threading.Lock()
+
+    def deploy_table(self):
+        with self.timings.step('CurrencyExchange', 'table'):
+            create_or_update_dynamodb_table(self.dynamodb_client)
+
+    def package_settings(self):
+        # A change of these settings changes the zips, even for unchanged sources
+        return {
+            'exclude_patterns': list(self.exclude_patterns),
+            'include_patterns': list(self.include_patterns),
+            'precompile': self.precompile,
+        }
+
+    def deploy_layer(self, func_names):
+        requirements = read_requirements(
+            [os.path.join(self.base_directory, func_name, 'requirements.txt') for func_name in func_names]
+        )
+        cache_key = dependency_cache_key(requirements)
+        layer_entry = self.manifest.get(DEPENDENCY_LAYER_NAME)
+        if (not self.force and layer_entry and layer_entry.get('cache_key') == cache_key
+                and layer_entry.get('package_settings') == self.package_settings()):
+            print(f"Layer {DEPENDENCY_LAYER_NAME} is unchanged, skipping publish")
+            self.layer_arn = layer_entry['layer_version_arn']
+            return
+
+        with self.timings.step(DEPENDENCY_LAYER_NAME, 'layer'):
+            dependency_directory = install_dependencies(requirements, self.cache_directory)
+            zip_file = zip_dependency_layer(dependency_directory, self.output_directory, self.exclude_patterns,
+                                            self.include_patterns, self.precompile)
+            self.layer_arn = publish_dependency_layer(self.lambda_client, zip_file, cache_key)
+        with self._manifest_lock:
+            self.manifest[DEPENDENCY_LAYER_NAME] = {
+                'cache_key': cache_key,
+                'package_settings': self.package_settings(),
+                'layer_version_arn': self.layer_arn
+            }
+            write_manifest(self.manifest_path, self.manifest)
+
+    def deploy_function(self, func_name, handler):
+        item_path = os.path.join(self.base_directory, func_name)
+
+        # Only rebuild and upload the functions whose sources changed since the last deploy
+        source_hash = hash_function_sources(item_path, self.shared_package_directories)
+        remote_code_sha256 = get_remote_code_sha256(self.lambda_client, func_name)
+        manifest_entry = self.manifest.get(func_name)
+        settings = dict(self.package_settings(), layer_arn=self.layer_arn)
+        if (not self.force and is_function_unchanged(manifest_entry, source_hash, remote_code_sha256)
+                and manifest_entry.get('settings') == settings):
+            print(f"Function {func_name} is unchanged, skipping build and upload")
+        else:
+            with self.timings.step(func_name, 'build'):
+                dependency_directory = None
+                if not self.use_layer:
+                    requirements = read_requirements([os.path.join(item_path, 'requirements.txt')])
+                    dependency_directory = install_dependencies(requirements, self.cache_directory)
+                zip_file = zip_directory(item_path, self.shared_package_directories, self.output_directory,
+                                         dependency_directory, self.exclude_patterns, self.include_patterns,
+                                         self.precompile)
+
+            # The zips are reproducible, so a rebuild that only touched excluded files gives the deployed code
+            code_sha256 = get_zip_code_sha256(zip_file)
+            layers_unchanged = manifest_entry is not None and manifest_entry.get('settings', {}).get(
+                'layer_arn') == self.layer_arn
+            if not self.force and code_sha256 == remote_code_sha256 and layers_unchanged:
+                print(f"Function {func_name} built to the deployed code, skipping upload")
+            else:
+                # The uploaded code reads the table and its indexes, so it goes out once they are ready
+                if self.table_future is not None:
+                    self.table_future.result()
+                with self.timings.step(func_name, 'upload'):
+                    function_response = create_or_update_lambda_function(
+                        self.lambda_client, func_name, zip_file, handler, self.role_arn,
+                        layers=[self.layer_arn] if self.use_layer else None
+                    )
+                code_sha256 = function_response.get('CodeSha256')
+            with self._manifest_lock:
+                self.manifest[func_name] = {
+                    'source_hash': source_hash,
+                    'code_sha256': code_sha256,
+                    'settings': settings
+                }
+                write_manifest(self.manifest_path, self.manifest)
+
+        with self.timings.step(func_name, 'url_config'):
+            function_url = get_lambda_function_url(self.lambda_client, func_name)
+        with self.timings.step(func_name, 'permissions'):
+            add_function_url_permission(self.lambda_client, func_name)
+
+        if func_name in self.schedules:
+            with self.timings.step(func_name, 'schedule'):
+                rule_name = func_name + "_cron"
+                rule_arn = create_or_update_cloudwatch_event_rule(
+                    self.cloudwatch_client, rule_name, f'{func_name} description', self.schedules[func_name],
+                    function_url.get("FunctionArn")
+                )
+                add_schedule_permission(self.lambda_client, func_name, rule_name, rule_arn)
+        return function_url
+
+    def run(self, functions_data, max_workers=4):
+        """
+        Deploys the table and every function directory listed in the configuration.
+
+        Returns:
+            dict: The FunctionUrl and FunctionArn of each deployed function.
+        """
+        functions_data = {
+            func_name: handler for func_name, handler in functions_data.items()
+            if os.path.isdir(os.path.join(self.base_directory, func_name))
+        }
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # The functions are built while the table deploys, and uploaded once it is ready
+            self.table_future = executor.submit(self.deploy_table)
+            # The functions are uploaded against the layer, so it is published first
+            if self.use_layer:
+                self.deploy_layer(functions_data)
+            futures = {
+                func_name: executor.submit(self.deploy_function, func_name, handler)
+                for func_name, handler in functions_data.items()
+            }
+            self.table_future.result()
+            results = {func_name: future.result() for func_name, future in futures.items()}
+        self.timings.finish()
+        return results
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+
+    # Set AWS credentials from command line arguments
+    client_arguments = {
+        'aws_access_key_id': args.access_key,
+        'aws_secret_access_key': args.secret_key,
+        'region_name': args.region
+    }
+
+    # Read the JSON configuration file
+    json_data = read_json(json_file_path)
+    shared_package_directories = [
+        os.path.join(current_directory, item) for item in json_data.get('shared_packages', [])
+    ]
+
+    pipeline = DeploymentPipeline(
+        boto3.client('dynamodb', **client_arguments),
+        boto3.client('lambda', **client_arguments),
+        boto3.client('events', **client_arguments),
+        args.role_arn,
+        shared_package_directories=shared_package_directories,
+        schedules=json_data.get('cloud_watch_rule_cron'),
+        force=args.force,
+        use_layer=args.layer,
+        exclude_patterns=PACKAGE_EXCLUDE_PATTERNS + tuple(json_data.get('package_exclude', [])),
+        include_patterns=json_data.get('package_include', []),
+        precompile=args.precompile
+    )
+    results = pipeline.run(json_data.get('lambda_function'), max_workers=args.max_workers)
+
+    urls_data = {func_name: result.get("FunctionUrl") for func_name, result in results.items()}
+    arn_data = {func_name: result.get("FunctionArn") for func_name, result in results.items()}
+    for key, val in urls_data.items():
+        print(f"Function Name: {key}, URL: {val}")
+
+    for key, val in arn_data.items():
+        print(f"Function Name: {key}, URL: {val}")
 
+    update_json_file(json_file_path, 'lambda_arn', arn_data)
+    update_json_file(json_file_path, 'lambda_url', urls_data)
 
-cloud_watch_rule_cron_func = json_data.get('cloud_watch_rule_cron')
-lambda_arn = json_data.get('lambda_arn')
+    print(pipeline.timings.report())
 
-for func_name, cron_expr in cloud_watch_rule_cron_func.items():
-    rule_name = func_name + "_cron"
-    rule_description = f'{func_name} description'
-    schedule_expression = cron_expr
-    target_lambda_arn = lambda_arn.get(func_name)
 
-    create_or_update_cloudwatch_event_rule(rule_name, rule_description, schedule_expression, target_lambda_arn)
+if __name__ == '__main__':
+    main()
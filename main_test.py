@@ -0,0 +1,218 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+import main
+
+REGION = 'us-east-1'
+
+
+class TestDeploymentPipeline(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+        self.mock_aws = mock_aws()
+        self.mock_aws.start()
+        self.addCleanup(self.mock_aws.stop)
+
+        self.work_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_directory)
+        for func_name, file_name in [('fetcher', 'fetcher.py'), ('cron', 'cron.py')]:
+            os.makedirs(os.path.join(self.work_directory, func_name))
+            with open(os.path.join(self.work_directory, func_name, file_name), 'w') as source_file:
+                source_file.write("def handler(event, context):\n    return {}\n")
+        self.shared_package = os.path.join(self.work_directory, 'common')
+        os.makedirs(self.shared_package)
+        with open(os.path.join(self.shared_package, '__init__.py'), 'w') as source_file:
+            source_file.write('')
+
+        iam_client = boto3.client('iam', region_name=REGION)
+        self.role_arn = iam_client.create_role(
+            RoleName='lambda-role',
+            AssumeRolePolicyDocument=json.dumps({'Version': '2012-10-17', 'Statement': []})
+        )['Role']['Arn']
+        self.lambda_client = boto3.client('lambda', region_name=REGION)
+        self.functions_data = {'fetcher': 'fetcher.handler', 'cron': 'cron.handler'}
+
+    def build_pipeline(self, force=False, use_layer=False):
+        return main.DeploymentPipeline(
+            boto3.client('dynamodb', region_name=REGION),
+            self.lambda_client,
+            boto3.client('events', region_name=REGION),
+            self.role_arn,
+            shared_package_directories=[self.shared_package],
+            schedules={'cron': 'cron(0 15 * * ? *)'},
+            base_directory=self.work_directory,
+            output_directory=self.work_directory,
+            manifest_path=os.path.join(self.work_directory, 'manifest.json'),
+            force=force,
+            use_layer=use_layer,
+            cache_directory=os.path.join(self.work_directory, 'cache')
+        )
+
+    def test_deploys_table_functions_and_schedule(self):
+        pipeline = self.build_pipeline()
+
+        results = pipeline.run(self.functions_data, max_workers=3)
+
+        self.assertEqual(set(results), {'fetcher', 'cron'})
+        self.assertTrue(results['fetcher']['FunctionUrl'])
+        table = boto3.client('dynamodb', region_name=REGION).describe_table(TableName='CurrencyExchange')['Table']
+        self.assertIn('DateIndex', [index['IndexName'] for index in table['GlobalSecondaryIndexes']])
+
+        targets = boto3.client('events', region_name=REGION).list_targets_by_rule(Rule='cron_cron')['Targets']
+        self.assertEqual(targets[0]['Arn'], results['cron']['FunctionArn'])
+        policy = json.loads(self.lambda_client.get_policy(FunctionName='cron')['Policy'])
+        self.assertIn('cron_cron-invoke', [statement['Sid'] for statement in policy['Statement']])
+
+        steps = {(name, step) for name, step, _ in pipeline.timings.steps}
+        for step in ('build', 'upload', 'url_config', 'permissions', 'schedule'):
+            self.assertIn(('cron', step), steps)
+        # The functions are uploaded only once the table is ready
+        finished = [(name, step) for name, step, _ in pipeline.timings.steps]
+        self.assertLess(finished.index(('CurrencyExchange', 'table')), finished.index(('cron', 'upload')))
+        self.assertNotIn(('fetcher', 'schedule'), steps)
+        self.assertIn('Total wall time', pipeline.timings.report())
+
+    def test_unchanged_functions_are_not_uploaded_again(self):
+        self.build_pipeline().run(self.functions_data)
+        with open(os.path.join(self.work_directory, 'cron', 'cron.py'), 'a') as source_file:
+            source_file.write("# changed\n")
+
+        pipeline = self.build_pipeline()
+        pipeline.run(self.functions_data)
+
+        uploaded = {name for name, step, _ in pipeline.timings.steps if step == 'upload'}
+        self.assertEqual(uploaded, {'cron'})
+
+    def write_requirements(self, func_name, requirements):
+        with open(os.path.join(self.work_directory, func_name, 'requirements.txt'), 'w') as requirements_file:
+            requirements_file.write(requirements)
+
+    @mock.patch("main.subprocess.check_call")
+    def test_identical_requirements_are_installed_once(self, mock_check_call):
+        mock_check_call.side_effect = fake_pip_install
+        self.write_requirements('fetcher', "pytz\nboto3\n")
+        self.write_requirements('cron', "# the same set\nboto3\npytz\n")
+
+        self.build_pipeline().run(self.functions_data)
+
+        self.assertEqual(mock_check_call.call_count, 1)
+        for func_name in self.functions_data:
+            with zipfile.ZipFile(os.path.join(self.work_directory, f"{func_name}.zip")) as zip_file:
+                self.assertIn('pytz/__init__.py', zip_file.namelist())
+                self.assertIn('common/__init__.py', zip_file.namelist())
+        self.assertFalse(os.path.exists(os.path.join(self.work_directory, 'cron', 'pytz')))
+
+    @mock.patch("main.subprocess.check_call")
+    def test_layer_holds_the_dependencies_of_every_function(self, mock_check_call):
+        mock_check_call.side_effect = fake_pip_install
+        self.write_requirements('fetcher', "pytz\n")
+        self.write_requirements('cron', "requests\n")
+
+        pipeline = self.build_pipeline(use_layer=True)
+        pipeline.run(self.functions_data)
+
+        self.assertEqual(mock_check_call.call_count, 1)
+        with zipfile.ZipFile(os.path.join(self.work_directory, f"{main.DEPENDENCY_LAYER_NAME}.zip")) as zip_file:
+            self.assertEqual(set(zip_file.namelist()), {'python/pytz/__init__.py', 'python/requests/__init__.py'})
+        with zipfile.ZipFile(os.path.join(self.work_directory, 'cron.zip')) as zip_file:
+            self.assertNotIn('requests/__init__.py', zip_file.namelist())
+        layers = self.lambda_client.get_function(FunctionName='cron')['Configuration']['Layers']
+        self.assertEqual(layers[0]['Arn'], pipeline.layer_arn)
+
+    def test_packages_are_slim_and_reproducible(self):
+        with open(os.path.join(self.work_directory, 'cron', 'cron_test.py'), 'w') as test_file:
+            test_file.write("import unittest\n")
+        dependency_directory = os.path.join(self.work_directory, 'dependencies')
+        for file_name in ['pytz/__init__.py', 'pytz/__pycache__/__init__.cpython-38.pyc',
+                          'pytz-2023.3.dist-info/METADATA', 'boto3/__init__.py', 'botocore/__init__.py']:
+            os.makedirs(os.path.dirname(os.path.join(dependency_directory, file_name)), exist_ok=True)
+            open(os.path.join(dependency_directory, file_name), 'w').close()
+
+        first_zip = main.zip_directory(os.path.join(self.work_directory, 'cron'), [self.shared_package],
+                                       self.work_directory, dependency_directory)
+        first_sha256 = main.get_zip_code_sha256(first_zip)
+        os.utime(os.path.join(self.work_directory, 'cron', 'cron.py'), (0, 0))
+        second_zip = main.zip_directory(os.path.join(self.work_directory, 'cron'), [self.shared_package],
+                                        self.work_directory, dependency_directory)
+
+        self.assertEqual(main.get_zip_code_sha256(second_zip), first_sha256)
+        with zipfile.ZipFile(second_zip) as zip_file:
+            self.assertEqual(zip_file.namelist(), ['common/__init__.py', 'cron.py', 'pytz/__init__.py'])
+            self.assertEqual(zip_file.infolist()[0].date_time, main.ZIP_DATE_TIME)
+
+    def test_bytecode_is_added_next_to_the_sources(self):
+        zip_filename = os.path.join(self.work_directory, 'compiled.zip')
+
+        main.write_package(zip_filename, main.iter_directory_files(os.path.join(self.work_directory, 'cron')),
+                           precompile=True)
+
+        with zipfile.ZipFile(zip_filename) as zip_file:
+            pyc_names = [name for name in zip_file.namelist() if name.endswith('.pyc')]
+        self.assertEqual(len(pyc_names), 1)
+        self.assertTrue(pyc_names[0].startswith('__pycache__/cron.'))
+
+    @mock.patch('main.time.sleep')
+    def test_waits_for_the_date_index_to_be_active(self, mock_sleep):
+        dynamodb_client = mock.MagicMock()
+        dynamodb_client.describe_table.side_effect = [
+            {'Table': {'GlobalSecondaryIndexes': [{'IndexName': 'DateIndex', 'IndexStatus': 'CREATING'}]}},
+            {'Table': {'GlobalSecondaryIndexes': [{'IndexName': 'DateIndex', 'IndexStatus': 'ACTIVE'}]}},
+        ]
+
+        main.wait_for_index_active(dynamodb_client, 'CurrencyExchange', 'DateIndex')
+
+        self.assertEqual(dynamodb_client.describe_table.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    def test_unexpected_rule_errors_are_raised(self):
+        cloudwatch_client = mock.MagicMock()
+        cloudwatch_client.put_rule.side_effect = ClientError(
+            {'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}}, 'PutRule'
+        )
+
+        with self.assertRaises(ClientError):
+            main.create_or_update_cloudwatch_event_rule(
+                cloudwatch_client, 'cron_cron', 'cron description', 'cron(0 15 * * ? *)', 'arn'
+            )
+        cloudwatch_client.put_targets.assert_not_called()
+
+    def test_include_patterns_override_the_excludes(self):
+        self.assertFalse(main.is_packaged('boto3/__init__.py'))
+        self.assertTrue(main.is_packaged('boto3/__init__.py', include_patterns=('boto3/*',)))
+        self.assertFalse(main.is_packaged('common/cache_test.py'))
+
+    def test_rebuild_to_the_deployed_code_is_not_uploaded(self):
+        self.build_pipeline().run(self.functions_data)
+        with open(os.path.join(self.work_directory, 'cron', 'cron_test.py'), 'w') as test_file:
+            test_file.write("import unittest\n")
+
+        pipeline = self.build_pipeline()
+        pipeline.run(self.functions_data)
+
+        steps = {(name, step) for name, step, _ in pipeline.timings.steps}
+        self.assertIn(('cron', 'build'), steps)
+        self.assertNotIn(('cron', 'upload'), steps)
+
+
+def fake_pip_install(command):
+    # Stands in for pip by creating an empty package for every requirement
+    requirements_file = command[command.index('-r') + 1]
+    target_directory = command[command.index('--target') + 1]
+    with open(requirements_file) as file:
+        for requirement in file.read().split():
+            os.makedirs(os.path.join(target_directory, requirement))
+            open(os.path.join(target_directory, requirement, '__init__.py'), 'w').close()
+
+
+if __name__ == '__main__':
+    unittest.main()